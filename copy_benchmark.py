@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+
+# Benchmark psutils copy methods across file-size distributions
+
+
+from __future__ import print_function
+from __future__ import division
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+SCRIPT_FILE = os.path.abspath(os.path.realpath(__file__))
+SCRIPT_DIR = os.path.dirname(SCRIPT_FILE)
+
+try:
+    # Check if PSU package is installed
+    import psutils
+except ImportError:
+    # Look for PSU repo alongside script directory
+    sys.path.append(os.path.join(SCRIPT_DIR, '..', 'pyscript-utils'))
+    import psutils
+import psutils.custom_errors as cerr
+import psutils.copymethod as psu_cm
+
+
+## Generated file sets
+DATASET_MANY_TINY = 'many-tiny'
+DATASET_MIXED = 'mixed'
+DATASET_FEW_HUGE = 'few-huge'
+DATASET_CHOICES = [DATASET_MANY_TINY, DATASET_MIXED, DATASET_FEW_HUGE]
+
+# Methods that remove their source are excluded, since every run reuses the same source tree.
+# Metadata-only methods are excluded, since they copy no data.
+BENCHMARK_METHOD_DICT = dict([
+    (name, method) for name, method in psu_cm.COPY_METHOD_DICT.items()
+    if method.action_verb != 'MOVING' and not getattr(method.copy_fn, 'metadata_only', False)
+])
+
+CACHE_MODE_COLD = 'cold'
+CACHE_MODE_WARM = 'warm'
+
+DATA_BLOCK_SIZE = 1024 * 1024
+PROC_SELF_IO = '/proc/self/io'
+
+
+def get_dataset_files(dataset, scale=1.0):
+    rng = random.Random(0)
+    if dataset == DATASET_MANY_TINY:
+        nfiles = max(1, int(5000 * scale))
+        return [(os.path.join('d{:03d}'.format(i % 50), 'f{:06d}'.format(i)), 1024) for i in range(nfiles)]
+    elif dataset == DATASET_MIXED:
+        nfiles = max(1, int(1000 * scale))
+        file_list = []
+        for i in range(nfiles):
+            draw = rng.random()
+            if draw < 0.80:
+                size = rng.randint(4 * 1024, 64 * 1024)
+            elif draw < 0.98:
+                size = rng.randint(512 * 1024, 2 * 1024 * 1024)
+            else:
+                size = rng.randint(16 * 1024 * 1024, 32 * 1024 * 1024)
+            file_list.append((os.path.join('d{:02d}'.format(i % 20), 'f{:05d}'.format(i)), size))
+        return file_list
+    elif dataset == DATASET_FEW_HUGE:
+        return [('f{}'.format(i), max(1, int(256 * 1024 * 1024 * scale))) for i in range(4)]
+    else:
+        raise cerr.InvalidArgumentError("`dataset` must be one of {}, but was {}".format(DATASET_CHOICES, dataset))
+
+
+def create_dataset(rootdir, file_list):
+    block = os.urandom(DATA_BLOCK_SIZE)
+    for relpath, size in file_list:
+        path = os.path.join(rootdir, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fp:
+            remaining = size
+            while remaining > 0:
+                nbytes = min(remaining, DATA_BLOCK_SIZE)
+                fp.write(block[:nbytes])
+                remaining -= nbytes
+
+
+def set_cache_state(rootdir, file_list, cache_mode):
+    # Without root privileges the page cache can't be dropped globally,
+    # so source pages are evicted (cold) or read in (warm) per file
+    for relpath, size in file_list:
+        path = os.path.join(rootdir, relpath)
+        if cache_mode == CACHE_MODE_COLD:
+            if hasattr(os, 'posix_fadvise'):
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fdatasync(fd)
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                finally:
+                    os.close(fd)
+        else:
+            with open(path, 'rb') as fp:
+                while fp.read(DATA_BLOCK_SIZE):
+                    pass
+
+
+def read_proc_io():
+    try:
+        with open(PROC_SELF_IO, 'r') as io_fp:
+            return dict([(key, int(value)) for key, value in (line.split(':') for line in io_fp)])
+    except (IOError, OSError):
+        return None
+
+
+def get_benchmark_copy_method(method_name, file_list):
+    # Every run gets a new copy engine, so that state like the dedupe index is
+    # not carried between runs. Engines that only take over above a size
+    # threshold are set up so that they handle every generated file, since
+    # otherwise they would only measure their small-file fallback.
+    method = BENCHMARK_METHOD_DICT[method_name]
+    copy_fn = method.copy_fn
+    max_size = max([size for relpath, size in file_list])
+    # Split the largest file into a few chunks
+    chunk_size = max(64 * 1024, max_size // 4)
+    if isinstance(copy_fn, psu_cm.StripedCopy):
+        copy_fn = psu_cm.StripedCopy(stripe_size=min(chunk_size, psu_cm.COPY_STRIPED_STRIPE_SIZE),
+                                     workers=copy_fn.workers, size_threshold=0)
+    elif isinstance(copy_fn, psu_cm.ResumableCopy):
+        copy_fn = psu_cm.ResumableCopy(chunk_size=min(chunk_size, psu_cm.COPY_RESUMABLE_CHUNK_SIZE),
+                                       size_threshold=0)
+    elif isinstance(copy_fn, psu_cm.MmapCopy):
+        copy_fn = psu_cm.MmapCopy(size_threshold=0)
+    elif not isinstance(copy_fn, (str, types.FunctionType, types.BuiltinFunctionType)):
+        copy_fn = type(copy_fn)()
+    return psu_cm.CopyMethod(copy_fn, method.copy_fn_name, method.action_verb,
+                             method.reverse_args, method.copy_shcmd_is_fmtstr)
+
+
+def run_method(method_name, srcdir, dstdir, file_list, copy_workers=1, copy_batch_size=1):
+    copy_method = get_benchmark_copy_method(method_name, file_list)
+    copy_method.set_options(
+        check_srcpath_exists=False,
+        copy_verbose=False,
+        copy_batch_size=copy_batch_size,
+    )
+    copy_method.reset_metadata_op_counts()
+    executor = psu_cm.CopyExecutor(copy_workers)
+
+    io_start = read_proc_io()
+    time_start = time.time()
+    try:
+        for relpath, size in file_list:
+            executor.submit(copy_method.copy,
+                            os.path.join(srcdir, relpath), os.path.join(dstdir, relpath),
+                            srcpath_is_file=True)
+        executor.wait()
+        copy_method.flush_batch()
+    finally:
+        executor.shutdown(cancel_pending=True)
+    elapsed = time.time() - time_start
+    io_end = read_proc_io()
+
+    nbytes = sum([size for relpath, size in file_list])
+    result = {
+        'method': method_name,
+        'files': len(file_list),
+        'bytes': nbytes,
+        'seconds': elapsed,
+        'files_per_sec': len(file_list) / elapsed if elapsed > 0 else None,
+        'mb_per_sec': nbytes / (1024 * 1024) / elapsed if elapsed > 0 else None,
+        'metadata_ops': copy_method.get_metadata_op_counts(),
+        # Counts are only for this process; shell methods run in child processes
+        'syscr': (io_end['syscr'] - io_start['syscr']) if io_start is not None else None,
+        'syscw': (io_end['syscw'] - io_start['syscw']) if io_start is not None else None,
+    }
+    return result
+
+
+def format_result(result):
+    return "{:<10} {:<16} {:<5} {:>8} files {:>9.3f} s {:>11.1f} files/s {:>9.1f} MB/s  syscr={} syscw={} metadata_ops={}".format(
+        result['dataset'], result['method'], result['cache'], result['files'], result['seconds'],
+        result['files_per_sec'] or 0, result['mb_per_sec'] or 0,
+        result['syscr'], result['syscw'], sum(result['metadata_ops'].values())
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(
+        "Benchmark psutils copy methods on generated many-tiny, mixed, and few-huge file sets,"
+        " with cold and warm source page cache."))
+    parser.add_argument('--workdir', default=None,
+        help="Directory where test data and copies are written (default: a new temporary directory)."
+             " Results depend heavily on the filesystem of this directory.")
+    parser.add_argument('--datasets', nargs='+', choices=DATASET_CHOICES, default=DATASET_CHOICES,
+        help="File sets to benchmark.")
+    parser.add_argument('--methods', nargs='+', choices=sorted(BENCHMARK_METHOD_DICT.keys()),
+        default=sorted(BENCHMARK_METHOD_DICT.keys()),
+        help="Copy methods to benchmark. Move methods are excluded because they consume the source,"
+             " and metadata-only methods because they copy no data.")
+    parser.add_argument('--cache', nargs='+', choices=[CACHE_MODE_COLD, CACHE_MODE_WARM],
+        default=[CACHE_MODE_COLD, CACHE_MODE_WARM],
+        help="Source page cache states to benchmark.")
+    parser.add_argument('--scale', type=float, default=1.0,
+        help="Multiplier for file counts (many-tiny, mixed) and file sizes (few-huge).")
+    parser.add_argument('--copy-workers', type=int, default=1,
+        help="Number of threads copying files, as with file_xfer.py --copy-workers.")
+    parser.add_argument('--copy-batch-size', type=int, default=1,
+        help="Batch size for shell copy methods, as with file_xfer.py --copy-batch-size.")
+    parser.add_argument('--json-out', default=None,
+        help="Write all results to this JSON file.")
+    parser.add_argument('--keep', action='store_true',
+        help="Do not remove the working directory when done.")
+    args = parser.parse_args()
+
+    if args.workdir is None:
+        workdir = tempfile.mkdtemp(prefix='copy_benchmark_')
+    else:
+        workdir = os.path.abspath(args.workdir)
+        os.makedirs(workdir, exist_ok=True)
+
+    results = []
+    try:
+        for dataset in args.datasets:
+            file_list = get_dataset_files(dataset, args.scale)
+            srcdir = os.path.join(workdir, dataset, 'src')
+            dstdir = os.path.join(workdir, dataset, 'dst')
+            print("Creating {} dataset: {} files, {:.1f} MB".format(
+                dataset, len(file_list), sum([size for relpath, size in file_list]) / (1024 * 1024)))
+            if os.path.isdir(srcdir):
+                shutil.rmtree(srcdir)
+            create_dataset(srcdir, file_list)
+
+            for method_name in args.methods:
+                for cache_mode in args.cache:
+                    if os.path.lexists(dstdir):
+                        shutil.rmtree(dstdir)
+                    set_cache_state(srcdir, file_list, cache_mode)
+                    result = run_method(method_name, srcdir, dstdir, file_list,
+                                        args.copy_workers, args.copy_batch_size)
+                    result['dataset'] = dataset
+                    result['cache'] = cache_mode
+                    results.append(result)
+                    print(format_result(result))
+            if os.path.lexists(dstdir):
+                shutil.rmtree(dstdir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json_out is not None:
+        with open(args.json_out, 'w') as json_fp:
+            json.dump(results, json_fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
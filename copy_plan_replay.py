@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+# Perform a plan file written by file_xfer.py --plan-out, without walking the source again
+
+
+from __future__ import print_function
+import argparse
+import copy
+import os
+import sys
+
+SCRIPT_FILE = os.path.abspath(os.path.realpath(__file__))
+SCRIPT_DIR = os.path.dirname(SCRIPT_FILE)
+
+try:
+    # Check if PSU package is installed
+    import psutils
+except ImportError:
+    # Look for PSU repo alongside script directory
+    sys.path.append(os.path.join(SCRIPT_DIR, '..', 'pyscript-utils'))
+    import psutils
+
+import psutils.argtype as psu_at
+import psutils.script_action as psu_act
+import psutils.copymethod as psu_cm
+
+##############################
+
+### Argument globals ###
+
+## Argument strings ("ARGSTR_")
+# (positional first, then optional with '--' prefix)
+ARGSTR_PLAN_POS = 'plan'
+ARGSTR_NSHARDS = '--nshards'
+ARGSTR_SHARD = '--shard'
+ARGSTR_SPLIT_PREFIX = '--split-prefix'
+
+## Default argument values ("ARGDEF_")
+ARGDEF_COPY_METHOD = None  # use the method the plan was made with
+ARGDEF_COPY_WORKERS = psu_cm.ARGDEF_COPY_WORKERS
+ARGDEF_NSHARDS = 1
+
+##############################
+
+
+def argparser_init():
+
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description=' '.join([
+            "Perform the operations in a plan file written by file_xfer.py {},".format(psu_cm.ARGSTR_PLAN_OUT),
+            "optionally only one of N shards of it, or split it into N shard files for separate jobs.",
+            "Shards are balanced by bytes, counting a directory transferred as one operation",
+            "by the size of its files, and every job computes the same assignment.",
+        ])
+    )
+
+    ## Positional arguments
+
+    parser.add_argument(
+        ARGSTR_PLAN_POS,
+        type=psu_at.ARGTYPE_PATH(argstr=ARGSTR_PLAN_POS,
+            existcheck_fn=os.path.isfile,
+            existcheck_reqval=True,
+            accesscheck_reqtrue=os.R_OK),
+        help="Plan file (or shard file) to perform."
+    )
+
+    ## Optional arguments
+
+    parser.add_argument(
+        '-cm', psu_cm.ARGSTR_COPY_METHOD,
+        type=str,
+        choices=psu_cm.ARGCHO_COPY_METHOD,
+        default=ARGDEF_COPY_METHOD,
+        help=' '.join([
+            "Copy method used to perform the plan.",
+            "By default, the method the plan was made with is used.",
+        ])
+    )
+    parser.add_argument(
+        '-cw', psu_cm.ARGSTR_COPY_WORKERS,
+        type=psu_at.ARGTYPE_NUM(argstr=psu_cm.ARGSTR_COPY_WORKERS,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_COPY_WORKERS,
+        help="Number of threads performing operations, as with file_xfer.py {}.".format(psu_cm.ARGSTR_COPY_WORKERS)
+    )
+    parser.add_argument(
+        ARGSTR_NSHARDS,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_NSHARDS,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_NSHARDS,
+        help="Number of shards the plan is divided into."
+    )
+    parser.add_argument(
+        ARGSTR_SHARD,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_SHARD,
+            numeric_type=int, allow_neg=False, allow_zero=True, allow_inf=False),
+        default=None,
+        help="Only perform this shard (0-based index) out of {}.".format(ARGSTR_NSHARDS)
+    )
+    parser.add_argument(
+        ARGSTR_SPLIT_PREFIX,
+        type=psu_at.ARGTYPE_PATH(argstr=ARGSTR_SPLIT_PREFIX,
+            accesscheck_reqtrue=os.W_OK,
+            accesscheck_parent_if_dne=True),
+        default=None,
+        help="Instead of performing the plan, write {} shard files named PREFIX.N.jsonl.".format(ARGSTR_NSHARDS)
+    )
+    parser.add_argument(
+        psu_cm.ARGSTR_OVERWRITE_POLICY,
+        type=str,
+        choices=psu_cm.ARGCHO_OVERWRITE_POLICY,
+        default=None,
+        help=' '.join([
+            "Overwrite policy for destination files that exist when the plan is performed.",
+            "By default, the policy the plan was made with is used, except that unconditional",
+            "overwrites become '{}' so that performing a plan again skips files already copied.".format(
+                psu_cm.COPY_OVERWRITE_POLICY_IF_DIFFERENT_SIZE_MTIME),
+        ])
+    )
+    parser.add_argument(
+        psu_act.ARGSTR_DRYRUN,
+        action='store_true',
+        help="Print operations without performing them."
+    )
+    parser.add_argument(
+        psu_act.ARGSTR_QUIET,
+        action='store_true',
+        help="Do not print each operation."
+    )
+
+    return parser
+
+
+def main():
+
+    arg_parser = argparser_init()
+    args = arg_parser.parse_args()
+
+    plan_file = args.plan
+    nshards = args.nshards
+    shard = args.shard
+
+    if shard is not None and shard >= nshards:
+        arg_parser.error("{} must be in the range [0, {}]".format(ARGSTR_SHARD, nshards - 1))
+
+    if args.split_prefix is not None:
+        for shard_file in psu_cm.split_copy_plan(plan_file, nshards, args.split_prefix):
+            print(shard_file)
+        sys.exit(0)
+
+    plan_header = psu_cm.read_copy_plan_header(plan_file)
+    copy_method_choice = args.copy_method
+    if copy_method_choice is None:
+        copy_method_choice = plan_header['method']
+    if copy_method_choice is None:
+        arg_parser.error("Plan file does not record its copy method; provide one with {}".format(
+            psu_cm.ARGSTR_COPY_METHOD))
+    if copy_method_choice not in psu_cm.ARGMAP_COPY_METHOD_FUNC:
+        arg_parser.error("Plan file copy method '{}' is not one of {}".format(
+            copy_method_choice, psu_cm.ARGCHO_COPY_METHOD))
+    overwrite_policy = args.overwrite_policy
+    if overwrite_policy is None:
+        overwrite_policy = psu_cm.get_copy_plan_replay_policy(plan_header['overwrite_policy'])
+
+    shards = psu_cm.get_copy_plan_shards(psu_cm.read_copy_plan(plan_file), nshards)
+    if shard is not None:
+        entries = shards[shard]
+    else:
+        entries = [entry for shard_entries in shards for entry in shard_entries]
+
+    copy_method = copy.copy(psu_cm.ARGMAP_COPY_METHOD_FUNC[copy_method_choice])
+    copy_method.set_options(
+        copy_dryrun=args.dryrun,
+        copy_verbose=(not args.quiet),
+        copy_overwrite_policy=overwrite_policy,
+    )
+    counts = psu_cm.replay_copy_plan(copy_method, entries, copy_workers=args.copy_workers)
+    print("Performed plan {} with copy method '{}'{}: {} directories created, {} paths transferred, {} paths skipped".format(
+        plan_file, copy_method_choice,
+        " (shard {} of {})".format(shard, nshards) if shard is not None else '',
+        counts['mkdir'], counts['done'], counts['skipped']
+    ))
+
+
+if __name__ == '__main__':
+    main()
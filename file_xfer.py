@@ -61,7 +61,13 @@ import psutils.scheduler as psu_sched
 ### Script imports ###
 
 ## Python Standard Library
+import concurrent.futures
 import copy
+import json
+import multiprocessing
+import shutil
+import stat
+import threading
 
 ## Non-Standard PyPI
 try:
@@ -85,7 +91,12 @@ ARGSTR_DST_POS = 'dst'
 ARGSTR_SRC = '--src'
 ARGSTR_DST = '--dst'
 ARGSTR_HARDLINK_RECORDS_DIR = '--hardlink-records-dir'
+ARGSTR_HARDLINK_RECORDS = '--hardlink-records'
 ARGSTR_NO_HARDLINK_RECORDS = '--no-hardlink-records'
+ARGSTR_HARDLINK_RECORDS_MANIFEST = '--hardlink-records-manifest'
+ARGSTR_HARDLINK_RECORDS_WORKERS = '--hardlink-records-workers'
+ARGSTR_WORKERS = '--workers'
+ARGSTR_PROCS = '--procs'
 
 ## Argument help info ("ARGHLP_", only when needed outside of argparse)
 # ARGHLP_SRCLIST_FORMAT = None  # set globally in pre_argparse()
@@ -112,11 +123,20 @@ ARGGRP_OUTDIR += psu_sched.ARGGRP_OUTDIR  # comment-out if not using scheduler a
 ARGCOL_MUT_EXCL_SET = [
     ARGGRP_DST,
     [psu_walk.ARGSTR_OUTDEPTH, [psu_tl.ARGSTR_SYNC_TREE, psu_tl.ARGSTR_TRANSPLANT_TREE]],
+    [ARGSTR_WORKERS, ARGSTR_PROCS],
+    [psu_walk.ARGSTR_PIPELINE, [ARGSTR_WORKERS, ARGSTR_PROCS]],
+    # Each task process would overwrite these single output files
+    [ARGSTR_PROCS, [psu_cm.ARGSTR_PLAN_OUT, psu_walk.ARGSTR_WALK_STATS, psu_cm.ARGSTR_DEDUPE_INDEX]],
 ]
 ARGCOL_MUT_EXCL_SET += psu_log.ARGCOL_MUT_EXCL_SET  # comment-out if not using logging arguments
 ARGCOL_MUT_EXCL_SET += psu_tl.ARGCOL_MUT_EXCL_SET  # comment-out if not using source list arguments
 ARGCOL_MUT_EXCL_SET += psu_act.ARGCOL_MUT_EXCL_SET  # comment-out if not using dryrun, debug, quiet arguments
 ARGCOL_MUT_EXCL_PROVIDED = list(ARGCOL_MUT_EXCL_SET)
+ARGCOL_MUT_EXCL_PROVIDED += [
+    [ARGSTR_HARDLINK_RECORDS, ARGSTR_NO_HARDLINK_RECORDS],
+    # The pipeline copy stage takes files in the order they are walked
+    [psu_walk.ARGSTR_PIPELINE, [psu_cm.ARGSTR_COPY_ORDER, psu_cm.ARGSTR_COPY_ORDER_WINDOW]],
+]
 ARGCOL_MUT_EXCL_PROVIDED += psu_log.ARGCOL_MUT_EXCL_PROVIDED  # comment-out if not using logging arguments
 
 ## Doubled argument restricted optional argument groups
@@ -169,6 +189,7 @@ ARGDEF_DMATCH_MAXDEPTH = None
 ARGDEF_OUTDEPTH = None
 ARGDEF_SRCLIST_DELIM = ','
 ARGDEF_BUNDLEDIR = os.path.realpath(os.path.join(os.path.expanduser('~'), 'scratch', 'task_bundles'))
+ARGDEF_HARDLINK_RECORDS_WORKERS = 1
 ARGDEF_HARDLINK_RECORD_DIR = os.path.realpath(os.path.join(os.path.expanduser('~'), 'scratch', '{}_hardlink_records'.format(SCRIPT_NAME)))
 
 ##############################
@@ -203,6 +224,10 @@ BUNDLE_LIST_DESCR = 'tasklist'
 #     def __init__(self, msg=""):
 #         super(Exception, self).__init__(msg)
 
+class TaskFailureError(Exception):
+    def __init__(self, msg=""):
+        super(Exception, self).__init__(msg)
+
 ##############################
 
 
@@ -313,12 +338,64 @@ def argparser_init(skip_src_path_check=False, skip_dst_path_check=False,
             "This is to serve as a reminder of the files and directories that have been hardlinked.",
         ])
     )
+    parser.add_argument(
+        ARGSTR_HARDLINK_RECORDS_MANIFEST,
+        type=psu_at.ARGTYPE_PATH(argstr=ARGSTR_HARDLINK_RECORDS_MANIFEST,
+            existcheck_fn=os.path.isdir,
+            existcheck_reqval=False,
+            accesscheck_reqtrue=os.W_OK,
+            accesscheck_parent_if_dne=True),
+        default=None,
+        help=' '.join([
+            "If provided, hardlink records are appended to this JSON-lines file as",
+            "source and destination path pairs, instead of populating the mirror of",
+            "symlinks under {}.".format(ARGSTR_HARDLINK_RECORDS_DIR),
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_HARDLINK_RECORDS_WORKERS,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_HARDLINK_RECORDS_WORKERS,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_HARDLINK_RECORDS_WORKERS,
+        help=' '.join([
+            "Number of threads creating hardlink record symlinks.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_WORKERS,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_WORKERS,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=None,
+        help=' '.join([
+            "Number of threads performing source/destination tasks concurrently.",
+            "Every task uses the same copy method and walk settings. Failed tasks",
+            "are listed at the end, and the script then exits with a non-zero status.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_PROCS,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_PROCS,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=None,
+        help=' '.join([
+            "Number of processes performing source/destination tasks concurrently,",
+            "for tasks where copying is limited by Python CPU time. As with {},".format(ARGSTR_WORKERS),
+            "but end-of-run summaries are reported for each task.",
+        ])
+    )
+    parser.add_argument(
+        '-hr', ARGSTR_HARDLINK_RECORDS,
+        action='store_true',
+        help=' '.join([
+            "If {}={}, record every hardlinked source and destination,".format(psu_cm.ARGSTR_COPY_METHOD, psu_cm.ARGCHO_COPY_METHOD_LINK),
+            "as symlinks under {} or in {}.".format(ARGSTR_HARDLINK_RECORDS_DIR, ARGSTR_HARDLINK_RECORDS_MANIFEST),
+        ])
+    )
     parser.add_argument(
         '-nhr', ARGSTR_NO_HARDLINK_RECORDS,
         action='store_true',
         default=True,
-        # TODO: Write help string
-        help="[write me]"
+        help="Do not record hardlinked paths (the default, unless {} is given).".format(ARGSTR_HARDLINK_RECORDS)
     )
 
     # Comment-out this block if not using scheduler arguments
@@ -404,6 +481,14 @@ def main():
             psu_walk.ARGSTR_MINDEPTH, args.get(psu_walk.ARGSTR_MINDEPTH),
         ))
 
+    # Moved sources may only be deleted once their copies are durable
+    if (    args.get(psu_cm.ARGSTR_DURABILITY) != psu_cm.COPY_DURABILITY_NONE
+        and args.get(psu_cm.ARGSTR_COPY_METHOD) in (psu_cm.ARGCHO_COPY_METHOD_MOVE, psu_cm.ARGCHO_COPY_METHOD_MOVE_SYSTEM)):
+        arg_parser.error("{} {} cannot hold source deletes until copies are durable; use {} {} instead".format(
+            psu_cm.ARGSTR_COPY_METHOD, args.get(psu_cm.ARGSTR_COPY_METHOD),
+            psu_cm.ARGSTR_COPY_METHOD, psu_cm.ARGCHO_COPY_METHOD_MOVE_FAST,
+        ))
+
     ## Parse src-dst tasklist arguments
     skip_dstdir_path_adjustment = (    args.provided(psu_walk.ARGSTR_OUTDEPTH)
                                    or (args.provided(psu_walk.ARGSTR_MINDEPTH) and args.get(psu_walk.ARGSTR_MINDEPTH) > 0))
@@ -454,17 +539,284 @@ def main():
     sys.exit(1 if error_trace is not None else 0)
 
 
+HARDLINK_RECORD_BATCH_SIZE = 10000
+
+
+class HardlinkRecordWriter(object):
+    # Records are collected as tasks complete and written in batches, so that
+    # each record directory is created and checked only once per batch.
+    def __init__(self, record_dir, manifest_file=None, workers=1,
+                 dryrun=False, verbose=False, batch_size=HARDLINK_RECORD_BATCH_SIZE):
+        self.record_dir = record_dir
+        self.manifest_file = manifest_file
+        self.workers = workers
+        self.dryrun = dryrun
+        self.verbose = verbose
+        self.batch_size = batch_size
+        # List of (record_path, target_path) pairs, or (srcpath, dstpath) pairs for a manifest
+        self.records = []
+        self.nwritten = 0
+
+    def get_record_paths(self, dstpath_real):
+        dstpath_drive, dstpath_tail = os.path.splitdrive(dstpath_real)
+        return [
+            os.path.normpath("{}/{}/{}/{}".format(self.record_dir, subdir, dstpath_drive.rstrip(':'), dstpath_tail))
+            for subdir in ('src', 'dst')
+        ]
+
+    def add(self, srcpath, dstpath):
+        dstpath_real = os.path.realpath(dstpath)
+        if self.manifest_file is not None:
+            self.records.append((srcpath, dstpath_real))
+        else:
+            record_path_for_src, record_path_for_dst = self.get_record_paths(dstpath_real)
+            self.records.append((record_path_for_src, srcpath))
+            self.records.append((record_path_for_dst, dstpath))
+        if len(self.records) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        records = self.records
+        self.records = []
+        if not records:
+            return
+        if self.manifest_file is not None:
+            self._write_manifest(records)
+        else:
+            self._write_symlinks(records)
+
+    def _write_manifest(self, records):
+        if self.dryrun:
+            return
+        with open(self.manifest_file, 'a') as manifest_fp:
+            for srcpath, dstpath in records:
+                manifest_fp.write(json.dumps({'src': srcpath, 'dst': dstpath})+'\n')
+        self.nwritten += len(records)
+
+    def _write_symlinks(self, records):
+        # Records are not written under record directories that resolve elsewhere.
+        # Directories are checked and created once for all of their records.
+        record_dir_ok = dict()
+        for record_dir in sorted(set([os.path.dirname(record_path) for record_path, target_path in records])):
+            if os.path.realpath(record_dir) != record_dir:
+                record_dir_ok[record_dir] = False
+                continue
+            if not self.dryrun:
+                os.makedirs(record_dir, exist_ok=True)
+            record_dir_ok[record_dir] = True
+
+        copy_executor = psu_cm.CopyExecutor(self.workers)
+        try:
+            for record_path, target_path in records:
+                if record_dir_ok[os.path.dirname(record_path)]:
+                    copy_executor.submit(self._write_symlink, record_path, target_path,
+                                         callback=self._symlink_done)
+            copy_executor.wait()
+        finally:
+            copy_executor.shutdown(cancel_pending=True)
+
+    def _write_symlink(self, record_path, target_path):
+        try:
+            record_lstat = os.lstat(record_path)
+        except FileNotFoundError:
+            record_lstat = None
+        # Existing record symlinks are replaced, unless they already point to the target
+        if (    record_lstat is not None and stat.S_ISLNK(record_lstat.st_mode)
+            and os.readlink(record_path) == target_path):
+            return False
+        if self.verbose:
+            print("{}SYMLINKING: {} -> {}".format("(dryrun) " if self.dryrun else '', target_path, record_path))
+        if self.dryrun:
+            return False
+        if record_lstat is not None:
+            if stat.S_ISDIR(record_lstat.st_mode):
+                shutil.rmtree(record_path)
+            else:
+                os.remove(record_path)
+        os.symlink(target_path, record_path)
+        return True
+
+    def _symlink_done(self, written):
+        # Called from the submitting thread, so the count needs no lock
+        if written:
+            self.nwritten += 1
+
+
+# Arguments for tasks run by perform_tasks_in_processes, inherited by forked worker processes
+PROCESS_TASK_ARGS = None
+
+
+def _perform_task_in_process(task):
+    perform_tasks(PROCESS_TASK_ARGS, [task])
+
+
+def wait_for_tasks(future_task_dict, on_task_done=None):
+    # Report progress across all tasks as they complete, and collect the failed tasks
+    failed_tasks = []
+    task_progress = tqdm(total=len(future_task_dict), unit='task') if imported_tqdm else None
+    try:
+        for future in concurrent.futures.as_completed(future_task_dict):
+            task_srcpath, task_dstpath = future_task_dict[future]
+            task_error = future.exception()
+            if task_error is not None:
+                failed_tasks.append((task_srcpath, task_dstpath, task_error))
+                error("Task failed: {} -> {} ({}: {})".format(
+                    task_srcpath, task_dstpath, type(task_error).__name__, task_error))
+            elif on_task_done is not None:
+                on_task_done(task_srcpath, task_dstpath)
+            if task_progress is not None:
+                task_progress.update(1)
+    finally:
+        if task_progress is not None:
+            task_progress.close()
+    return failed_tasks
+
+
+def check_failed_tasks(failed_tasks, ntasks):
+    if failed_tasks:
+        raise TaskFailureError("{} of {} tasks failed:\n{}".format(
+            len(failed_tasks), ntasks,
+            '\n'.join(["{} -> {} ({}: {})".format(task_srcpath, task_dstpath, type(task_error).__name__, task_error)
+                       for task_srcpath, task_dstpath, task_error in failed_tasks])
+        ))
+
+
+def perform_tasks_in_processes(args, task_list):
+    global PROCESS_TASK_ARGS
+
+    # Script arguments can't be pickled, so worker processes are forked to inherit them
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise cerr.InvalidArgumentError("{} requires the 'fork' process start method, which is not available".format(ARGSTR_PROCS))
+    PROCESS_TASK_ARGS = args
+    process_pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=args.get(ARGSTR_PROCS),
+        mp_context=multiprocessing.get_context('fork')
+    )
+    try:
+        future_task_dict = {
+            process_pool.submit(_perform_task_in_process, task): task
+            for task in task_list
+        }
+        failed_tasks = wait_for_tasks(future_task_dict)
+    finally:
+        process_pool.shutdown(wait=True, cancel_futures=True)
+        PROCESS_TASK_ARGS = None
+
+    check_failed_tasks(failed_tasks, len(task_list))
+
+
 def perform_tasks(args, task_list):
 
-    copy_method_obj = copy.copy(psu_cm.ARGMAP_COPY_METHOD_FUNC[args.get(psu_cm.ARGSTR_COPY_METHOD)])
+    if args.get(ARGSTR_PROCS) is not None and args.get(ARGSTR_PROCS) > 1 and len(task_list) > 1:
+        perform_tasks_in_processes(args, task_list)
+        return
+
+    if args.get(psu_cm.ARGSTR_COPY_METHOD) == psu_cm.ARGCHO_COPY_METHOD_COPY_STRIPED:
+        copy_method_obj = psu_cm.CopyMethod(
+            psu_cm.StripedCopy(
+                stripe_size=args.get(psu_cm.ARGSTR_STRIPE_SIZE_MB) * 1024 * 1024,
+                workers=args.get(psu_cm.ARGSTR_STRIPE_WORKERS)
+            ),
+            'copy_file_striped', 'copying'
+        )
+    elif args.get(psu_cm.ARGSTR_COPY_METHOD) == psu_cm.ARGCHO_COPY_METHOD_COPY_RESUMABLE:
+        copy_method_obj = psu_cm.CopyMethod(
+            psu_cm.ResumableCopy(
+                chunk_size=args.get(psu_cm.ARGSTR_RESUMABLE_CHUNK_SIZE_MB) * 1024 * 1024,
+                size_threshold=args.get(psu_cm.ARGSTR_RESUMABLE_SIZE_THRESHOLD_MB) * 1024 * 1024,
+                verify_chunk_hash=args.get(psu_cm.ARGSTR_RESUMABLE_VERIFY_CHUNKS)
+            ),
+            'copy_file_resumable', 'copying'
+        )
+    elif args.get(psu_cm.ARGSTR_COPY_METHOD) == psu_cm.ARGCHO_COPY_METHOD_COPY_FAST:
+        # With --debug, the kernel copy path taken by each file is logged
+        copy_method_obj = psu_cm.CopyMethod(
+            psu_cm.FastCopy(record_files=args.get(psu_act.ARGSTR_DEBUG)),
+            'copy_file_fast', 'copying'
+        )
+    elif args.get(psu_cm.ARGSTR_COPY_METHOD) == psu_cm.ARGCHO_COPY_METHOD_MOVE_FAST:
+        copy_method_obj = psu_cm.CopyMethod(
+            psu_cm.FastMove(workers=args.get(psu_cm.ARGSTR_COPY_TREE_WORKERS)),
+            'move_fast', 'moving'
+        )
+    elif args.get(psu_cm.ARGSTR_COPY_METHOD) == psu_cm.ARGCHO_COPY_METHOD_COPY_DEDUPE:
+        copy_method_obj = psu_cm.CopyMethod(
+            psu_cm.DedupeCopy(index_file=args.get(psu_cm.ARGSTR_DEDUPE_INDEX), save_on_flush=False),
+            'copy_file_dedupe', 'copying'
+        )
+    elif args.get(psu_cm.ARGSTR_COPY_METHOD) == psu_cm.ARGCHO_COPY_METHOD_COPY_TUNED and args.get(psu_cm.ARGSTR_COPY_BUFFER_KB) is not None:
+        copy_method_obj = psu_cm.CopyMethod(
+            psu_cm.TunedCopy(buffer_size=args.get(psu_cm.ARGSTR_COPY_BUFFER_KB) * 1024),
+            'copy_file_tuned', 'copying'
+        )
+    elif args.get(psu_cm.ARGSTR_COPY_METHOD) == psu_cm.ARGCHO_COPY_METHOD_COPY_HASH:
+        copy_method_obj = psu_cm.CopyMethod(
+            psu_cm.HashCopy(
+                algorithms=args.get(psu_cm.ARGSTR_HASH_ALGORITHMS),
+                manifest_prefix=args.get(psu_cm.ARGSTR_HASH_MANIFEST),
+                verify=args.get(psu_cm.ARGSTR_HASH_VERIFY)
+            ),
+            'copy_file_hash', 'copying'
+        )
+    else:
+        copy_method_obj = copy.copy(psu_cm.ARGMAP_COPY_METHOD_FUNC[args.get(psu_cm.ARGSTR_COPY_METHOD)])
+    if args.get(psu_cm.ARGSTR_COPY_LOG) is not None:
+        copy_event_log = psu_cm.CopyEventLog(
+            mode=args.get(psu_cm.ARGSTR_COPY_LOG),
+            count_bytes=(args.get(psu_cm.ARGSTR_COPY_LOG) == psu_cm.COPY_EVENT_LOG_MODE_SUMMARY),
+            logger=psu_log.PSUTILS_LOGGER
+        )
+    else:
+        copy_event_log = None
+    if args.get(psu_cm.ARGSTR_PLAN_OUT) is not None:
+        if args.get(psu_cm.ARGSTR_OVERWRITE_FILES):
+            plan_overwrite_policy = psu_cm.COPY_OVERWRITE_POLICY_ALWAYS
+        elif args.get(psu_cm.ARGSTR_OVERWRITE_POLICY) is not None:
+            plan_overwrite_policy = args.get(psu_cm.ARGSTR_OVERWRITE_POLICY)
+        else:
+            plan_overwrite_policy = psu_cm.COPY_OVERWRITE_POLICY_NEVER
+        copy_plan = psu_cm.CopyPlanWriter(
+            args.get(psu_cm.ARGSTR_PLAN_OUT),
+            copy_method=args.get(psu_cm.ARGSTR_COPY_METHOD),
+            overwrite_policy=plan_overwrite_policy
+        )
+    else:
+        copy_plan = None
+
     copy_method_obj.set_options(
         copy_overwrite_files=args.get(psu_cm.ARGSTR_OVERWRITE_FILES),
         copy_overwrite_dirs=args.get(psu_cm.ARGSTR_OVERWRITE_DIRS),
         copy_dryrun=args.get(psu_act.ARGSTR_DRYRUN),
         copy_verbose=(not args.get(psu_act.ARGSTR_QUIET)),
-        copy_debug=args.get(psu_act.ARGSTR_DEBUG)
+        copy_debug=args.get(psu_act.ARGSTR_DEBUG),
+        copy_batch_size=args.get(psu_cm.ARGSTR_COPY_BATCH_SIZE),
+        copy_overwrite_policy=args.get(psu_cm.ARGSTR_OVERWRITE_POLICY),
+        copy_tree_workers=args.get(psu_cm.ARGSTR_COPY_TREE_WORKERS),
+        copy_background_delete=args.get(psu_cm.ARGSTR_OVERWRITE_DIRS_BACKGROUND),
+        copy_event_log=copy_event_log,
+        copy_durability=args.get(psu_cm.ARGSTR_DURABILITY),
+        copy_plan=copy_plan
     )
 
+    if args.get(psu_walk.ARGSTR_WALK_STATS) is not None:
+        walk_stats = psu_walk.WalkStats(
+            topn=args.get(psu_walk.ARGSTR_WALK_STATS_TOPN),
+            sample_rate=args.get(psu_walk.ARGSTR_WALK_STATS_SAMPLE)
+        )
+    else:
+        walk_stats = None
+
+    if args.get(psu_walk.ARGSTR_PIPELINE):
+        walk_pipeline = psu_walk.WalkPipeline(
+            list_workers=args.get(psu_walk.ARGSTR_PIPELINE_LIST_WORKERS),
+            mkdir_workers=args.get(psu_walk.ARGSTR_PIPELINE_MKDIR_WORKERS),
+            copy_workers=args.get(psu_cm.ARGSTR_COPY_WORKERS),
+            verify_workers=args.get(psu_walk.ARGSTR_PIPELINE_VERIFY_WORKERS),
+            queue_size=args.get(psu_walk.ARGSTR_PIPELINE_QUEUE_SIZE)
+        )
+    else:
+        walk_pipeline = None
+
     walk_object = psu_walk.WalkObject(
         mindepth=args.get(psu_walk.ARGSTR_MINDEPTH), maxdepth=args.get(psu_walk.ARGSTR_MAXDEPTH),
         outdepth=args.get(psu_walk.ARGSTR_OUTDEPTH), dmatch_maxdepth=args.get(psu_walk.ARGSTR_DMATCH_MAXDEPTH),
@@ -477,24 +829,26 @@ def perform_tasks(args, task_list):
         allow_dir_op=(False if args.get(psu_cm.ARGSTR_SYMLINK_FILES) else None), mkdir_upon_file_copy=args.get(psu_cm.ARGSTR_MKDIR_UPON_FILE_COPY),
         sync_tree=args.get(psu_tl.ARGSTR_SYNC_TREE), transplant_tree=args.get(psu_tl.ARGSTR_TRANSPLANT_TREE), collapse_tree=args.get(psu_tl.ARGSTR_COLLAPSE_TREE),
         copy_dryrun=args.get(psu_act.ARGSTR_DRYRUN), copy_quiet=args.get(psu_act.ARGSTR_QUIET), copy_debug=args.get(psu_act.ARGSTR_DEBUG),
-        track_initialize_total=(args.get(psu_walk.ARGSTR_COUNT_FIRST) == psu_walk.ARGCHO_COUNT_FIRST_ON)
+        track_initialize_total=(args.get(psu_walk.ARGSTR_COUNT_FIRST) == psu_walk.ARGCHO_COUNT_FIRST_ON),
+        walk_stats=walk_stats,
+        copy_workers=args.get(psu_cm.ARGSTR_COPY_WORKERS),
+        walk_pipeline=walk_pipeline,
+        copy_order=args.get(psu_cm.ARGSTR_COPY_ORDER),
+        copy_order_window=args.get(psu_cm.ARGSTR_COPY_ORDER_WINDOW)
     )
 
-    do_record_hardlinks = (args.get(psu_cm.ARGSTR_COPY_METHOD) == psu_cm.ARGCHO_COPY_METHOD_LINK and not args.get(ARGSTR_NO_HARDLINK_RECORDS))
+    do_record_hardlinks = (    args.get(psu_cm.ARGSTR_COPY_METHOD) in (psu_cm.ARGCHO_COPY_METHOD_LINK, psu_cm.ARGCHO_COPY_METHOD_LINK_SYSTEM)
+                           and args.get(ARGSTR_HARDLINK_RECORDS))
     if do_record_hardlinks:
-        hardlink_record_dir = args.get(ARGSTR_HARDLINK_RECORDS_DIR)
-        copy_method_obj_symlink_record = copy.copy(psu_cm.ARGMAP_COPY_METHOD_FUNC[psu_cm.ARGCHO_COPY_METHOD_SYMLINK])
-        copy_method_obj_symlink_record.set_options(
-            recursive_file_op=False,
-            copy_overwrite_files=True,
-            copy_overwrite_dirs=True,
-            copy_dryrun=args.get(psu_act.ARGSTR_DRYRUN),
-            copy_verbose=args.get(psu_act.ARGSTR_DEBUG),
-            copy_debug=args.get(psu_act.ARGSTR_DEBUG)
+        hardlink_record_writer = HardlinkRecordWriter(
+            args.get(ARGSTR_HARDLINK_RECORDS_DIR),
+            manifest_file=args.get(ARGSTR_HARDLINK_RECORDS_MANIFEST),
+            workers=args.get(ARGSTR_HARDLINK_RECORDS_WORKERS),
+            dryrun=args.get(psu_act.ARGSTR_DRYRUN),
+            verbose=args.get(psu_act.ARGSTR_DEBUG)
         )
 
-    tqdm_func = tqdm if imported_tqdm and len(task_list) > 1 else identity
-    for task_srcpath, task_dstpath in tqdm_func(task_list):
+    def perform_task(task_walk_object, task_srcpath, task_dstpath):
         if os.path.isfile(task_srcpath):
             task_srcfile = task_srcpath
             task_dstfile = task_dstpath
@@ -502,32 +856,77 @@ def perform_tasks(args, task_list):
         else:
             task_srcdir = task_srcpath
             task_dstdir = task_dstpath
-            for x in walk_object.walk(task_srcdir, task_dstdir):
+            for x in task_walk_object.walk(task_srcdir, task_dstdir):
                 pass
 
+    def record_task(task_srcpath, task_dstpath):
         if do_record_hardlinks:
-            task_dstpath_drive, task_dstpath_tail = os.path.splitdrive(os.path.realpath(task_dstpath))
-
-            record_dstpath_for_src = os.path.normpath(
-                "{}/src/{}/{}".format(
-                    hardlink_record_dir,
-                    task_dstpath_drive.rstrip(':'),
-                    task_dstpath_tail
-                )
-            )
-            record_dstpath_for_dst = os.path.normpath(
-                "{}/dst/{}/{}".format(
-                    hardlink_record_dir,
-                    task_dstpath_drive.rstrip(':'),
-                    task_dstpath_tail
-                )
-            )
+            hardlink_record_writer.add(task_srcpath, task_dstpath)
+
+    task_workers = args.get(ARGSTR_WORKERS)
+    failed_tasks = None
+    if task_workers is not None and task_workers > 1 and len(task_list) > 1:
+        # Walks keep per-walk state, so each thread walks with its own copy of the
+        # configured WalkObject. Progress is tracked by task instead of by file.
+        thread_walk_objects = threading.local()
+
+        def perform_task_in_thread(task_srcpath, task_dstpath):
+            if not hasattr(thread_walk_objects, 'walk_object'):
+                thread_walk_objects.walk_object = copy.copy(walk_object)
+                thread_walk_objects.walk_object.track_progress = False
+            perform_task(thread_walk_objects.walk_object, task_srcpath, task_dstpath)
+
+        thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=task_workers)
+        try:
+            future_task_dict = {
+                thread_pool.submit(perform_task_in_thread, task_srcpath, task_dstpath): (task_srcpath, task_dstpath)
+                for task_srcpath, task_dstpath in task_list
+            }
+            failed_tasks = wait_for_tasks(future_task_dict, on_task_done=record_task)
+        finally:
+            thread_pool.shutdown(wait=True, cancel_futures=True)
+    else:
+        tqdm_func = tqdm if imported_tqdm and len(task_list) > 1 else identity
+        for task_srcpath, task_dstpath in tqdm_func(task_list):
+            perform_task(walk_object, task_srcpath, task_dstpath)
+            record_task(task_srcpath, task_dstpath)
+
+    copy_method_obj.flush_batch()
+    copy_method_obj.flush_durability()
+    if isinstance(copy_method_obj.copy_fn, psu_cm.DedupeCopy) and not args.get(psu_act.ARGSTR_DRYRUN):
+        # Saved once here, rather than at the end of every task's walk
+        copy_method_obj.copy_fn.save()
+    if do_record_hardlinks:
+        hardlink_record_writer.flush()
+    psu_cm.flush_background_deletes()
+    if copy_event_log is not None:
+        copy_event_log.flush()
+        copy_event_log.log_summary()
+
+    if copy_plan is not None:
+        copy_plan.close()
+        info("Wrote plan file {}: {}".format(
+            copy_plan.plan_file,
+            ', '.join(["{} {}".format(count, action) for action, count in sorted(copy_plan.counts.items())])
+        ))
+
+    if hasattr(copy_method_obj.copy_fn, 'get_path_counts'):
+        path_counts = copy_method_obj.copy_fn.get_path_counts()
+        if path_counts:
+            info("Files by {} path: {}".format(
+                copy_method_obj.copy_fn_name,
+                ', '.join(["{} {}".format(count, copy_path) for copy_path, count in sorted(path_counts.items())])
+            ))
+
+    if walk_pipeline is not None:
+        walk_pipeline.log_metrics()
 
-            if os.path.realpath(record_dstpath_for_src) == record_dstpath_for_src:
-                copy_success = copy_method_obj_symlink_record.copy(task_srcpath, record_dstpath_for_src)
+    if walk_stats is not None:
+        walk_stats.write_json(args.get(psu_walk.ARGSTR_WALK_STATS))
+        walk_stats.log_summary()
 
-            if os.path.realpath(record_dstpath_for_dst) == record_dstpath_for_dst:
-                copy_success = copy_method_obj_symlink_record.copy(task_dstpath, record_dstpath_for_dst)
+    if failed_tasks is not None:
+        check_failed_tasks(failed_tasks, len(task_list))
 
 
 
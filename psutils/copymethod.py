@@ -1,11 +1,35 @@
 
+import atexit
+import collections
+import concurrent.futures
+import ctypes
+import errno
 import filecmp
+import functools
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import mmap
 import os
+import shlex
 import shutil
 import stat
+import tempfile
+import threading
 import types
+import zlib
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import psutils.custom_errors as cerr
 import psutils.globals as psu_globals
+import psutils.argtype as psu_at
+import psutils.hash as psu_hash
 from psutils.print_methods import *
 
 from psutils.shell import run_subprocess
@@ -28,6 +52,300 @@ for prog in ['cp', 'copy']:
     COPY_METHOD_SHPROGS_ACTION_VERB_DICT[prog] = 'copying'
 for prog in ['mv', 'move']:
     COPY_METHOD_SHPROGS_ACTION_VERB_DICT[prog] = 'moving'
+# Shell programs that accept a target directory option, so that many source
+# files can be transferred into the same directory with a single invocation
+COPY_METHOD_SHPROGS_BATCHABLE = set(['cp', 'ln', 'mv'])
+try:
+    COPY_BATCH_ARGLEN_MAX = os.sysconf('SC_ARG_MAX') // 4
+except (AttributeError, ValueError, OSError):
+    COPY_BATCH_ARGLEN_MAX = 32 * 1024
+COPY_BATCH_MAX_DIRS = 64
+COPY_MADE_DIRS_CACHE_MAX = 1024
+
+COPY_OVERWRITE_POLICY_NEVER = 'never'
+COPY_OVERWRITE_POLICY_ALWAYS = 'always'
+COPY_OVERWRITE_POLICY_IF_NEWER = 'if-newer'
+COPY_OVERWRITE_POLICY_IF_DIFFERENT_SIZE_MTIME = 'if-different-size-mtime'
+COPY_OVERWRITE_POLICY_IF_DIFFERENT_CHECKSUM = 'if-different-checksum'
+COPY_OVERWRITE_POLICY_CHOICES = [
+    COPY_OVERWRITE_POLICY_NEVER,
+    COPY_OVERWRITE_POLICY_ALWAYS,
+    COPY_OVERWRITE_POLICY_IF_NEWER,
+    COPY_OVERWRITE_POLICY_IF_DIFFERENT_SIZE_MTIME,
+    COPY_OVERWRITE_POLICY_IF_DIFFERENT_CHECKSUM,
+]
+
+
+
+COPY_EVENT_LOG_MODE_LINES = 'lines'
+COPY_EVENT_LOG_MODE_BUFFERED = 'buffered'
+COPY_EVENT_LOG_MODE_SUMMARY = 'summary'
+COPY_EVENT_LOG_MODE_CHOICES = [
+    COPY_EVENT_LOG_MODE_LINES,
+    COPY_EVENT_LOG_MODE_BUFFERED,
+    COPY_EVENT_LOG_MODE_SUMMARY,
+]
+COPY_EVENT_LOG_BUFFER_SIZE = 1000
+
+
+class CopyEventLog(object):
+    def __init__(self, mode=COPY_EVENT_LOG_MODE_LINES,
+                 buffer_size=COPY_EVENT_LOG_BUFFER_SIZE,
+                 count_bytes=False,
+                 print_fn=None,
+                 logger=None, level=logging.INFO):
+        if mode not in COPY_EVENT_LOG_MODE_CHOICES:
+            raise cerr.InvalidArgumentError("`mode` must be one of {}, but was {}".format(COPY_EVENT_LOG_MODE_CHOICES, mode))
+        if buffer_size < 1:
+            raise cerr.InvalidArgumentError("`buffer_size` must be >= 1")
+        self.mode = mode
+        self.buffer_size = buffer_size
+        # Whether copy methods should stat sources whose size is not already known
+        self.count_bytes = count_bytes
+        # Lines go to `logger` at `level` if one is given, otherwise to `print_fn`
+        self.logger = logger
+        self.level = level
+        if print_fn is None:
+            print_fn = print if logger is None else functools.partial(logger.log, level)
+        self.print_fn = print_fn
+        # Events are kept as tuples and only formatted when they are written out
+        self.buffer = []
+        self.counts = collections.Counter()
+        self.nbytes = collections.Counter()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def format_event(event):
+        dryrun, action_verb, srcpath, dstpath, copy_info, size = event
+        return "{}{}: {} -> {}{}".format(
+            "(dryrun) " if dryrun else '', action_verb,
+            srcpath, dstpath,
+            " ({})".format(copy_info) if copy_info is not None else ''
+        )
+
+    def lines_enabled(self):
+        return (    self.mode != COPY_EVENT_LOG_MODE_SUMMARY
+                and (self.logger is None or self.logger.isEnabledFor(self.level)))
+
+    def emit(self, dryrun, action_verb, srcpath, dstpath, copy_info=None, size=None, write_line=True):
+        # Every event is counted for the summary, but only events that would
+        # actually be written out are kept
+        write_events = None
+        with self.lock:
+            key = (action_verb, copy_info)
+            self.counts[key] += 1
+            if size is not None:
+                self.nbytes[key] += size
+            if not write_line or not self.lines_enabled():
+                return
+            event = (dryrun, action_verb, srcpath, dstpath, copy_info, size)
+            self.buffer.append(event)
+            if self.mode == COPY_EVENT_LOG_MODE_LINES or len(self.buffer) >= self.buffer_size:
+                write_events = self.buffer
+                self.buffer = []
+        if write_events:
+            self._write(write_events)
+
+    def _write(self, events):
+        self.print_fn('\n'.join([self.format_event(event) for event in events]))
+
+    def flush(self):
+        with self.lock:
+            write_events = self.buffer
+            self.buffer = []
+        if write_events:
+            self._write(write_events)
+
+    def get_summary(self):
+        with self.lock:
+            return [
+                {'action': action_verb, 'reason': copy_info, 'count': count, 'bytes': self.nbytes[(action_verb, copy_info)]}
+                for (action_verb, copy_info), count in sorted(self.counts.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+            ]
+
+    def log_summary(self, print_fn=info):
+        for item in self.get_summary():
+            print_fn("{}{}: {} paths{}".format(
+                item['action'], " ({})".format(item['reason']) if item['reason'] is not None else '',
+                item['count'], ", {} bytes".format(item['bytes']) if item['bytes'] > 0 else ''
+            ))
+
+
+COPY_PLAN_ACTION_HEADER = 'PLAN'
+COPY_PLAN_ACTION_MKDIR = 'MKDIR'
+COPY_PLAN_ACTION_SKIP = 'SKIPPING'
+COPY_PLAN_OVERWRITE_FILE = 'file'
+COPY_PLAN_OVERWRITE_DIR = 'dir'
+COPY_PLAN_TYPE_FILE = 'file'
+COPY_PLAN_TYPE_DIR = 'dir'
+COPY_PLAN_TYPE_LINK = 'link'
+
+
+class CopyPlanWriter(object):
+    # Writes a header line with the copy method and overwrite policy the plan
+    # was made with, then one JSON object per line for every planned operation:
+    #   {"action": ..., "reason": ..., "size": ..., "type": ..., "overwrite": ..., "src": ..., "dst": ...}
+    # Lines from concurrent copy threads are written whole under a lock.
+    def __init__(self, plan_file, copy_method=None, overwrite_policy=None):
+        self.plan_file = plan_file
+        self.fp = open(plan_file, 'w')
+        self.lock = threading.Lock()
+        self.counts = collections.Counter()
+        # The walk can plan the same destination directory more than once
+        self.planned_dirs = set()
+        self.fp.write(json.dumps({
+            'action': COPY_PLAN_ACTION_HEADER, 'method': copy_method, 'overwrite_policy': overwrite_policy,
+        }, separators=(',', ':'))+'\n')
+
+    def write(self, action, srcpath, dstpath, reason=None, size=None, path_type=None, overwrite=None):
+        if action == COPY_PLAN_ACTION_MKDIR:
+            with self.lock:
+                if dstpath in self.planned_dirs:
+                    return
+                self.planned_dirs.add(dstpath)
+        line = json.dumps({
+            'action': action, 'reason': reason, 'size': size, 'type': path_type,
+            'overwrite': overwrite, 'src': srcpath, 'dst': dstpath,
+        }, separators=(',', ':'))
+        with self.lock:
+            self.fp.write(line+'\n')
+            self.counts[action] += 1
+
+    def close(self):
+        with self.lock:
+            if not self.fp.closed:
+                self.fp.close()
+
+
+def read_copy_plan(plan_file, include_skipped=False):
+    with open(plan_file, 'r') as plan_fp:
+        for line in plan_fp:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry['action'] == COPY_PLAN_ACTION_HEADER:
+                continue
+            if entry['action'] == COPY_PLAN_ACTION_SKIP and not include_skipped:
+                continue
+            yield entry
+
+
+def read_copy_plan_header(plan_file):
+    # Plans written before the header was added have none
+    with open(plan_file, 'r') as plan_fp:
+        for line in plan_fp:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry['action'] == COPY_PLAN_ACTION_HEADER:
+                return entry
+            break
+    return {'action': COPY_PLAN_ACTION_HEADER, 'method': None, 'overwrite_policy': None}
+
+
+def get_copy_plan_replay_policy(plan_policy):
+    # Files the plan overwrites are not forced on replay, but decided again by
+    # the overwrite policy, so that performing a plan twice is a no-op.
+    # Unconditional overwrites replace only files that are not identical.
+    if plan_policy in (None, COPY_OVERWRITE_POLICY_ALWAYS):
+        return COPY_OVERWRITE_POLICY_IF_DIFFERENT_SIZE_MTIME
+    return plan_policy
+
+
+def get_tree_size(path):
+    # Total size of the regular files in a directory tree, not following symlinks
+    size = 0
+    dir_stack = [path]
+    while dir_stack:
+        try:
+            dirent_list = list(os.scandir(dir_stack.pop()))
+        except OSError:
+            continue
+        for dirent in dirent_list:
+            try:
+                if dirent.is_dir(follow_symlinks=False):
+                    dir_stack.append(dirent.path)
+                elif dirent.is_file(follow_symlinks=False):
+                    size += dirent.stat(follow_symlinks=False).st_size
+            except OSError:
+                continue
+    return size
+
+
+def get_copy_plan_shards(entries, nshards):
+    # Balance shards by bytes, assigning the largest entries first to whichever
+    # shard currently has the least work. Ties are broken by destination path
+    # so that every cluster job computes the same assignment.
+    if nshards < 1:
+        raise cerr.InvalidArgumentError("`nshards` must be >= 1")
+    shards = [[] for i in range(nshards)]
+    shard_heap = [(0, i) for i in range(nshards)]
+    for entry in sorted(entries, key=lambda entry: (-(entry['size'] or 0), entry['dst'])):
+        nbytes, shard_index = heapq.heappop(shard_heap)
+        shards[shard_index].append(entry)
+        # Count every entry as at least one block, so that empty files and directories also spread out
+        heapq.heappush(shard_heap, (nbytes + max(entry['size'] or 0, 4096), shard_index))
+    # Directories are created first within each shard, in path order
+    for shard in shards:
+        shard.sort(key=lambda entry: (entry['action'] != COPY_PLAN_ACTION_MKDIR, entry['dst'] if entry['action'] == COPY_PLAN_ACTION_MKDIR else ''))
+    return shards
+
+
+def split_copy_plan(plan_file, nshards, out_prefix):
+    header = read_copy_plan_header(plan_file)
+    shards = get_copy_plan_shards(read_copy_plan(plan_file), nshards)
+    shard_file_list = []
+    for shard_index, shard in enumerate(shards):
+        shard_file = "{}.{:0{}d}.jsonl".format(out_prefix, shard_index, len(str(nshards - 1)))
+        with open(shard_file, 'w') as shard_fp:
+            shard_fp.write(json.dumps(header, separators=(',', ':'))+'\n')
+            for entry in shard:
+                shard_fp.write(json.dumps(entry, separators=(',', ':'))+'\n')
+        shard_file_list.append(shard_file)
+    return shard_file_list
+
+
+def replay_copy_plan(copy_method, entries, copy_workers=1, callback=None):
+    # Perform the planned operations without walking the source again.
+    # Destinations are still checked by CopyMethod.copy, so a plan that has
+    # gone stale since it was written is handled like a normal rerun.
+    # Existing destination files are replaced according to the overwrite
+    # policy of `copy_method` (see `get_copy_plan_replay_policy`).
+    counts = collections.Counter()
+
+    def copy_done(copy_success):
+        counts['done' if copy_success else 'skipped'] += 1
+        if callback is not None:
+            callback(copy_success)
+
+    copy_executor = CopyExecutor(copy_workers)
+    try:
+        for entry in entries:
+            if entry['action'] == COPY_PLAN_ACTION_MKDIR:
+                if not copy_method.dryrun:
+                    copy_method._makedirs(entry['dst'])
+                counts['mkdir'] += 1
+                continue
+            if entry['type'] == COPY_PLAN_TYPE_DIR:
+                srcpath_is_file = False
+            elif entry['type'] is not None:
+                srcpath_is_file = True
+            else:
+                srcpath_is_file = None
+            copy_executor.submit(
+                copy_method.copy, entry['src'], entry['dst'],
+                srcpath_is_file=srcpath_is_file,
+                overwrite_dir=(True if entry['overwrite'] == COPY_PLAN_OVERWRITE_DIR else None),
+                callback=copy_done
+            )
+        copy_executor.wait()
+        copy_method.flush_batch()
+        copy_method.flush_durability()
+    finally:
+        copy_executor.shutdown(cancel_pending=True)
+    return counts
 
 
 class CopyMethod(object):
@@ -90,6 +408,8 @@ class CopyMethod(object):
         self.copy_shcmd = copy_shcmd
         self.copy_shprog = copy_shprog
         self.copy_shcmd_is_fmtstr = copy_shcmd_is_fmtstr
+        # Metadata-only methods never create destination paths
+        self.metadata_only = getattr(copy_fn, 'metadata_only', False)
 
         self.recursive_file_op = recursive_file_op
         self.check_srcpath_exists = True
@@ -100,22 +420,45 @@ class CopyMethod(object):
         self.verbose = True
         self.debug = False
 
+        self.copy_overwrite_policy = COPY_OVERWRITE_POLICY_NEVER
+        self.copy_tree_workers = 1
+        self.copy_background_delete = False
+        self.event_log = None
+        self.durability_tracker = None
+        self.copy_plan = None
+
+        self.copy_batch_size = 1
+        self.batch_queue = collections.OrderedDict()
+        self.batch_lock = threading.Lock()
+
+        self.made_dirs = set()
+        self.metadata_ops = collections.Counter()
+        self.metadata_ops_lock = threading.Lock()
+
     def __copy__(self):
         copy_method = CopyMethod(self.copy_fn, self.copy_fn_name, self.action_verb,
                                  self.reverse_args, self.copy_shcmd_is_fmtstr)
         copy_method.set_options(
             self.recursive_file_op, self.check_srcpath_exists,
             self.copy_makedirs, self.copy_overwrite_files, self.copy_overwrite_dirs,
-            self.dryrun, self.verbose, self.debug)
+            self.dryrun, self.verbose, self.debug,
+            self.copy_batch_size, self.copy_overwrite_policy,
+            self.copy_tree_workers, self.copy_background_delete,
+            self.event_log, self.durability_tracker,
+            self.copy_plan)
         return copy_method
 
     def set_options(self,
                     recursive_file_op=None, check_srcpath_exists=None,
                     copy_makedirs=None, copy_overwrite_files=None, copy_overwrite_dirs=None,
-                    copy_dryrun=None, copy_verbose=None, copy_debug=None):
-        if recursive_file_op:
+                    copy_dryrun=None, copy_verbose=None, copy_debug=None,
+                    copy_batch_size=None, copy_overwrite_policy=None,
+                    copy_tree_workers=None, copy_background_delete=None,
+                    copy_event_log=None, copy_durability=None,
+                    copy_plan=None):
+        if recursive_file_op is not None:
             self.recursive_file_op = recursive_file_op
-        if check_srcpath_exists:
+        if check_srcpath_exists is not None:
             self.check_srcpath_exists = check_srcpath_exists
         if copy_makedirs is not None:
             self.copy_makedirs = copy_makedirs
@@ -129,6 +472,52 @@ class CopyMethod(object):
             self.verbose = copy_verbose
         if copy_debug is not None:
             self.debug = copy_debug
+        if copy_batch_size is not None:
+            if copy_batch_size < 1:
+                raise cerr.InvalidArgumentError("`copy_batch_size` must be >= 1")
+            self.copy_batch_size = copy_batch_size
+        if copy_overwrite_policy is not None:
+            if copy_overwrite_policy not in COPY_OVERWRITE_POLICY_CHOICES:
+                raise cerr.InvalidArgumentError("`copy_overwrite_policy` must be one of {}, "
+                                                "but was {}".format(COPY_OVERWRITE_POLICY_CHOICES, copy_overwrite_policy))
+            self.copy_overwrite_policy = copy_overwrite_policy
+        if copy_tree_workers is not None:
+            if copy_tree_workers < 1:
+                raise cerr.InvalidArgumentError("`copy_tree_workers` must be >= 1")
+            self.copy_tree_workers = copy_tree_workers
+        if copy_background_delete is not None:
+            self.copy_background_delete = copy_background_delete
+        if copy_event_log is not None:
+            self.event_log = copy_event_log
+        if copy_durability is not None:
+            # Either a policy name, or a DurabilityTracker to share with other copy methods
+            if isinstance(copy_durability, DurabilityTracker):
+                self.durability_tracker = copy_durability
+            elif copy_durability == COPY_DURABILITY_NONE:
+                self.durability_tracker = None
+            elif copy_durability in COPY_DURABILITY_CHOICES:
+                self.durability_tracker = DurabilityTracker(copy_durability)
+            else:
+                raise cerr.InvalidArgumentError("`copy_durability` must be one of {}, "
+                                                "but was {}".format(COPY_DURABILITY_CHOICES, copy_durability))
+            if self.durability_tracker is not None and hasattr(self.copy_fn, 'hold_source_deletes'):
+                if not self.copy_fn.hold_source_deletes:
+                    # Moved sources may only be deleted once their copies are durable
+                    self.copy_fn = self.copy_fn.with_held_source_deletes()
+            elif self.durability_tracker is not None and self.action_verb == 'MOVING':
+                # Other moves delete the source before the copy can be made durable
+                raise cerr.InvalidArgumentError("`copy_durability` requires a move method that can hold "
+                                                "source deletes, like move_fast, but was used with {}".format(
+                                                self.copy_fn_name if self.copy_shcmd is None else self.copy_shcmd))
+        if copy_plan is not None:
+            self.copy_plan = copy_plan
+
+    def can_batch(self):
+        return (    self.copy_batch_size > 1
+                and self.copy_shcmd is not None
+                and not self.copy_shcmd_is_fmtstr
+                and not self.reverse_args
+                and self.copy_shprog in COPY_METHOD_SHPROGS_BATCHABLE)
 
     def get_copy_shcmd_full(self, srcpath, dstpath):
         if self.copy_shcmd is None:
@@ -158,9 +547,263 @@ class CopyMethod(object):
         else:
             self.copy_fn(srcpath, dstpath)
 
+    def _queue_batch(self, srcpath, dstdir, copy_info=None, srcpath_stat=None):
+        # Batched files are logged once the outcome of their batch is known
+        flush_items = []
+        with self.batch_lock:
+            if dstdir not in self.batch_queue:
+                self.batch_queue[dstdir] = [[], 0]
+            batch = self.batch_queue[dstdir]
+            batch[0].append((srcpath, copy_info, srcpath_stat))
+            batch[1] += len(srcpath) + 1
+            if len(batch[0]) >= self.copy_batch_size or batch[1] >= COPY_BATCH_ARGLEN_MAX:
+                flush_items.append((dstdir, self.batch_queue.pop(dstdir)[0]))
+            if len(self.batch_queue) > COPY_BATCH_MAX_DIRS:
+                dstdir_oldest, batch_oldest = self.batch_queue.popitem(last=False)
+                flush_items.append((dstdir_oldest, batch_oldest[0]))
+        for dstdir, batch_items in flush_items:
+            self._exec_batch(dstdir, batch_items)
+
+    def flush_batch(self):
+        with self.batch_lock:
+            flush_items = [(dstdir, batch[0]) for dstdir, batch in self.batch_queue.items()]
+            self.batch_queue.clear()
+        for dstdir, batch_items in flush_items:
+            self._exec_batch(dstdir, batch_items)
+        # Copies must pass their durability barrier before the copy function
+        # finishes any follow-up work on them, like deleting moved sources
+        if self.durability_tracker is not None and self.durability_tracker.policy != COPY_DURABILITY_END_OF_RUN:
+            self.durability_tracker.flush()
+        if not self.dryrun and hasattr(self.copy_fn, 'flush'):
+            self.copy_fn.flush()
+
+    def flush_durability(self):
+        if self.durability_tracker is not None:
+            self.durability_tracker.flush()
+            if not self.dryrun and hasattr(self.copy_fn, 'flush'):
+                self.copy_fn.flush()
+
+    def _exec_batch(self, dstdir, batch_items):
+        # POSIX form `prog [options] -- source_file... target_dir`
+        srcpath_list = [srcpath for srcpath, _, _ in batch_items]
+        cmd_token_list = shlex.split(self.copy_shcmd) + ['--'] + srcpath_list + [dstdir]
+        if self.debug:
+            debug(' '.join(cmd_token_list))
+        return_code = run_subprocess(cmd_token_list=cmd_token_list,
+                                     throw_exception_in_failure=False,
+                                     print_failure_info=self.debug)
+        if return_code == 0:
+            for srcpath, copy_info, srcpath_stat in batch_items:
+                self._log_copy(srcpath, os.path.join(dstdir, os.path.basename(srcpath)), copy_info, srcpath_stat)
+            return
+        # A failed batch is redone one file at a time, so that the exit status
+        # of every file is checked, and all failing files are reported together.
+        # Files that mv or ln already transferred can't be redone, since their
+        # source is gone or their destination exists.
+        failures = []
+        for srcpath, copy_info, srcpath_stat in batch_items:
+            dstpath = os.path.join(dstdir, os.path.basename(srcpath))
+            if self.copy_shprog == 'mv' and not os.path.lexists(srcpath):
+                return_code = 0
+            elif self.copy_shprog == 'ln' and os.path.lexists(dstpath):
+                return_code = 0
+            else:
+                return_code = run_subprocess(self.get_copy_shcmd_full(srcpath, dstpath),
+                                             throw_exception_in_failure=False,
+                                             print_failure_info=self.debug)
+            if return_code != 0:
+                copy_info = "FAILED; exit status {}".format(return_code)
+                failures.append(srcpath)
+            self._log_copy(srcpath, dstpath, copy_info, srcpath_stat)
+        if failures:
+            raise cerr.ExternalError("{} of {} files failed to transfer to {} with '{}': {}".format(
+                len(failures), len(batch_items), dstdir, self.copy_shcmd, failures))
+
+    def _count_metadata_op(self, op):
+        with self.metadata_ops_lock:
+            self.metadata_ops[op] += 1
+
+    def get_metadata_op_counts(self):
+        with self.metadata_ops_lock:
+            return dict(self.metadata_ops)
+
+    def reset_metadata_op_counts(self):
+        with self.metadata_ops_lock:
+            self.metadata_ops.clear()
+
+    def _lstat(self, path):
+        self._count_metadata_op('lstat')
+        try:
+            return os.lstat(path)
+        except FileNotFoundError:
+            return None
+
+    def _stat(self, path):
+        self._count_metadata_op('stat')
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            return None
+
+    def _resolve_stat(self, path, path_stat):
+        # `path_stat` may be None, an os.stat_result, or an os.DirEntry
+        # (whose non-following stat is cached after the first call).
+        if path_stat is None:
+            path_stat = self._lstat(path)
+        elif not isinstance(path_stat, os.stat_result):
+            self._count_metadata_op('lstat')
+            try:
+                path_stat = path_stat.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                path_stat = None
+        if path_stat is not None and stat.S_ISLNK(path_stat.st_mode):
+            path_stat = self._stat(path)
+        return path_stat
+
+    def _makedirs(self, dirpath):
+        if dirpath in self.made_dirs:
+            return
+        self._count_metadata_op('makedirs')
+        os.makedirs(dirpath, exist_ok=True)
+        if len(self.made_dirs) >= COPY_MADE_DIRS_CACHE_MAX:
+            self.made_dirs.clear()
+        self.made_dirs.add(dirpath)
+
+    def get_overwrite_reason(self, srcpath, dstpath, srcpath_stat, dstpath_stat, policy=None):
+        if policy is None:
+            policy = self.copy_overwrite_policy
+        if policy == COPY_OVERWRITE_POLICY_ALWAYS:
+            return "overwrite policy is '{}'".format(policy)
+        elif policy == COPY_OVERWRITE_POLICY_NEVER or srcpath_stat is None or dstpath_stat is None:
+            return None
+        elif policy == COPY_OVERWRITE_POLICY_IF_NEWER:
+            if srcpath_stat.st_mtime_ns > dstpath_stat.st_mtime_ns:
+                return "source is newer"
+        elif srcpath_stat.st_size != dstpath_stat.st_size:
+            return "size differs"
+        elif policy == COPY_OVERWRITE_POLICY_IF_DIFFERENT_SIZE_MTIME:
+            # Compare whole seconds, like rsync's quick check
+            if int(srcpath_stat.st_mtime) != int(dstpath_stat.st_mtime):
+                return "modification time differs"
+        elif policy == COPY_OVERWRITE_POLICY_IF_DIFFERENT_CHECKSUM:
+            if psu_hash.get_file_hash(srcpath) != psu_hash.get_file_hash(dstpath):
+                return "checksum differs"
+        return None
+
+    def _log_copy(self, srcpath, dstpath, copy_info, srcpath_stat=None):
+        if self.event_log is not None:
+            self.event_log.emit(
+                self.dryrun, self.action_verb, srcpath, dstpath, copy_info,
+                srcpath_stat.st_size if (srcpath_stat is not None and stat.S_ISREG(srcpath_stat.st_mode)) else None,
+                write_line=self.verbose
+            )
+        elif self.verbose:
+            print("{}{}: {} -> {}{}".format(
+                "(dryrun) " if self.dryrun else '', self.action_verb,
+                srcpath, dstpath,
+                " ({})".format(copy_info) if copy_info is not None else ''
+            ))
+
+    def record_plan_mkdir(self, dstdir):
+        if self.copy_plan is not None:
+            self.copy_plan.write(COPY_PLAN_ACTION_MKDIR, None, dstdir)
+
+    def _record_plan(self, srcpath, dstpath, copy_info, proceed_with_copy,
+                     srcpath_stat=None, overwrite=None):
+        size = None
+        path_type = None
+        if srcpath_stat is not None:
+            if stat.S_ISLNK(srcpath_stat.st_mode):
+                path_type = COPY_PLAN_TYPE_LINK
+            elif stat.S_ISDIR(srcpath_stat.st_mode):
+                path_type = COPY_PLAN_TYPE_DIR
+                if proceed_with_copy:
+                    # A directory transferred as one operation is weighted by its contents when the plan is sharded
+                    size = get_tree_size(srcpath)
+            else:
+                path_type = COPY_PLAN_TYPE_FILE
+                size = srcpath_stat.st_size
+        if proceed_with_copy:
+            self.copy_plan.write(self.action_verb, srcpath, dstpath, copy_info, size, path_type, overwrite)
+        else:
+            self.copy_plan.write(COPY_PLAN_ACTION_SKIP, srcpath, dstpath, copy_info, size, path_type)
+
+    def _sync_metadata(self, srcpath, dstpath, srcpath_stat=None):
+        if srcpath_stat is None:
+            srcpath_lstat = self._lstat(srcpath)
+        elif not isinstance(srcpath_stat, os.stat_result):
+            self._count_metadata_op('lstat')
+            try:
+                srcpath_lstat = srcpath_stat.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                srcpath_lstat = None
+        else:
+            srcpath_lstat = srcpath_stat
+
+        differences = None
+        if srcpath_lstat is None:
+            copy_info = "SKIPPING; source path does not exist"
+        else:
+            dstpath_lstat = self._lstat(dstpath)
+            if dstpath_lstat is None:
+                copy_info = "SKIPPING; destination path does not exist"
+            elif stat.S_IFMT(srcpath_lstat.st_mode) != stat.S_IFMT(dstpath_lstat.st_mode):
+                copy_info = "SKIPPING; source and destination file types differ"
+            else:
+                differences = self.copy_fn.get_differences(srcpath_lstat, dstpath_lstat)
+                if differences:
+                    copy_info = "SYNCING METADATA; differs in {}".format(', '.join(differences))
+                else:
+                    copy_info = "SKIPPING; metadata already matches"
+
+        self._log_copy(srcpath, dstpath, copy_info)
+
+        if not differences:
+            return False
+        if not self.dryrun:
+            self._count_metadata_op('setattr')
+            self.copy_fn.apply(dstpath, srcpath_lstat, differences)
+        return True
+
     def copy(self, srcpath, dstpath,
              srcpath_is_file=None,
-             overwrite_file=None, overwrite_dir=None):
+             overwrite_file=None, overwrite_dir=None,
+             srcpath_stat=None,
+             on_durable=None, defer_durable=False):
+        # `on_durable(copy_success)` is called once the copy has passed its
+        # durability barrier, which may be after this method returns.
+        # With `defer_durable`, the caller registers the copy with `add_durable`
+        # itself, after any checks of its own.
+
+        if self.metadata_only:
+            copy_success = self._sync_metadata(srcpath, dstpath, srcpath_stat)
+        else:
+            copy_success = self._copy(srcpath, dstpath, srcpath_is_file,
+                                      overwrite_file, overwrite_dir, srcpath_stat)
+
+        if not defer_durable:
+            self.add_durable(srcpath, dstpath, copy_success, on_durable)
+
+        return copy_success
+
+    def add_durable(self, srcpath, dstpath, copy_success, on_durable=None):
+        if copy_success and not self.dryrun and self.durability_tracker is not None:
+            self.durability_tracker.add(
+                dstpath, functools.partial(self._durable_done, srcpath, copy_success, on_durable)
+            )
+        elif on_durable is not None:
+            on_durable(copy_success)
+
+    def _durable_done(self, srcpath, copy_success, on_durable):
+        if getattr(self.copy_fn, 'hold_source_deletes', False):
+            self.copy_fn.delete_source(srcpath)
+        if on_durable is not None:
+            on_durable(copy_success)
+
+    def _copy(self, srcpath, dstpath,
+              srcpath_is_file=None,
+              overwrite_file=None, overwrite_dir=None,
+              srcpath_stat=None):
 
         if overwrite_file is None:
             overwrite_file = self.copy_overwrite_files
@@ -170,21 +813,29 @@ class CopyMethod(object):
         copy_info = None
         proceed_with_copy = False
 
-        srcpath_stat = None
-        dstpath_stat = None
+        srcpath_stat_resolved = False
+        dstpath_lstat = None
+        dstpath_is_dir = False
 
-        if self.check_srcpath_exists and os.path.exists(srcpath):
-            srcpath_stat = os.stat(srcpath)
+        if self.check_srcpath_exists:
+            srcpath_stat = self._resolve_stat(srcpath, srcpath_stat)
+            srcpath_stat_resolved = True
 
         if self.check_srcpath_exists and srcpath_stat is None:
             copy_info = "SKIPPING; source path does not exist"
             proceed_with_copy = False
         else:
-            if not os.path.exists(dstpath):
+            dstpath_lstat = self._lstat(dstpath)
+            if dstpath_lstat is None:
                 proceed_with_copy = True
             else:
-                dstpath_stat = os.stat(dstpath)
-                if stat.S_ISDIR(dstpath_stat.st_mode):
+                if stat.S_ISLNK(dstpath_lstat.st_mode):
+                    dstpath_stat = self._stat(dstpath)
+                    dstpath_is_dir = (dstpath_stat is not None and stat.S_ISDIR(dstpath_stat.st_mode))
+                else:
+                    dstpath_stat = dstpath_lstat
+                    dstpath_is_dir = stat.S_ISDIR(dstpath_lstat.st_mode)
+                if dstpath_is_dir:
                     # dstpath is a directory
                     if overwrite_dir:
                         copy_info = "OVERWRITING DIRECTORY"
@@ -197,25 +848,58 @@ class CopyMethod(object):
                     if overwrite_file:
                         copy_info = "OVERWRITING FILE"
                         proceed_with_copy = True
-                    elif self.action_verb in ['HARDLINKING', 'LINKING']:
-                        if srcpath_stat is None:
-                            srcpath_stat = os.stat(srcpath)
-                        if srcpath_stat.st_ino == dstpath_stat.st_ino:
+                    elif self.copy_overwrite_policy == COPY_OVERWRITE_POLICY_NEVER and self.action_verb not in ['HARDLINKING', 'LINKING']:
+                        copy_info = "SKIPPING; destination file already exists"
+                        proceed_with_copy = False
+                    else:
+                        if not srcpath_stat_resolved:
+                            srcpath_stat = self._resolve_stat(srcpath, srcpath_stat)
+                            srcpath_stat_resolved = True
+                        if (    self.action_verb in ['HARDLINKING', 'LINKING']
+                            and srcpath_stat is not None and dstpath_stat is not None
+                            and (srcpath_stat.st_ino, srcpath_stat.st_dev) == (dstpath_stat.st_ino, dstpath_stat.st_dev)):
                             copy_info = "SKIPPING; correct file hardlink already exists"
                             proceed_with_copy = False
                         else:
-                            copy_info = "SKIPPING; destination file already exists"
-                            proceed_with_copy = False
-                    else:
-                        copy_info = "SKIPPING; destination file already exists"
-                        proceed_with_copy = False
+                            overwrite_reason = self.get_overwrite_reason(srcpath, dstpath, srcpath_stat, dstpath_stat)
+                            if overwrite_reason is not None:
+                                copy_info = "OVERWRITING FILE; {}".format(overwrite_reason)
+                                proceed_with_copy = True
+                                overwrite_file = True
+                            elif self.copy_overwrite_policy == COPY_OVERWRITE_POLICY_NEVER:
+                                copy_info = "SKIPPING; destination file already exists"
+                                proceed_with_copy = False
+                            else:
+                                copy_info = "SKIPPING; destination file is up to date"
+                                proceed_with_copy = False
 
-        if self.verbose:
-            print("{}{}: {} -> {}{}".format(
-                "(dryrun) " if self.dryrun else '', self.action_verb,
-                srcpath, dstpath,
-                " ({})".format(copy_info) if copy_info is not None else ''
-            ))
+        if (    proceed_with_copy and not srcpath_stat_resolved
+            and (self.copy_plan is not None or (self.event_log is not None and self.event_log.count_bytes))):
+            srcpath_stat = self._resolve_stat(srcpath, srcpath_stat)
+            srcpath_stat_resolved = True
+
+        if proceed_with_copy and not self.dryrun and srcpath_is_file is None and self.recursive_file_op:
+            if not srcpath_stat_resolved:
+                srcpath_stat = self._resolve_stat(srcpath, srcpath_stat)
+                srcpath_stat_resolved = True
+            srcpath_is_file = (srcpath_stat is None or not stat.S_ISDIR(srcpath_stat.st_mode))
+
+        # Batched copies complete later, so they can't be handed to a durability barrier
+        batch_copy = (    proceed_with_copy and not self.dryrun
+                      and (srcpath_is_file or not self.recursive_file_op)
+                      and self.durability_tracker is None and self.can_batch()
+                      and os.path.basename(srcpath) == os.path.basename(dstpath))
+        if not batch_copy:
+            self._log_copy(srcpath, dstpath, copy_info, srcpath_stat if srcpath_stat_resolved else None)
+        if self.copy_plan is not None:
+            if dstpath_lstat is None or not proceed_with_copy:
+                overwrite = None
+            elif dstpath_is_dir and overwrite_dir:
+                overwrite = COPY_PLAN_OVERWRITE_DIR
+            else:
+                overwrite = COPY_PLAN_OVERWRITE_FILE
+            self._record_plan(srcpath, dstpath, copy_info, proceed_with_copy,
+                              srcpath_stat if srcpath_stat_resolved else None, overwrite)
 
         if not proceed_with_copy:
             return proceed_with_copy
@@ -225,22 +909,29 @@ class CopyMethod(object):
 
         if not self.dryrun:
 
-            if dstpath_stat is not None:
-                if stat.S_ISDIR(dstpath_stat.st_mode) and overwrite_dir:
-                    shutil.rmtree(dstpath)
-                elif overwrite_file:
+            if dstpath_lstat is not None:
+                if dstpath_is_dir and overwrite_dir and not stat.S_ISLNK(dstpath_lstat.st_mode):
+                    self._count_metadata_op('rmtree')
+                    if self.copy_background_delete:
+                        BACKGROUND_DELETER.delete(dstpath)
+                    else:
+                        shutil.rmtree(dstpath)
+                elif overwrite_file or overwrite_dir:
+                    self._count_metadata_op('remove')
                     os.remove(dstpath)
 
             elif self.copy_makedirs:
-                os.makedirs(os.path.dirname(dstpath), exist_ok=True)
-
-            if srcpath_is_file is None and self.recursive_file_op:
-                if srcpath_stat is None:
-                    srcpath_stat = os.stat(srcpath)
-                srcpath_is_file = (not stat.S_ISDIR(srcpath_stat.st_mode))
+                self._makedirs(os.path.dirname(dstpath))
 
-            if srcpath_is_file or not self.recursive_file_op:
+            if batch_copy:
+                self._queue_batch(srcpath, os.path.dirname(dstpath), copy_info,
+                                  srcpath_stat if srcpath_stat_resolved else None)
+            elif srcpath_is_file or not self.recursive_file_op:
                 self.exec_copy_fn(srcpath, dstpath)
+            elif self.copy_tree_workers > 1:
+                copytree_parallel(srcpath, dstpath,
+                                  copy_function=self.exec_copy_fn,
+                                  workers=self.copy_tree_workers)
             else:
                 shutil.copytree(srcpath, dstpath,
                                 copy_function=self.exec_copy_fn)
@@ -248,6 +939,1385 @@ class CopyMethod(object):
         return proceed_with_copy
 
 
+
+def copytree_parallel(srcdir, dstdir, copy_function=shutil.copy2, workers=4,
+                      symlinks=False, ignore_dangling_symlinks=False):
+    errors = []
+    dir_pairs = []
+    file_pairs = []
+
+    # Create the destination directory skeleton first, collecting files to copy
+    os.makedirs(dstdir)
+    dir_stack = [(srcdir, dstdir)]
+    while dir_stack:
+        srcdir_cur, dstdir_cur = dir_stack.pop()
+        dir_pairs.append((srcdir_cur, dstdir_cur))
+        try:
+            dirent_list = list(os.scandir(srcdir_cur))
+        except OSError as why:
+            errors.append((srcdir_cur, dstdir_cur, str(why)))
+            continue
+        for dirent in dirent_list:
+            srcpath = dirent.path
+            dstpath = os.path.join(dstdir_cur, dirent.name)
+            try:
+                if dirent.is_symlink():
+                    if symlinks:
+                        os.symlink(os.readlink(srcpath), dstpath)
+                        shutil.copystat(srcpath, dstpath, follow_symlinks=False)
+                        continue
+                    if not os.path.exists(srcpath):
+                        if not ignore_dangling_symlinks:
+                            errors.append((srcpath, dstpath, "dangling symlink"))
+                        continue
+                if dirent.is_dir():
+                    os.mkdir(dstpath)
+                    dir_stack.append((srcpath, dstpath))
+                else:
+                    file_pairs.append((srcpath, dstpath))
+            except OSError as why:
+                errors.append((srcpath, dstpath, str(why)))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        future_pairs = [(pool.submit(copy_function, srcpath, dstpath), srcpath, dstpath)
+                        for srcpath, dstpath in file_pairs]
+        for future, srcpath, dstpath in future_pairs:
+            try:
+                future.result()
+            except shutil.Error as err:
+                errors.extend(err.args[0])
+            except OSError as why:
+                errors.append((srcpath, dstpath, str(why)))
+
+    # Directory metadata is applied last (deepest first) so file copies don't alter it
+    for srcdir_cur, dstdir_cur in reversed(dir_pairs):
+        try:
+            shutil.copystat(srcdir_cur, dstdir_cur)
+        except OSError as why:
+            # Copying file access times may fail on Windows
+            if getattr(why, 'winerror', None) is None:
+                errors.append((srcdir_cur, dstdir_cur, str(why)))
+
+    if errors:
+        raise shutil.Error(errors)
+    return dstdir
+
+
+
+COPY_TRASH_NAME_FMTSTR = '.{}.psutils-trash-{}-{}'
+COPY_TRASH_UNLINK_CHUNK_SIZE = 256
+
+
+class BackgroundDeleter(object):
+    def __init__(self, workers=4):
+        if workers < 1:
+            raise cerr.InvalidArgumentError("`workers` must be >= 1")
+        self.workers = workers
+        self.pool = None
+        self.lock = threading.Lock()
+        self.trash_counter = itertools.count()
+        # Trash directories whose subtrees are being deleted, with the futures of those deletions
+        self.pending_trash = []
+        self.errors = []
+
+    def _move_to_trash(self, path):
+        # A sibling path is always on the same filesystem, so the rename is atomic and cheap
+        trash_path = os.path.join(
+            os.path.dirname(os.path.normpath(path)),
+            COPY_TRASH_NAME_FMTSTR.format(os.path.basename(os.path.normpath(path)), os.getpid(), next(self.trash_counter))
+        )
+        try:
+            os.rename(path, trash_path)
+        except OSError:
+            return None
+        return trash_path
+
+    def _rmtree(self, path):
+        def onerror(function, errpath, excinfo):
+            with self.lock:
+                self.errors.append((errpath, str(excinfo[1])))
+        shutil.rmtree(path, onerror=onerror)
+
+    def _unlink_files(self, path_list):
+        for path in path_list:
+            try:
+                os.unlink(path)
+            except OSError as why:
+                with self.lock:
+                    self.errors.append((path, str(why)))
+
+    def delete(self, path):
+        trash_path = self._move_to_trash(path)
+        if trash_path is None:
+            shutil.rmtree(path)
+            return
+        with self.lock:
+            if self.pool is None:
+                self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        # Delete each top-level subtree as its own task, and top-level files in
+        # chunks, so a single huge directory is still removed in parallel
+        futures = []
+        file_chunk = []
+        for dirent in os.scandir(trash_path):
+            if dirent.is_dir(follow_symlinks=False):
+                futures.append(self.pool.submit(self._rmtree, dirent.path))
+            else:
+                file_chunk.append(dirent.path)
+                if len(file_chunk) >= COPY_TRASH_UNLINK_CHUNK_SIZE:
+                    futures.append(self.pool.submit(self._unlink_files, file_chunk))
+                    file_chunk = []
+        if file_chunk:
+            futures.append(self.pool.submit(self._unlink_files, file_chunk))
+        with self.lock:
+            self.pending_trash.append((trash_path, futures))
+        self._remove_finished_trash()
+
+    def _remove_finished_trash(self, wait=False):
+        with self.lock:
+            pending_trash = self.pending_trash
+            self.pending_trash = []
+        still_pending = []
+        for trash_path, futures in pending_trash:
+            if wait:
+                concurrent.futures.wait(futures)
+            elif not all(future.done() for future in futures):
+                still_pending.append((trash_path, futures))
+                continue
+            try:
+                os.rmdir(trash_path)
+            except OSError:
+                self._rmtree(trash_path)
+        with self.lock:
+            self.pending_trash.extend(still_pending)
+
+    def flush(self):
+        self._remove_finished_trash(wait=True)
+        with self.lock:
+            errors = self.errors
+            self.errors = []
+        for errpath, errmsg in errors:
+            warning("Background deletion failed for path {}: {}".format(errpath, errmsg))
+        return errors
+
+    def shutdown(self):
+        errors = self.flush()
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=True)
+                self.pool = None
+        return errors
+
+
+BACKGROUND_DELETER = BackgroundDeleter()
+atexit.register(BACKGROUND_DELETER.shutdown)
+
+
+def flush_background_deletes():
+    return BACKGROUND_DELETER.flush()
+
+
+
+COPY_DURABILITY_NONE = 'none'
+COPY_DURABILITY_PER_FILE = 'per-file'
+COPY_DURABILITY_PER_DIRECTORY = 'per-directory'
+COPY_DURABILITY_END_OF_RUN = 'end-of-run'
+COPY_DURABILITY_CHOICES = [
+    COPY_DURABILITY_NONE,
+    COPY_DURABILITY_PER_FILE,
+    COPY_DURABILITY_PER_DIRECTORY,
+    COPY_DURABILITY_END_OF_RUN,
+]
+# With the per-directory policy, a directory's barrier is passed once it holds this
+# many pending files, or once this many directories have pending files
+COPY_DURABILITY_DIR_BATCH_SIZE = 1000
+COPY_DURABILITY_MAX_PENDING_DIRS = 16
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _libc_syncfs = _libc.syncfs
+except (AttributeError, OSError, TypeError):
+    _libc_syncfs = None
+
+
+def syncfs(path):
+    # Flush the whole filesystem containing `path`, falling back to a global sync
+    if _libc_syncfs is None:
+        os.sync()
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if _libc_syncfs(fd) != 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), path)
+    finally:
+        os.close(fd)
+
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_tree(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        for dirpath, dnames, fnames in os.walk(path):
+            for fname in fnames:
+                fpath = os.path.join(dirpath, fname)
+                if not os.path.islink(fpath):
+                    fsync_path(fpath)
+            fsync_path(dirpath)
+    elif not os.path.islink(path):
+        fsync_path(path)
+
+
+class DurabilityTracker(object):
+    def __init__(self, policy=COPY_DURABILITY_PER_DIRECTORY):
+        if policy not in COPY_DURABILITY_CHOICES:
+            raise cerr.InvalidArgumentError("`policy` must be one of {}, but was {}".format(COPY_DURABILITY_CHOICES, policy))
+        self.policy = policy
+        # Pending (path, callback) pairs, by parent directory
+        self.pending_dirs = collections.OrderedDict()
+        # One directory per target filesystem, for the end-of-run sync
+        self.filesystem_dirs = dict()
+        self.nbarriers = 0
+        self.lock = threading.Lock()
+
+    def add(self, path, callback=None):
+        if self.policy == COPY_DURABILITY_NONE:
+            ready = [(path, callback)]
+        elif self.policy == COPY_DURABILITY_PER_FILE:
+            fsync_tree(path)
+            fsync_path(os.path.dirname(os.path.abspath(path)))
+            with self.lock:
+                self.nbarriers += 1
+            ready = [(path, callback)]
+        else:
+            dirpath = os.path.dirname(os.path.abspath(path))
+            barrier_dirs = []
+            with self.lock:
+                if dirpath not in self.pending_dirs:
+                    self.pending_dirs[dirpath] = []
+                    if self.policy == COPY_DURABILITY_END_OF_RUN:
+                        st_dev = os.stat(dirpath).st_dev
+                        if st_dev not in self.filesystem_dirs:
+                            self.filesystem_dirs[st_dev] = dirpath
+                self.pending_dirs[dirpath].append((path, callback))
+                if self.policy == COPY_DURABILITY_PER_DIRECTORY:
+                    if len(self.pending_dirs[dirpath]) >= COPY_DURABILITY_DIR_BATCH_SIZE:
+                        barrier_dirs.append((dirpath, self.pending_dirs.pop(dirpath)))
+                    if len(self.pending_dirs) > COPY_DURABILITY_MAX_PENDING_DIRS:
+                        barrier_dirs.append(self.pending_dirs.popitem(last=False))
+            ready = []
+            for dirpath, pending in barrier_dirs:
+                ready.extend(self._directory_barrier(dirpath, pending))
+        self._complete(ready)
+
+    def _directory_barrier(self, dirpath, pending):
+        for path, callback in pending:
+            fsync_tree(path)
+        fsync_path(dirpath)
+        with self.lock:
+            self.nbarriers += 1
+        return pending
+
+    def _complete(self, ready):
+        for path, callback in ready:
+            if callback is not None:
+                callback()
+
+    def flush(self):
+        with self.lock:
+            pending_dirs = self.pending_dirs
+            self.pending_dirs = collections.OrderedDict()
+            filesystem_dirs = self.filesystem_dirs
+            self.filesystem_dirs = dict()
+        ready = []
+        if self.policy == COPY_DURABILITY_END_OF_RUN:
+            if _libc_syncfs is None:
+                if pending_dirs:
+                    os.sync()
+            else:
+                for dirpath in filesystem_dirs.values():
+                    syncfs(dirpath)
+            with self.lock:
+                self.nbarriers += 1
+            for pending in pending_dirs.values():
+                ready.extend(pending)
+        else:
+            for dirpath, pending in pending_dirs.items():
+                ready.extend(self._directory_barrier(dirpath, pending))
+        self._complete(ready)
+
+
+COPY_ORDER_FIFO = 'fifo'
+COPY_ORDER_LARGEST_FIRST = 'largest-first'
+COPY_ORDER_SMALLEST_FIRST = 'smallest-first'
+COPY_ORDER_LOCALITY = 'locality'
+COPY_ORDER_CHOICES = [
+    COPY_ORDER_FIFO,
+    COPY_ORDER_LARGEST_FIRST,
+    COPY_ORDER_SMALLEST_FIRST,
+    COPY_ORDER_LOCALITY,
+]
+COPY_ORDER_WINDOW = 1000
+
+
+def get_copy_order_key(order, srcpath, srcpath_dirent=None):
+    # `srcpath_dirent` is the os.DirEntry from the walk, if there is one. Its
+    # inode number is free, and its stat result is cached for later use by
+    # CopyMethod.copy.
+    if order == COPY_ORDER_FIFO:
+        return None
+    elif order == COPY_ORDER_LOCALITY:
+        # Directory by directory, in inode order within each, which tends to follow on-disk layout
+        inode = srcpath_dirent.inode() if srcpath_dirent is not None else 0
+        return (os.path.dirname(srcpath), inode)
+    if srcpath_dirent is not None:
+        size = srcpath_dirent.stat(follow_symlinks=False).st_size
+    else:
+        size = os.lstat(srcpath).st_size
+    return -size if order == COPY_ORDER_LARGEST_FIRST else size
+
+
+class CopyExecutor(object):
+    def __init__(self, workers=1, max_pending=None,
+                 order=COPY_ORDER_FIFO, order_window=COPY_ORDER_WINDOW):
+        if workers < 1:
+            raise cerr.InvalidArgumentError("`workers` must be >= 1")
+        if order not in COPY_ORDER_CHOICES:
+            raise cerr.InvalidArgumentError("`order` must be one of {}, but was {}".format(COPY_ORDER_CHOICES, order))
+        if order_window < 1:
+            raise cerr.InvalidArgumentError("`order_window` must be >= 1")
+        if max_pending is None:
+            max_pending = workers * 4
+        self.workers = workers
+        self.max_pending = max_pending
+        self.order = order
+        self.order_window = order_window
+        # Heap of submitted tasks waiting to be scheduled, as
+        # (order_key, seq, fn, args, kwargs, callback)
+        self.reorder_heap = []
+        self.reorder_seq = itertools.count()
+        self.pool = None
+        self.pending = dict()
+        self.error = None
+
+    def submit(self, fn, *args, callback=None, order_key=None, **kwargs):
+        if self.error is not None:
+            raise self.error
+        if self.order == COPY_ORDER_FIFO or order_key is None:
+            self._dispatch(fn, args, kwargs, callback)
+            return
+        # Tasks are held back within a window of `order_window` tasks and
+        # scheduled by key, since the walk discovers files in directory order
+        heapq.heappush(self.reorder_heap, (order_key, next(self.reorder_seq), fn, args, kwargs, callback))
+        if len(self.reorder_heap) > self.order_window:
+            self._dispatch_next()
+
+    def _dispatch_next(self):
+        order_key, seq, fn, args, kwargs, callback = heapq.heappop(self.reorder_heap)
+        self._dispatch(fn, args, kwargs, callback)
+
+    def _dispatch(self, fn, args, kwargs, callback):
+        if self.workers == 1:
+            result = fn(*args, **kwargs)
+            if callback is not None:
+                callback(result)
+            return
+        if self.pool is None:
+            self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        self._collect(wait_for_slot=True)
+        future = self.pool.submit(fn, *args, **kwargs)
+        self.pending[future] = callback
+
+    def _collect(self, wait_for_slot=False, wait_for_all=False):
+        if not self.pending:
+            return
+        if wait_for_all:
+            done, _ = concurrent.futures.wait(self.pending)
+        elif wait_for_slot and len(self.pending) >= self.max_pending:
+            done, _ = concurrent.futures.wait(self.pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        else:
+            done = [future for future in self.pending if future.done()]
+        for future in done:
+            callback = self.pending.pop(future)
+            error = future.exception()
+            if error is not None:
+                if self.error is None:
+                    self.error = error
+                continue
+            if callback is not None:
+                callback(future.result())
+        if self.error is not None:
+            # Stop handing out queued work and let in-flight copies finish,
+            # so the failure surfaces like it would in a serial copy.
+            for future in list(self.pending):
+                if future.cancel():
+                    self.pending.pop(future)
+            concurrent.futures.wait(self.pending)
+            self.pending.clear()
+            raise self.error
+
+    def wait(self):
+        while self.reorder_heap:
+            self._dispatch_next()
+        self._collect(wait_for_all=True)
+
+    def shutdown(self, cancel_pending=False):
+        if self.pool is not None:
+            if cancel_pending:
+                for future in self.pending:
+                    future.cancel()
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        self.reorder_heap = []
+        self.pending.clear()
+        self.error = None
+
+
+COPY_FAST_PATH_FICLONE = 'ficlone'
+COPY_FAST_PATH_COPY_FILE_RANGE = 'copy_file_range'
+COPY_FAST_PATH_SENDFILE = 'sendfile'
+COPY_FAST_PATH_BUFFERED = 'buffered'
+# Errors indicating a kernel copy path is unavailable for the given pair of files
+COPY_FAST_FALLBACK_ERRNOS = set([
+    errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.ENOTTY,
+    errno.EOPNOTSUPP, getattr(errno, 'ENOTSUP', errno.EOPNOTSUPP),
+])
+# FICLONE = _IOW(0x94, 9, int), from linux/fs.h
+FICLONE = 0x40049409
+COPY_BUFSIZE = 1024 * 1024
+
+
+def _copy_fd_ficlone(src_fd, dst_fd, size):
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    return True
+
+def _copy_fd_copy_file_range(src_fd, dst_fd, size):
+    offset = 0
+    while True:
+        nbytes = os.copy_file_range(src_fd, dst_fd, max(size - offset, COPY_BUFSIZE))
+        if nbytes == 0:
+            break
+        offset += nbytes
+    # Some filesystems report zero size for files with content (e.g. procfs)
+    return (offset > 0 or size == 0)
+
+def _copy_fd_sendfile(src_fd, dst_fd, size):
+    offset = 0
+    while True:
+        nbytes = os.sendfile(dst_fd, src_fd, offset, max(size - offset, COPY_BUFSIZE))
+        if nbytes == 0:
+            break
+        offset += nbytes
+    return (offset > 0 or size == 0)
+
+def _copy_fd_buffered(src_fd, dst_fd, size):
+    buf = bytearray(COPY_BUFSIZE)
+    bufview = memoryview(buf)
+    while True:
+        nbytes = os.readv(src_fd, [buf])
+        if nbytes == 0:
+            break
+        written = 0
+        while written < nbytes:
+            written += os.write(dst_fd, bufview[written:nbytes])
+    return True
+
+
+COPY_FAST_PATH_FN_LIST = []
+if psu_globals.SYSTYPE == psu_globals.SYSTYPE_LINUX:
+    if fcntl is not None:
+        COPY_FAST_PATH_FN_LIST.append((COPY_FAST_PATH_FICLONE, _copy_fd_ficlone))
+    if hasattr(os, 'copy_file_range'):
+        COPY_FAST_PATH_FN_LIST.append((COPY_FAST_PATH_COPY_FILE_RANGE, _copy_fd_copy_file_range))
+    if hasattr(os, 'sendfile'):
+        COPY_FAST_PATH_FN_LIST.append((COPY_FAST_PATH_SENDFILE, _copy_fd_sendfile))
+COPY_FAST_PATH_FN_LIST.append((COPY_FAST_PATH_BUFFERED, _copy_fd_buffered))
+
+
+class FastCopy(object):
+    def __init__(self, copy_meta=True, record_files=False):
+        self.copy_meta = copy_meta
+        # With `record_files`, the path each file took is logged at debug level
+        self.record_files = record_files
+        self.path_counts = collections.Counter()
+        self.lock = threading.Lock()
+        # (copy path, source st_dev, destination st_dev) combinations that have failed
+        # as unsupported, so they aren't retried for every file
+        self.unsupported = set()
+
+    def __call__(self, srcfile, dstfile):
+        src_fd = os.open(srcfile, os.O_RDONLY)
+        try:
+            dst_fd = os.open(dstfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+            try:
+                src_stat = os.fstat(src_fd)
+                dst_dev = os.fstat(dst_fd).st_dev
+                for copy_path, copy_fd_fn in COPY_FAST_PATH_FN_LIST:
+                    unsupported_key = (copy_path, src_stat.st_dev, dst_dev)
+                    if unsupported_key in self.unsupported:
+                        continue
+                    try:
+                        if copy_fd_fn(src_fd, dst_fd, src_stat.st_size):
+                            break
+                    except OSError as e:
+                        if copy_path == COPY_FAST_PATH_BUFFERED or e.errno not in COPY_FAST_FALLBACK_ERRNOS:
+                            raise
+                        with self.lock:
+                            self.unsupported.add(unsupported_key)
+                    os.lseek(src_fd, 0, os.SEEK_SET)
+                    os.lseek(dst_fd, 0, os.SEEK_SET)
+                    os.ftruncate(dst_fd, 0)
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+
+        if self.copy_meta:
+            shutil.copystat(srcfile, dstfile)
+
+        with self.lock:
+            self.path_counts[copy_path] += 1
+        if self.record_files:
+            debug("copy_file_fast: {} -> {} ({})".format(srcfile, dstfile, copy_path))
+
+        return dstfile
+
+    def get_path_counts(self):
+        with self.lock:
+            return dict(self.path_counts)
+
+    def reset(self):
+        with self.lock:
+            self.path_counts.clear()
+            self.unsupported.clear()
+
+
+copy_file_fast = FastCopy()
+
+
+COPY_TUNED_BUFSIZE_MIN = 256 * 1024
+COPY_TUNED_BUFSIZE_MAX = 16 * 1024 * 1024
+
+
+class TunedCopy(object):
+    def __init__(self, buffer_size=None, drop_cache=True, copy_meta=True):
+        if buffer_size is not None and buffer_size < 1:
+            raise cerr.InvalidArgumentError("`buffer_size` must be >= 1")
+        self.buffer_size = buffer_size
+        self.drop_cache = drop_cache
+        self.copy_meta = copy_meta
+        # One buffer per copying thread, reused across files
+        self.local = threading.local()
+
+    def get_buffer_size(self, size):
+        if self.buffer_size is not None:
+            return self.buffer_size
+        # Aim for about eight reads per file, in power-of-two sizes within bounds
+        bufsize = COPY_TUNED_BUFSIZE_MIN
+        while bufsize < COPY_TUNED_BUFSIZE_MAX and bufsize * 8 < size:
+            bufsize *= 2
+        return bufsize
+
+    def _get_buffer(self, bufsize):
+        buf = getattr(self.local, 'buf', None)
+        if buf is None or len(buf) < bufsize:
+            buf = bytearray(bufsize)
+            self.local.buf = buf
+        return memoryview(buf)[:bufsize]
+
+    def __call__(self, srcfile, dstfile):
+        with open(srcfile, 'rb', buffering=0) as fsrc:
+            src_fd = fsrc.fileno()
+            size = os.fstat(src_fd).st_size
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            bufview = self._get_buffer(self.get_buffer_size(size))
+
+            dst_fd = os.open(dstfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+            try:
+                if size > 0 and hasattr(os, 'posix_fallocate'):
+                    try:
+                        # Allocate the destination extents up front to limit fragmentation
+                        os.posix_fallocate(dst_fd, 0, size)
+                    except OSError as e:
+                        if e.errno not in COPY_FAST_FALLBACK_ERRNOS:
+                            raise
+                offset = 0
+                while True:
+                    nbytes = fsrc.readinto(bufview)
+                    if not nbytes:
+                        break
+                    written = 0
+                    while written < nbytes:
+                        written += os.write(dst_fd, bufview[written:nbytes])
+                    offset += nbytes
+                if offset < size:
+                    # The source shrank during the copy
+                    os.ftruncate(dst_fd, offset)
+                if self.drop_cache and hasattr(os, 'posix_fadvise'):
+                    # Dirty destination pages are only dropped once written back
+                    os.posix_fadvise(dst_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(dst_fd)
+
+            if self.drop_cache and hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+        if self.copy_meta:
+            shutil.copystat(srcfile, dstfile)
+        return dstfile
+
+
+copy_file_tuned = TunedCopy()
+
+
+COPY_MMAP_SIZE_THRESHOLD = 256 * 1024 * 1024
+COPY_MMAP_CHUNK_SIZE = 64 * 1024 * 1024
+COPY_MMAP_COMPARE_ITEMSIZE = 8
+
+
+def files_equal_mmap(file1, file2, chunk_size=COPY_MMAP_CHUNK_SIZE):
+    size = os.stat(file1).st_size
+    if os.stat(file2).st_size != size:
+        return False
+    if size == 0:
+        return True
+    with open(file1, 'rb') as fp1, open(file2, 'rb') as fp2:
+        try:
+            map1 = mmap.mmap(fp1.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            return filecmp.cmp(file1, file2, shallow=False)
+        try:
+            try:
+                map2 = mmap.mmap(fp2.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                return filecmp.cmp(file1, file2, shallow=False)
+            try:
+                view1 = memoryview(map1)
+                view2 = memoryview(map2)
+                try:
+                    # Comparing 8-byte items is much faster than comparing single bytes,
+                    # and neither copies the mapped data
+                    chunk_size = max(COPY_MMAP_COMPARE_ITEMSIZE, chunk_size - chunk_size % COPY_MMAP_COMPARE_ITEMSIZE)
+                    size_aligned = size - size % COPY_MMAP_COMPARE_ITEMSIZE
+                    for offset in range(0, size_aligned, chunk_size):
+                        end = min(offset + chunk_size, size_aligned)
+                        if view1[offset:end].cast('Q') != view2[offset:end].cast('Q'):
+                            return False
+                    return view1[size_aligned:] == view2[size_aligned:]
+                finally:
+                    view1.release()
+                    view2.release()
+            finally:
+                map2.close()
+        finally:
+            map1.close()
+
+
+class MmapCopy(object):
+    def __init__(self,
+                 size_threshold=COPY_MMAP_SIZE_THRESHOLD,
+                 chunk_size=COPY_MMAP_CHUNK_SIZE,
+                 verify=False,
+                 small_file_copy_fn=shutil.copy2):
+        if chunk_size < 1:
+            raise cerr.InvalidArgumentError("`chunk_size` must be >= 1")
+        self.size_threshold = size_threshold
+        self.chunk_size = chunk_size
+        self.verify = verify
+        self.small_file_copy_fn = small_file_copy_fn
+
+    def __call__(self, srcfile, dstfile):
+        with open(srcfile, 'rb') as fsrc:
+            size = os.fstat(fsrc.fileno()).st_size
+            src_map = None
+            if size >= self.size_threshold and size > 0:
+                try:
+                    src_map = mmap.mmap(fsrc.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    src_map = None
+            if src_map is None:
+                return self.small_file_copy_fn(srcfile, dstfile)
+            try:
+                if hasattr(src_map, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    src_map.madvise(mmap.MADV_SEQUENTIAL)
+                src_view = memoryview(src_map)
+                try:
+                    dst_fd = os.open(dstfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+                    try:
+                        offset = 0
+                        while offset < size:
+                            offset += os.write(dst_fd, src_view[offset:min(offset + self.chunk_size, size)])
+                    finally:
+                        os.close(dst_fd)
+                finally:
+                    src_view.release()
+            finally:
+                src_map.close()
+
+        shutil.copystat(srcfile, dstfile)
+        if self.verify and not files_equal_mmap(srcfile, dstfile, self.chunk_size):
+            raise IOError("Copied file content does not match source: {} -> {}".format(srcfile, dstfile))
+        return dstfile
+
+
+copy_file_mmap = MmapCopy()
+
+
+COPY_HASH_ALGORITHM_CHOICES = ['sha256', 'sha512', 'sha1', 'md5', 'blake2b', 'blake2s']
+COPY_HASH_DEFAULT_ALGORITHMS = ['sha256']
+
+
+class HashCopy(object):
+    def __init__(self, algorithms=None, manifest_prefix=None, verify=False,
+                 copy_meta=True, buffer_size=COPY_BUFSIZE):
+        if algorithms is None:
+            algorithms = COPY_HASH_DEFAULT_ALGORITHMS
+        for name in algorithms:
+            if name not in hashlib.algorithms_available:
+                raise cerr.InvalidArgumentError("Hash algorithm is not available: {}".format(name))
+        if buffer_size < 1:
+            raise cerr.InvalidArgumentError("`buffer_size` must be >= 1")
+        self.algorithms = list(algorithms)
+        # One manifest per algorithm, named "{manifest_prefix}.{algorithm}",
+        # which can be checked with e.g. `sha256sum -c`
+        self.manifest_prefix = manifest_prefix
+        self.verify = verify
+        self.copy_meta = copy_meta
+        self.buffer_size = buffer_size
+        self.manifest_fps = None
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def _get_buffer(self):
+        buf = getattr(self.local, 'buf', None)
+        if buf is None:
+            buf = bytearray(self.buffer_size)
+            self.local.buf = buf
+        return buf
+
+    def __call__(self, srcfile, dstfile):
+        buf = self._get_buffer()
+        bufview = memoryview(buf)
+        hashers = psu_hash.get_hashers(self.algorithms)
+        with open(srcfile, 'rb', buffering=0) as fsrc, open(dstfile, 'wb', buffering=0) as fdst:
+            while True:
+                nbytes = fsrc.readinto(buf)
+                if not nbytes:
+                    break
+                block = bufview[:nbytes]
+                psu_hash.update_hashers(hashers, block)
+                written = 0
+                while written < nbytes:
+                    written += fdst.write(block[written:])
+        if self.copy_meta:
+            shutil.copystat(srcfile, dstfile)
+        digests = psu_hash.get_hashers_hexdigest(hashers)
+
+        if self.verify:
+            # Re-reads the destination, so only done when asked for
+            dst_digest = psu_hash.get_file_hashes(dstfile, [self.algorithms[0]], self.buffer_size)[self.algorithms[0]]
+            if dst_digest != digests[self.algorithms[0]]:
+                raise IOError("Destination {} checksum does not match source: {} -> {}".format(
+                    self.algorithms[0], srcfile, dstfile))
+
+        if self.manifest_prefix is not None:
+            self._write_manifest(os.path.abspath(dstfile), digests)
+        return digests
+
+    def _write_manifest(self, dstfile, digests):
+        with self.lock:
+            if self.manifest_fps is None:
+                self.manifest_fps = dict([
+                    (name, open("{}.{}".format(self.manifest_prefix, name), 'a'))
+                    for name in self.algorithms
+                ])
+            for name in self.algorithms:
+                self.manifest_fps[name].write(psu_hash.format_checksum_line(digests[name], dstfile))
+
+    def flush(self):
+        with self.lock:
+            if self.manifest_fps is not None:
+                for manifest_fp in self.manifest_fps.values():
+                    manifest_fp.close()
+                self.manifest_fps = None
+
+
+copy_file_hash = HashCopy()
+
+
+COPY_RESUMABLE_PARTIAL_SUFFIX = '.partial'
+COPY_RESUMABLE_PROGRESS_SUFFIX = '.partial.json'
+COPY_RESUMABLE_CHUNK_SIZE = 64 * 1024 * 1024
+COPY_RESUMABLE_SIZE_THRESHOLD = 1024 * 1024 * 1024
+
+
+class ResumableCopy(object):
+    def __init__(self,
+                 chunk_size=COPY_RESUMABLE_CHUNK_SIZE,
+                 size_threshold=COPY_RESUMABLE_SIZE_THRESHOLD,
+                 verify_chunk_hash=False,
+                 small_file_copy_fn=shutil.copy2):
+        if chunk_size < 1:
+            raise cerr.InvalidArgumentError("`chunk_size` must be >= 1")
+        self.chunk_size = chunk_size
+        self.size_threshold = size_threshold
+        self.verify_chunk_hash = verify_chunk_hash
+        self.small_file_copy_fn = small_file_copy_fn
+
+    def __call__(self, srcfile, dstfile):
+        src_stat = os.stat(srcfile)
+        if src_stat.st_size < self.size_threshold:
+            return self.small_file_copy_fn(srcfile, dstfile)
+
+        partial_file = dstfile + COPY_RESUMABLE_PARTIAL_SUFFIX
+        progress_file = dstfile + COPY_RESUMABLE_PROGRESS_SUFFIX
+        src_ident = {
+            'srcfile': os.path.abspath(srcfile),
+            'size': src_stat.st_size,
+            'mtime_ns': src_stat.st_mtime_ns,
+            'chunk_size': self.chunk_size,
+        }
+
+        nchunks_done, chunk_hashes = self._get_verified_progress(partial_file, progress_file, src_ident)
+        # The final chunk may be short, so a complete partial file can end before the last chunk boundary
+        offset = min(nchunks_done * self.chunk_size, src_stat.st_size)
+
+        buf = bytearray(self.chunk_size)
+        bufview = memoryview(buf)
+        with open(srcfile, 'rb') as fsrc, open(partial_file, 'r+b' if nchunks_done > 0 else 'wb') as fdst:
+            fsrc.seek(offset)
+            fdst.seek(offset)
+            fdst.truncate(offset)
+            with self._start_progress(progress_file, src_ident, nchunks_done, chunk_hashes) as progress_fp:
+                while True:
+                    nbytes = fsrc.readinto(buf)
+                    if not nbytes:
+                        break
+                    fdst.write(bufview[:nbytes])
+                    chunk_hash = hashlib.sha256(bufview[:nbytes]).hexdigest() if self.verify_chunk_hash else ''
+                    # Progress may only be recorded once the chunk is on disk
+                    fdst.flush()
+                    os.fsync(fdst.fileno())
+                    progress_fp.write(chunk_hash+'\n')
+                    progress_fp.flush()
+
+        shutil.copystat(srcfile, partial_file)
+        os.replace(partial_file, dstfile)
+        os.remove(progress_file)
+        return dstfile
+
+    def _start_progress(self, progress_file, src_ident, nchunks_done, chunk_hashes):
+        # The progress file is a JSON header line identifying the source, followed
+        # by one line per completed chunk (its hash, if verifying chunks), which is
+        # appended as each chunk is written. It is only rewritten here, to drop
+        # chunks that failed verification.
+        progress_file_tmp = progress_file + '.tmp'
+        with open(progress_file_tmp, 'w') as progress_fp:
+            progress_fp.write(json.dumps(src_ident)+'\n')
+            for i in range(nchunks_done):
+                progress_fp.write((chunk_hashes[i] if self.verify_chunk_hash else '')+'\n')
+        os.replace(progress_file_tmp, progress_file)
+        return open(progress_file, 'a')
+
+    def _read_progress(self, progress_file):
+        with open(progress_file, 'r') as progress_fp:
+            lines = progress_fp.readlines()
+        if not lines or not lines[0].endswith('\n'):
+            raise ValueError("progress file has no complete header")
+        # A line cut short by an interruption does not count as a completed chunk
+        chunk_lines = [line for line in lines[1:] if line.endswith('\n')]
+        return json.loads(lines[0]), [line.rstrip('\n') for line in chunk_lines]
+
+    def _get_verified_progress(self, partial_file, progress_file, src_ident):
+        try:
+            progress_ident, chunk_hashes = self._read_progress(progress_file)
+            partial_size = os.stat(partial_file).st_size
+        except (OSError, ValueError):
+            return 0, []
+        if progress_ident != src_ident:
+            # The source changed (or chunking differs) since the partial copy was made
+            return 0, []
+
+        nchunks_recorded = len(chunk_hashes)
+        nchunks_done = min(nchunks_recorded, partial_size // self.chunk_size)
+        if nchunks_recorded * self.chunk_size >= src_ident['size']:
+            # The final chunk may be short
+            if partial_size == src_ident['size']:
+                nchunks_done = nchunks_recorded
+
+        if not self.verify_chunk_hash:
+            return nchunks_done, []
+        if any(not chunk_hash for chunk_hash in chunk_hashes[:nchunks_done]):
+            return 0, []
+
+        with open(partial_file, 'rb') as fpartial:
+            for i in range(nchunks_done):
+                if hashlib.sha256(fpartial.read(self.chunk_size)).hexdigest() != chunk_hashes[i]:
+                    nchunks_done = i
+                    break
+        return nchunks_done, chunk_hashes[:nchunks_done]
+
+
+copy_file_resumable = ResumableCopy()
+
+
+COPY_STRIPED_STRIPE_SIZE = 64 * 1024 * 1024
+COPY_STRIPED_WORKERS = 4
+COPY_STRIPED_SIZE_THRESHOLD = 1024 * 1024 * 1024
+
+
+def _copy_fd_range(src_fd, dst_fd, offset, length):
+    end = offset + length
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while offset < end:
+                nbytes = os.copy_file_range(src_fd, dst_fd, end - offset, offset, offset)
+                if nbytes == 0:
+                    break
+                offset += nbytes
+        except OSError as e:
+            if e.errno not in COPY_FAST_FALLBACK_ERRNOS:
+                raise
+    buf = bytearray(min(COPY_BUFSIZE, length))
+    bufview = memoryview(buf)
+    while offset < end:
+        nbytes = os.preadv(src_fd, [bufview[:min(len(buf), end - offset)]], offset)
+        if nbytes == 0:
+            break
+        written = 0
+        while written < nbytes:
+            written += os.pwrite(dst_fd, bufview[written:nbytes], offset + written)
+        offset += nbytes
+
+
+class StripedCopy(object):
+    def __init__(self,
+                 stripe_size=COPY_STRIPED_STRIPE_SIZE,
+                 workers=COPY_STRIPED_WORKERS,
+                 size_threshold=COPY_STRIPED_SIZE_THRESHOLD,
+                 small_file_copy_fn=shutil.copy2):
+        if stripe_size < 1:
+            raise cerr.InvalidArgumentError("`stripe_size` must be >= 1")
+        if workers < 1:
+            raise cerr.InvalidArgumentError("`workers` must be >= 1")
+        self.stripe_size = stripe_size
+        self.workers = workers
+        self.size_threshold = size_threshold
+        self.small_file_copy_fn = small_file_copy_fn
+
+    def __call__(self, srcfile, dstfile):
+        src_stat = os.stat(srcfile)
+        size = src_stat.st_size
+        if (   size < self.size_threshold or size <= self.stripe_size
+            or self.workers == 1 or not hasattr(os, 'preadv')):
+            return self.small_file_copy_fn(srcfile, dstfile)
+
+        src_fd = os.open(srcfile, os.O_RDONLY)
+        try:
+            dst_fd = os.open(dstfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+            try:
+                try:
+                    os.posix_fallocate(dst_fd, 0, size)
+                except (AttributeError, OSError):
+                    os.ftruncate(dst_fd, size)
+                stripe_offsets = range(0, size, self.stripe_size)
+                with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.workers, len(stripe_offsets))) as pool:
+                    futures = [
+                        pool.submit(_copy_fd_range, src_fd, dst_fd, offset, min(self.stripe_size, size - offset))
+                        for offset in stripe_offsets
+                    ]
+                    for future in futures:
+                        future.result()
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+
+        shutil.copystat(srcfile, dstfile)
+        return dstfile
+
+
+copy_file_striped = StripedCopy()
+
+
+class SparseCopy(object):
+    def __init__(self, dense_file_copy_fn=shutil.copy2):
+        self.dense_file_copy_fn = dense_file_copy_fn
+        self.nbytes_skipped = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, srcfile, dstfile):
+        with open(srcfile, 'rb') as fsrc:
+            src_fd = fsrc.fileno()
+            src_stat = os.fstat(src_fd)
+            size = src_stat.st_size
+            # Only files with fewer allocated blocks than their size can have holes
+            if (   not hasattr(os, 'SEEK_DATA') or not hasattr(src_stat, 'st_blocks')
+                or src_stat.st_blocks * 512 >= size):
+                return self.dense_file_copy_fn(srcfile, dstfile)
+
+            extents = []
+            offset = 0
+            try:
+                while offset < size:
+                    try:
+                        data_start = os.lseek(src_fd, offset, os.SEEK_DATA)
+                    except OSError as e:
+                        if e.errno == errno.ENXIO:
+                            # No data past offset; the rest of the file is a hole
+                            break
+                        raise
+                    data_end = os.lseek(src_fd, data_start, os.SEEK_HOLE)
+                    extents.append((data_start, data_end - data_start))
+                    offset = data_end
+            except OSError as e:
+                if e.errno not in COPY_FAST_FALLBACK_ERRNOS:
+                    raise
+                return self.dense_file_copy_fn(srcfile, dstfile)
+
+            dst_fd = os.open(dstfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+            try:
+                for data_start, data_length in extents:
+                    _copy_fd_range(src_fd, dst_fd, data_start, data_length)
+                # Extending the file recreates any trailing hole
+                os.ftruncate(dst_fd, size)
+            finally:
+                os.close(dst_fd)
+
+        with self.lock:
+            self.nbytes_skipped += size - sum([data_length for data_start, data_length in extents])
+        shutil.copystat(srcfile, dstfile)
+        return dstfile
+
+
+copy_file_sparse = SparseCopy()
+
+
+COPY_METADATA_FIELD_MODE = 'mode'
+COPY_METADATA_FIELD_OWNER = 'owner'
+COPY_METADATA_FIELD_TIMES = 'mtime'
+
+
+class MetadataSync(object):
+    # Marks a copy function that CopyMethod.copy applies to existing destinations only
+    metadata_only = True
+
+    def __init__(self, sync_mode=True, sync_owner=None, sync_times=True):
+        if sync_owner is None:
+            # Changing ownership generally requires root
+            sync_owner = (hasattr(os, 'geteuid') and os.geteuid() == 0)
+        self.sync_mode = sync_mode
+        self.sync_owner = sync_owner
+        self.sync_times = sync_times
+
+    def get_differences(self, src_lstat, dst_lstat):
+        differences = []
+        is_link = stat.S_ISLNK(src_lstat.st_mode)
+        if (    self.sync_mode and not is_link
+            and stat.S_IMODE(src_lstat.st_mode) != stat.S_IMODE(dst_lstat.st_mode)):
+            differences.append(COPY_METADATA_FIELD_MODE)
+        if (    self.sync_owner
+            and (src_lstat.st_uid, src_lstat.st_gid) != (dst_lstat.st_uid, dst_lstat.st_gid)):
+            differences.append(COPY_METADATA_FIELD_OWNER)
+        if (    self.sync_times and (not is_link or os.utime in os.supports_follow_symlinks)
+            and src_lstat.st_mtime_ns != dst_lstat.st_mtime_ns):
+            differences.append(COPY_METADATA_FIELD_TIMES)
+        return differences
+
+    def apply(self, dstpath, src_lstat, differences):
+        is_link = stat.S_ISLNK(src_lstat.st_mode)
+        # Ownership goes first, since chown may clear setuid/setgid mode bits
+        if COPY_METADATA_FIELD_OWNER in differences:
+            os.chown(dstpath, src_lstat.st_uid, src_lstat.st_gid, follow_symlinks=(not is_link))
+        if COPY_METADATA_FIELD_MODE in differences:
+            os.chmod(dstpath, stat.S_IMODE(src_lstat.st_mode))
+        if COPY_METADATA_FIELD_TIMES in differences:
+            os.utime(dstpath, ns=(src_lstat.st_atime_ns, src_lstat.st_mtime_ns), follow_symlinks=(not is_link))
+
+    def __call__(self, srcpath, dstpath):
+        src_lstat = os.lstat(srcpath)
+        differences = self.get_differences(src_lstat, os.lstat(dstpath))
+        self.apply(dstpath, src_lstat, differences)
+        return differences
+
+
+sync_metadata = MetadataSync()
+
+
+COPY_MOVE_PATH_RENAME = 'rename'
+COPY_MOVE_PATH_COPY = 'copy'
+COPY_MOVE_DELETE_BATCH_SIZE = 256
+
+
+class FastMove(object):
+    def __init__(self, workers=4,
+                 copy_function=shutil.copy2,
+                 delete_batch_size=COPY_MOVE_DELETE_BATCH_SIZE,
+                 hold_source_deletes=False):
+        if workers < 1:
+            raise cerr.InvalidArgumentError("`workers` must be >= 1")
+        if delete_batch_size < 1:
+            raise cerr.InvalidArgumentError("`delete_batch_size` must be >= 1")
+        self.workers = workers
+        self.copy_function = copy_function
+        self.delete_batch_size = delete_batch_size
+        # When set, copied sources are only deleted through `delete_source`,
+        # which CopyMethod calls once the copy has passed its durability barrier
+        self.hold_source_deletes = hold_source_deletes
+        self.path_counts = collections.Counter()
+        self.pending_deletes = []
+        self.held_sources = set()
+        self.lock = threading.Lock()
+
+    def with_held_source_deletes(self):
+        return FastMove(self.workers, self.copy_function, self.delete_batch_size, hold_source_deletes=True)
+
+    def __call__(self, srcpath, dstpath):
+        src_lstat = os.lstat(srcpath)
+        dst_parent_dev = os.stat(os.path.dirname(os.path.abspath(dstpath))).st_dev
+
+        if src_lstat.st_dev == dst_parent_dev:
+            try:
+                # Same filesystem: a whole file or tree is moved with a single rename
+                os.rename(srcpath, dstpath)
+                with self.lock:
+                    self.path_counts[COPY_MOVE_PATH_RENAME] += 1
+                return dstpath
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+
+        if stat.S_ISDIR(src_lstat.st_mode):
+            copytree_parallel(srcpath, dstpath,
+                              copy_function=self.copy_function,
+                              workers=self.workers, symlinks=True)
+        elif stat.S_ISLNK(src_lstat.st_mode):
+            os.symlink(os.readlink(srcpath), dstpath)
+        else:
+            self.copy_function(srcpath, dstpath)
+        self.verify(srcpath, dstpath)
+
+        with self.lock:
+            self.path_counts[COPY_MOVE_PATH_COPY] += 1
+            if self.hold_source_deletes:
+                self.held_sources.add(srcpath)
+                return dstpath
+            self.pending_deletes.append(srcpath)
+            if len(self.pending_deletes) < self.delete_batch_size:
+                return dstpath
+            delete_list = self.pending_deletes
+            self.pending_deletes = []
+        self._delete(delete_list)
+        return dstpath
+
+    def verify(self, srcpath, dstpath):
+        # Compare the type and size of every copied path before any source is removed
+        errors = []
+        if os.path.isdir(srcpath) and not os.path.islink(srcpath):
+            path_pairs = []
+            for dirpath, dnames, fnames in os.walk(srcpath):
+                dstdir = os.path.join(dstpath, os.path.relpath(dirpath, srcpath))
+                for name in dnames + fnames:
+                    path_pairs.append((os.path.join(dirpath, name), os.path.join(dstdir, name)))
+        else:
+            path_pairs = [(srcpath, dstpath)]
+        for src, dst in path_pairs:
+            try:
+                src_lstat = os.lstat(src)
+                dst_lstat = os.lstat(dst)
+            except OSError as why:
+                errors.append((src, dst, str(why)))
+                continue
+            if stat.S_IFMT(src_lstat.st_mode) != stat.S_IFMT(dst_lstat.st_mode):
+                errors.append((src, dst, "file type differs"))
+            elif stat.S_ISREG(src_lstat.st_mode) and src_lstat.st_size != dst_lstat.st_size:
+                errors.append((src, dst, "size differs ({} != {})".format(src_lstat.st_size, dst_lstat.st_size)))
+        if errors:
+            raise shutil.Error(errors)
+
+    def _delete(self, delete_list):
+        for srcpath in delete_list:
+            if os.path.isdir(srcpath) and not os.path.islink(srcpath):
+                shutil.rmtree(srcpath)
+            else:
+                os.remove(srcpath)
+
+    def delete_source(self, srcpath):
+        # Sources that were renamed rather than copied are already gone
+        with self.lock:
+            if srcpath not in self.held_sources:
+                return
+            self.held_sources.remove(srcpath)
+        self._delete([srcpath])
+
+    def flush(self):
+        with self.lock:
+            delete_list = self.pending_deletes
+            self.pending_deletes = []
+        self._delete(delete_list)
+
+    def get_path_counts(self):
+        with self.lock:
+            return dict(self.path_counts)
+
+    def reset(self):
+        with self.lock:
+            self.path_counts.clear()
+
+
+move_fast = FastMove()
+
+
+COPY_DEDUPE_INDEX_VERSION = 1
+COPY_DEDUPE_LINK_FALLBACK_ERRNOS = set([errno.EXDEV, errno.EMLINK, errno.EPERM, errno.ENOTSUP])
+
+
+class DedupeCopy(object):
+    def __init__(self, index_file=None, copy_fn=shutil.copy2, min_size=1, save_on_flush=True):
+        self.index_file = index_file
+        self.copy_fn = copy_fn
+        self.min_size = min_size
+        # Without `save_on_flush`, the caller saves the index once at the end of its run
+        self.save_on_flush = save_on_flush
+        # Files written in the destination, keyed by size and then content hash:
+        # {size: {hexdigest: [dstfile, mtime_ns]}}
+        # The first file of each size is kept under a None hash, and only hashed
+        # once another file shares its size.
+        self.index = collections.defaultdict(dict)
+        self.counts = collections.Counter()
+        self.bytes_saved = 0
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        if self.index_file is not None and os.path.isfile(self.index_file):
+            self.load(self.index_file)
+
+    def load(self, index_file):
+        with open(index_file, 'r') as index_fp:
+            index_json = json.load(index_fp)
+        if index_json.get('version') != COPY_DEDUPE_INDEX_VERSION:
+            raise cerr.InvalidArgumentError("Unsupported dedupe index version in file: {}".format(index_file))
+        with self.lock:
+            for dstfile, size, mtime_ns, hexdigest in index_json['entries']:
+                self.index[size][hexdigest] = [dstfile, mtime_ns]
+
+    def save(self, index_file=None):
+        if index_file is None:
+            index_file = self.index_file
+        if index_file is None:
+            return
+        with self.lock:
+            entries = [
+                [dstfile, size, mtime_ns, hexdigest]
+                for size, size_entries in self.index.items()
+                for hexdigest, (dstfile, mtime_ns) in size_entries.items()
+            ]
+        # Saves may be requested from several threads, so each writes its own
+        # temporary file and the replacements are serialized
+        with self.save_lock:
+            index_fd, index_file_tmp = tempfile.mkstemp(
+                prefix=os.path.basename(index_file)+'.', suffix='.tmp',
+                dir=os.path.dirname(os.path.abspath(index_file))
+            )
+            try:
+                with os.fdopen(index_fd, 'w') as index_fp:
+                    json.dump({'version': COPY_DEDUPE_INDEX_VERSION, 'entries': entries}, index_fp)
+                os.replace(index_file_tmp, index_file)
+            except BaseException:
+                if os.path.lexists(index_file_tmp):
+                    os.remove(index_file_tmp)
+                raise
+
+    def _validate_entry(self, size, hexdigest, entry):
+        dstfile, mtime_ns = entry
+        try:
+            dst_stat = os.stat(dstfile)
+        except OSError:
+            dst_stat = None
+        if dst_stat is None or dst_stat.st_size != size or dst_stat.st_mtime_ns != mtime_ns:
+            # The indexed file has been changed or removed since it was recorded
+            with self.lock:
+                if self.index[size].get(hexdigest) is entry:
+                    del self.index[size][hexdigest]
+            return False
+        return True
+
+    def _get_candidate(self, size, hexdigest):
+        with self.lock:
+            entry = self.index[size].get(hexdigest)
+            unhashed_entry = self.index[size].get(None) if entry is None else None
+        if unhashed_entry is not None and self._validate_entry(size, None, unhashed_entry):
+            unhashed_hexdigest = psu_hash.get_file_hash(unhashed_entry[0]).hex()
+            with self.lock:
+                if self.index[size].get(None) is unhashed_entry:
+                    del self.index[size][None]
+                    self.index[size].setdefault(unhashed_hexdigest, unhashed_entry)
+            if unhashed_hexdigest == hexdigest:
+                return unhashed_entry[0]
+            return None
+        if entry is None or not self._validate_entry(size, hexdigest, entry):
+            return None
+        return entry[0]
+
+    def _record(self, dstfile, size, hexdigest):
+        dst_stat = os.stat(dstfile)
+        with self.lock:
+            self.index[size][hexdigest] = [dstfile, dst_stat.st_mtime_ns]
+
+    def __call__(self, srcfile, dstfile):
+        size = os.stat(srcfile).st_size
+        if size < self.min_size:
+            self.copy_fn(srcfile, dstfile)
+            with self.lock:
+                self.counts['copied'] += 1
+            return dstfile
+
+        with self.lock:
+            size_indexed = bool(self.index.get(size))
+
+        # Sources are only hashed when another file of the same size is indexed,
+        # and only the one indexed file with a matching hash is checked
+        src_hexdigest = None
+        if size_indexed:
+            src_hexdigest = psu_hash.get_file_hash(srcfile).hex()
+            candidate = self._get_candidate(size, src_hexdigest)
+            if candidate is not None and candidate != dstfile:
+                try:
+                    os.link(candidate, dstfile)
+                except OSError as e:
+                    if e.errno not in COPY_DEDUPE_LINK_FALLBACK_ERRNOS:
+                        raise
+                else:
+                    with self.lock:
+                        self.counts['linked'] += 1
+                        self.bytes_saved += size
+                    return dstfile
+
+        self.copy_fn(srcfile, dstfile)
+        self._record(dstfile, size, src_hexdigest)
+        with self.lock:
+            self.counts['copied'] += 1
+        return dstfile
+
+    def flush(self):
+        if self.save_on_flush:
+            self.save()
+
+    def get_counts(self):
+        with self.lock:
+            counts = dict(self.counts)
+            counts['bytes_saved'] = self.bytes_saved
+        return counts
+
+
+copy_file_dedupe = DedupeCopy()
+
+
 if psu_globals.SYSTYPE == psu_globals.SYSTYPE_WINDOWS:
     COPY_METHOD_HARDLINK_SYSTEM = CopyMethod('mklink /H', action_verb='hardlinking', reverse_args=True)
     COPY_METHOD_SYMLINK_SYSTEM = CopyMethod('mklink', action_verb='symlinking', reverse_args=True)
@@ -276,8 +2346,19 @@ COPY_METHOD_COPY_BASIC = CopyMethod(shutil.copyfile, 'shutil.copyfile', 'copying
 COPY_METHOD_COPY_PERMS = CopyMethod(shutil.copy, 'shutil.copy', 'copying')
 COPY_METHOD_COPY_META = CopyMethod(shutil.copy2, 'shutil.copy2', 'copying')
 COPY_METHOD_COPY_DEFAULT = COPY_METHOD_COPY_META
+COPY_METHOD_COPY_FAST = CopyMethod(copy_file_fast, 'copy_file_fast', 'copying')
+COPY_METHOD_COPY_RESUMABLE = CopyMethod(copy_file_resumable, 'copy_file_resumable', 'copying')
+COPY_METHOD_COPY_STRIPED = CopyMethod(copy_file_striped, 'copy_file_striped', 'copying')
+COPY_METHOD_COPY_DEDUPE = CopyMethod(copy_file_dedupe, 'copy_file_dedupe', 'copying')
+COPY_METHOD_COPY_TUNED = CopyMethod(copy_file_tuned, 'copy_file_tuned', 'copying')
+COPY_METHOD_COPY_MMAP = CopyMethod(copy_file_mmap, 'copy_file_mmap', 'copying')
+COPY_METHOD_COPY_SPARSE = CopyMethod(copy_file_sparse, 'copy_file_sparse', 'copying')
+COPY_METHOD_COPY_HASH = CopyMethod(copy_file_hash, 'copy_file_hash', 'copying')
+
+COPY_METHOD_SYNC_METADATA = CopyMethod(sync_metadata, 'sync_metadata', 'syncing')
 
 COPY_METHOD_MOVE = CopyMethod(shutil.move, 'shutil.move', 'moving')
+COPY_METHOD_MOVE_FAST = CopyMethod(move_fast, 'move_fast', 'moving')
 
 COPY_METHOD_DICT = {
     'link': COPY_METHOD_HARDLINK,
@@ -287,7 +2368,21 @@ COPY_METHOD_DICT = {
     'copy-basic': COPY_METHOD_COPY_BASIC,
     'copy-perms': COPY_METHOD_COPY_PERMS,
     'copy-meta': COPY_METHOD_COPY_META,
+    'copy-fast': COPY_METHOD_COPY_FAST,
+    'copy-resumable': COPY_METHOD_COPY_RESUMABLE,
+    'copy-striped': COPY_METHOD_COPY_STRIPED,
+    'copy-dedupe': COPY_METHOD_COPY_DEDUPE,
+    'copy-tuned': COPY_METHOD_COPY_TUNED,
+    'copy-mmap': COPY_METHOD_COPY_MMAP,
+    'copy-sparse': COPY_METHOD_COPY_SPARSE,
+    'copy-hash': COPY_METHOD_COPY_HASH,
+    'sync-metadata': COPY_METHOD_SYNC_METADATA,
     'move': COPY_METHOD_MOVE,
+    'move-fast': COPY_METHOD_MOVE_FAST,
+    'copy-system': COPY_METHOD_COPY_SYSTEM,
+    'move-system': COPY_METHOD_MOVE_SYSTEM,
+    'link-system': COPY_METHOD_HARDLINK_SYSTEM,
+    'symlink-system': COPY_METHOD_SYMLINK_SYSTEM,
 }
 
 
@@ -302,28 +2397,106 @@ ARGSTR_MKDIR_UPON_FILE_COPY = '--mkdir-upon-file-copy'
 ARGSTR_OVERWRITE_FILES = '--overwrite-files'
 ARGSTR_OVERWRITE_DIRS = '--overwrite-dirs'
 ARGSTR_OVERWRITE_DMATCH = '--overwrite-dmatch'
+ARGSTR_OVERWRITE_DIRS_BACKGROUND = '--overwrite-dirs-background'
+ARGSTR_COPY_WORKERS = '--copy-workers'
+ARGSTR_COPY_BATCH_SIZE = '--copy-batch-size'
+ARGSTR_OVERWRITE_POLICY = '--overwrite-policy'
+ARGSTR_STRIPE_SIZE_MB = '--stripe-size-mb'
+ARGSTR_STRIPE_WORKERS = '--stripe-workers'
+ARGSTR_RESUMABLE_CHUNK_SIZE_MB = '--resumable-chunk-size-mb'
+ARGSTR_RESUMABLE_SIZE_THRESHOLD_MB = '--resumable-size-threshold-mb'
+ARGSTR_RESUMABLE_VERIFY_CHUNKS = '--resumable-verify-chunks'
+ARGSTR_COPY_TREE_WORKERS = '--copy-tree-workers'
+ARGSTR_DEDUPE_INDEX = '--dedupe-index'
+ARGSTR_COPY_LOG = '--copy-log'
+ARGSTR_COPY_BUFFER_KB = '--copy-buffer-kb'
+ARGSTR_DURABILITY = '--durability'
+ARGSTR_HASH_MANIFEST = '--hash-manifest'
+ARGSTR_HASH_ALGORITHMS = '--hash-algorithms'
+ARGSTR_HASH_VERIFY = '--hash-verify'
+ARGSTR_COPY_ORDER = '--copy-order'
+ARGSTR_COPY_ORDER_WINDOW = '--copy-order-window'
+ARGSTR_PLAN_OUT = '--plan-out'
 
 ## Argument choices (declare "ARGCHO_{ARGSTR}_{option}" options followed by list of all options as "ARGCHO_{ARGSTR}")
 ARGCHO_COPY_METHOD_COPY = 'copy'
 ARGCHO_COPY_METHOD_MOVE = 'move'
 ARGCHO_COPY_METHOD_LINK = 'link'
 ARGCHO_COPY_METHOD_SYMLINK = 'symlink'
+ARGCHO_COPY_METHOD_COPY_FAST = 'copy-fast'
+ARGCHO_COPY_METHOD_COPY_RESUMABLE = 'copy-resumable'
+ARGCHO_COPY_METHOD_COPY_STRIPED = 'copy-striped'
+ARGCHO_COPY_METHOD_MOVE_FAST = 'move-fast'
+ARGCHO_COPY_METHOD_COPY_DEDUPE = 'copy-dedupe'
+ARGCHO_COPY_METHOD_COPY_TUNED = 'copy-tuned'
+ARGCHO_COPY_METHOD_COPY_MMAP = 'copy-mmap'
+ARGCHO_COPY_METHOD_COPY_SPARSE = 'copy-sparse'
+ARGCHO_COPY_METHOD_SYNC_METADATA = 'sync-metadata'
+ARGCHO_COPY_METHOD_COPY_HASH = 'copy-hash'
+ARGCHO_COPY_METHOD_COPY_SYSTEM = 'copy-system'
+ARGCHO_COPY_METHOD_MOVE_SYSTEM = 'move-system'
+ARGCHO_COPY_METHOD_LINK_SYSTEM = 'link-system'
+ARGCHO_COPY_METHOD_SYMLINK_SYSTEM = 'symlink-system'
 ARGCHO_COPY_METHOD = [
     ARGCHO_COPY_METHOD_COPY,
     ARGCHO_COPY_METHOD_MOVE,
     ARGCHO_COPY_METHOD_LINK,
-    ARGCHO_COPY_METHOD_SYMLINK
+    ARGCHO_COPY_METHOD_SYMLINK,
+    ARGCHO_COPY_METHOD_COPY_FAST,
+    ARGCHO_COPY_METHOD_COPY_RESUMABLE,
+    ARGCHO_COPY_METHOD_COPY_STRIPED,
+    ARGCHO_COPY_METHOD_MOVE_FAST,
+    ARGCHO_COPY_METHOD_COPY_DEDUPE,
+    ARGCHO_COPY_METHOD_COPY_TUNED,
+    ARGCHO_COPY_METHOD_COPY_MMAP,
+    ARGCHO_COPY_METHOD_COPY_SPARSE,
+    ARGCHO_COPY_METHOD_SYNC_METADATA,
+    ARGCHO_COPY_METHOD_COPY_HASH,
+    ARGCHO_COPY_METHOD_COPY_SYSTEM,
+    ARGCHO_COPY_METHOD_MOVE_SYSTEM,
+    ARGCHO_COPY_METHOD_LINK_SYSTEM,
+    ARGCHO_COPY_METHOD_SYMLINK_SYSTEM,
 ]
+ARGCHO_OVERWRITE_POLICY = COPY_OVERWRITE_POLICY_CHOICES
+ARGCHO_COPY_LOG = COPY_EVENT_LOG_MODE_CHOICES
+ARGCHO_DURABILITY = COPY_DURABILITY_CHOICES
+ARGCHO_HASH_ALGORITHMS = COPY_HASH_ALGORITHM_CHOICES
+ARGCHO_COPY_ORDER = COPY_ORDER_CHOICES
 # Argument choice object mapping ("ARGMAP_" dict of "ARGCHO_" argument options)
 ARGMAP_COPY_METHOD_FUNC = {
     ARGCHO_COPY_METHOD_COPY: COPY_METHOD_COPY_DEFAULT,
     ARGCHO_COPY_METHOD_MOVE: COPY_METHOD_MOVE,
     ARGCHO_COPY_METHOD_LINK: COPY_METHOD_HARDLINK,
-    ARGCHO_COPY_METHOD_SYMLINK: COPY_METHOD_SYMLINK
+    ARGCHO_COPY_METHOD_SYMLINK: COPY_METHOD_SYMLINK,
+    ARGCHO_COPY_METHOD_COPY_FAST: COPY_METHOD_COPY_FAST,
+    ARGCHO_COPY_METHOD_COPY_RESUMABLE: COPY_METHOD_COPY_RESUMABLE,
+    ARGCHO_COPY_METHOD_COPY_STRIPED: COPY_METHOD_COPY_STRIPED,
+    ARGCHO_COPY_METHOD_MOVE_FAST: COPY_METHOD_MOVE_FAST,
+    ARGCHO_COPY_METHOD_COPY_DEDUPE: COPY_METHOD_COPY_DEDUPE,
+    ARGCHO_COPY_METHOD_COPY_TUNED: COPY_METHOD_COPY_TUNED,
+    ARGCHO_COPY_METHOD_COPY_MMAP: COPY_METHOD_COPY_MMAP,
+    ARGCHO_COPY_METHOD_COPY_SPARSE: COPY_METHOD_COPY_SPARSE,
+    ARGCHO_COPY_METHOD_SYNC_METADATA: COPY_METHOD_SYNC_METADATA,
+    ARGCHO_COPY_METHOD_COPY_HASH: COPY_METHOD_COPY_HASH,
+    ARGCHO_COPY_METHOD_COPY_SYSTEM: COPY_METHOD_COPY_SYSTEM,
+    ARGCHO_COPY_METHOD_MOVE_SYSTEM: COPY_METHOD_MOVE_SYSTEM,
+    ARGCHO_COPY_METHOD_LINK_SYSTEM: COPY_METHOD_HARDLINK_SYSTEM,
+    ARGCHO_COPY_METHOD_SYMLINK_SYSTEM: COPY_METHOD_SYMLINK_SYSTEM,
 }
 
 ## Argument defaults ("ARGDEF_")
 ARGDEF_COPY_METHOD = ARGCHO_COPY_METHOD_COPY
+ARGDEF_COPY_WORKERS = 1
+ARGDEF_COPY_BATCH_SIZE = 1
+ARGDEF_STRIPE_SIZE_MB = COPY_STRIPED_STRIPE_SIZE // (1024 * 1024)
+ARGDEF_STRIPE_WORKERS = COPY_STRIPED_WORKERS
+ARGDEF_RESUMABLE_CHUNK_SIZE_MB = COPY_RESUMABLE_CHUNK_SIZE // (1024 * 1024)
+ARGDEF_RESUMABLE_SIZE_THRESHOLD_MB = COPY_RESUMABLE_SIZE_THRESHOLD // (1024 * 1024)
+ARGDEF_COPY_TREE_WORKERS = 1
+ARGDEF_DURABILITY = COPY_DURABILITY_NONE
+ARGDEF_HASH_ALGORITHMS = COPY_HASH_DEFAULT_ALGORITHMS
+ARGDEF_COPY_ORDER = COPY_ORDER_FIFO
+ARGDEF_COPY_ORDER_WINDOW = COPY_ORDER_WINDOW
 
 ##############################
 
@@ -337,6 +2510,7 @@ def add_copymethod_arguments(parser,
         default=ARGCHO_COPY_METHOD_LINK,
         help=' '.join([
             "Which copy method to use when performing all file transfers.",
+            "The '-system' methods run the operating system's copy, move or link program.",
         ])
     )
 
@@ -363,6 +2537,19 @@ def add_copymethod_arguments(parser,
         # TODO: Write help string
         help="[write me]"
     )
+    parser.add_argument(
+        ARGSTR_OVERWRITE_POLICY,
+        type=str,
+        choices=ARGCHO_OVERWRITE_POLICY,
+        default=None,
+        help=' '.join([
+            "How to decide whether an existing destination file is overwritten.",
+            "'{}' only replaces files that are older than the source,".format(COPY_OVERWRITE_POLICY_IF_NEWER),
+            "'{}' replaces files whose size or modification time (to the second) differs,".format(COPY_OVERWRITE_POLICY_IF_DIFFERENT_SIZE_MTIME),
+            "and '{}' additionally compares SHA-256 checksums when sizes match.".format(COPY_OVERWRITE_POLICY_IF_DIFFERENT_CHECKSUM),
+            "{} is equivalent to '{}'.".format(ARGSTR_OVERWRITE_FILES, COPY_OVERWRITE_POLICY_ALWAYS),
+        ])
+    )
     parser.add_argument(
         ARGSTR_OVERWRITE_DIRS,
         action='store_true',
@@ -375,4 +2562,216 @@ def add_copymethod_arguments(parser,
         # TODO: Write help string
         help="[write me]"
     )
-
+    parser.add_argument(
+        ARGSTR_OVERWRITE_DIRS_BACKGROUND,
+        action='store_true',
+        help=' '.join([
+            "When a destination directory is overwritten ({} or {}),".format(ARGSTR_OVERWRITE_DIRS, ARGSTR_OVERWRITE_DMATCH),
+            "rename it to a hidden trash directory alongside it and delete it in background",
+            "threads instead of deleting it before the copy starts. Deletions are waited on",
+            "at the end of the run.",
+        ])
+    )
+    parser.add_argument(
+        '-cw', ARGSTR_COPY_WORKERS,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_COPY_WORKERS,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_COPY_WORKERS,
+        help=' '.join([
+            "Number of threads used to copy files while walking source directories.",
+            "With more than one worker, file copies are handed to a bounded thread pool",
+            "so that directory traversal continues while slow files are copied.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_COPY_ORDER,
+        type=str,
+        choices=ARGCHO_COPY_ORDER,
+        default=ARGDEF_COPY_ORDER,
+        help=' '.join([
+            "Order in which walked files are handed to the {} copy threads.".format(ARGSTR_COPY_WORKERS),
+            "'{}' keeps walk order, '{}' starts the biggest files first to".format(COPY_ORDER_FIFO, COPY_ORDER_LARGEST_FIRST),
+            "shorten the total run time, '{}' finishes many files early, and".format(COPY_ORDER_SMALLEST_FIRST),
+            "'{}' copies directory by directory in inode order. Files are only".format(COPY_ORDER_LOCALITY),
+            "reordered within a window of {} files.".format(ARGSTR_COPY_ORDER_WINDOW),
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_COPY_ORDER_WINDOW,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_COPY_ORDER_WINDOW,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_COPY_ORDER_WINDOW,
+        help=' '.join([
+            "Number of walked files held back and reordered by {}.".format(ARGSTR_COPY_ORDER),
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_PLAN_OUT,
+        type=psu_at.ARGTYPE_PATH(argstr=ARGSTR_PLAN_OUT,
+            existcheck_fn=os.path.isdir,
+            existcheck_reqval=False,
+            accesscheck_reqtrue=os.W_OK,
+            accesscheck_parent_if_dne=True),
+        default=None,
+        help=' '.join([
+            "JSON-lines file where every planned operation is written with its action,",
+            "reason, size, source and destination. Typically used with --dryrun, after",
+            "which the plan can be performed, in one or many shards, with",
+            "copy_plan_replay.py without walking the source again.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_COPY_BATCH_SIZE,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_COPY_BATCH_SIZE,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_COPY_BATCH_SIZE,
+        help=' '.join([
+            "When copying with a shell program ({}, {}, {} or {} on Unix-like systems),".format(
+                ARGCHO_COPY_METHOD_COPY_SYSTEM, ARGCHO_COPY_METHOD_MOVE_SYSTEM,
+                ARGCHO_COPY_METHOD_LINK_SYSTEM, ARGCHO_COPY_METHOD_SYMLINK_SYSTEM),
+            "transfer up to this many files that share a destination directory with a single",
+            "invocation of the program instead of starting one shell per file.",
+            "Other copy methods ignore this setting.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_STRIPE_SIZE_MB,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_STRIPE_SIZE_MB,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_STRIPE_SIZE_MB,
+        help=' '.join([
+            "When {}={}, size in MiB of the byte ranges that a large file".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_COPY_STRIPED),
+            "is split into and copied concurrently.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_STRIPE_WORKERS,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_STRIPE_WORKERS,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_STRIPE_WORKERS,
+        help=' '.join([
+            "When {}={}, number of threads copying byte ranges of one large file.".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_COPY_STRIPED),
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_RESUMABLE_CHUNK_SIZE_MB,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_RESUMABLE_CHUNK_SIZE_MB,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_RESUMABLE_CHUNK_SIZE_MB,
+        help=' '.join([
+            "When {}={}, size in MiB of the chunks whose completion is recorded,".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_COPY_RESUMABLE),
+            "so that an interrupted copy resumes from the last completed chunk.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_RESUMABLE_SIZE_THRESHOLD_MB,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_RESUMABLE_SIZE_THRESHOLD_MB,
+            numeric_type=int, allow_neg=False, allow_zero=True, allow_inf=False),
+        default=ARGDEF_RESUMABLE_SIZE_THRESHOLD_MB,
+        help=' '.join([
+            "When {}={}, files smaller than this size in MiB are copied".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_COPY_RESUMABLE),
+            "in one go without recording progress.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_RESUMABLE_VERIFY_CHUNKS,
+        action='store_true',
+        help=' '.join([
+            "When {}={}, record a hash of each completed chunk and check the".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_COPY_RESUMABLE),
+            "chunks already written before resuming a copy, instead of trusting the partial file.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_COPY_TREE_WORKERS,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_COPY_TREE_WORKERS,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_COPY_TREE_WORKERS,
+        help=' '.join([
+            "Number of threads used to copy files when a whole directory is copied as a",
+            "single operation. With more than one worker, the destination directory tree",
+            "is created first and the files are then copied in parallel. Also sets the",
+            "number of copy threads when {}={} moves a tree across filesystems.".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_MOVE_FAST),
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_DEDUPE_INDEX,
+        type=psu_at.ARGTYPE_PATH(argstr=ARGSTR_DEDUPE_INDEX,
+            existcheck_fn=os.path.isdir,
+            existcheck_reqval=False,
+            accesscheck_reqtrue=os.W_OK,
+            accesscheck_parent_if_dne=True),
+        default=None,
+        help=' '.join([
+            "When {}={}, JSON file where the content-hash index of files written".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_COPY_DEDUPE),
+            "to the destination is loaded from and saved to, so that files are deduplicated",
+            "across runs. Destination files that share size and content are hardlinked",
+            "instead of copied, and so also share permissions and timestamps.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_COPY_LOG,
+        type=str,
+        choices=ARGCHO_COPY_LOG,
+        default=None,
+        help=' '.join([
+            "How to report each file transfer. '{}' writes one line per path as it is".format(COPY_EVENT_LOG_MODE_LINES),
+            "transferred, '{}' collects up to {} lines and writes them together,".format(COPY_EVENT_LOG_MODE_BUFFERED, COPY_EVENT_LOG_BUFFER_SIZE),
+            "and '{}' writes no per-path lines. With any setting, path counts and bytes".format(COPY_EVENT_LOG_MODE_SUMMARY),
+            "by action and reason are reported at the end of the run.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_COPY_BUFFER_KB,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_COPY_BUFFER_KB,
+            numeric_type=int, allow_neg=False, allow_zero=False),
+        default=None,
+        help=' '.join([
+            "When {}={}, size in KiB of the read buffer. By default the buffer".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_COPY_TUNED),
+            "size adapts to each file's size, from {} KiB up to {} KiB.".format(COPY_TUNED_BUFSIZE_MIN // 1024, COPY_TUNED_BUFSIZE_MAX // 1024),
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_DURABILITY,
+        type=str,
+        choices=ARGCHO_DURABILITY,
+        default=ARGDEF_DURABILITY,
+        help=' '.join([
+            "When copied data must be on disk before a file transfer is reported complete.",
+            "'{}' fsyncs each file and its directory after it is copied, '{}' fsyncs".format(COPY_DURABILITY_PER_FILE, COPY_DURABILITY_PER_DIRECTORY),
+            "files in groups with one fsync of their directory, and '{}' syncs each".format(COPY_DURABILITY_END_OF_RUN),
+            "destination filesystem once (syncfs) after all transfers. Use anything but",
+            "'{}' before deleting source data.".format(COPY_DURABILITY_NONE),
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_HASH_MANIFEST,
+        type=psu_at.ARGTYPE_PATH(argstr=ARGSTR_HASH_MANIFEST,
+            existcheck_fn=os.path.isdir,
+            existcheck_reqval=False,
+            accesscheck_reqtrue=os.W_OK,
+            accesscheck_parent_if_dne=True),
+        default=None,
+        help=' '.join([
+            "When {}={}, path prefix of the checksum manifests to append to, one per".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_COPY_HASH),
+            "algorithm in {} (e.g. PREFIX.sha256). Checksums are computed from the data as".format(ARGSTR_HASH_ALGORITHMS),
+            "it is copied, and manifests use the sha256sum output format.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_HASH_ALGORITHMS,
+        type=str,
+        nargs='+',
+        choices=ARGCHO_HASH_ALGORITHMS,
+        default=ARGDEF_HASH_ALGORITHMS,
+        help=' '.join([
+            "When {}={}, hash algorithms to compute for each copied file.".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_COPY_HASH),
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_HASH_VERIFY,
+        action='store_true',
+        help=' '.join([
+            "When {}={}, read each destination file back after it is copied and".format(ARGSTR_COPY_METHOD, ARGCHO_COPY_METHOD_COPY_HASH),
+            "check that its checksum matches the source's.",
+        ])
+    )
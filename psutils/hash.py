@@ -18,3 +18,26 @@ def file_as_blockiter(afile, blocksize=65536):
 
 def get_file_hash(afile):
     return hash_bytestr_iter(file_as_blockiter(open(afile, 'rb')), hashlib.sha256())
+
+def get_hashers(algorithms):
+    return [(name, hashlib.new(name)) for name in algorithms]
+
+def update_hashers(hashers, block):
+    for name, hasher in hashers:
+        hasher.update(block)
+
+def get_hashers_hexdigest(hashers):
+    return dict([(name, hasher.hexdigest()) for name, hasher in hashers])
+
+def get_file_hashes(afile, algorithms=('sha256',), blocksize=65536):
+    hashers = get_hashers(algorithms)
+    for block in file_as_blockiter(open(afile, 'rb'), blocksize):
+        update_hashers(hashers, block)
+    return get_hashers_hexdigest(hashers)
+
+def format_checksum_line(hexdigest, path):
+    # Same format as sha256sum/md5sum output, including their escaping of
+    # file names that contain a backslash or newline
+    if '\\' in path or '\n' in path:
+        return "\\{}  {}\n".format(hexdigest, path.replace('\\', '\\\\').replace('\n', '\\n'))
+    return "{}  {}\n".format(hexdigest, path)
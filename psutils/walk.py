@@ -1,10 +1,20 @@
 
+import bisect
 import copy
 import collections
+import concurrent.futures
+import functools
 import fnmatch as fnmatch_module
+import heapq
+import json
 import os
+import queue
+import random
 import re
+import stat
 import sys
+import threading
+import time
 import traceback
 
 try:
@@ -41,6 +51,14 @@ ARGSTR_DEXCL = '--dexcl'
 ARGSTR_DEXCL_RE = '--dexcl-re'
 ARGSTR_DSUB_RE = '--dsub-re'
 ARGSTR_COUNT_FIRST = '--count-first'
+ARGSTR_WALK_STATS = '--walk-stats'
+ARGSTR_WALK_STATS_TOPN = '--walk-stats-topn'
+ARGSTR_WALK_STATS_SAMPLE = '--walk-stats-sample'
+ARGSTR_PIPELINE = '--pipeline'
+ARGSTR_PIPELINE_LIST_WORKERS = '--pipeline-list-workers'
+ARGSTR_PIPELINE_MKDIR_WORKERS = '--pipeline-mkdir-workers'
+ARGSTR_PIPELINE_VERIFY_WORKERS = '--pipeline-verify-workers'
+ARGSTR_PIPELINE_QUEUE_SIZE = '--pipeline-queue-size'
 
 ## Argument groups ("ARGGRP_" lists of "ARGSTR_" argument strings)
 ARGGRP_FILEMATCH = [
@@ -62,6 +80,12 @@ ARGDEF_MAXDEPTH = psu_at.ARGNUM_POS_INF
 ARGDEF_DMATCH_MAXDEPTH = None
 ARGDEF_OUTDEPTH = None
 ARGDEF_COUNT_FIRST = ARGCHO_COUNT_FIRST_OFF
+ARGDEF_WALK_STATS_TOPN = 20
+ARGDEF_WALK_STATS_SAMPLE = 1.0
+ARGDEF_PIPELINE_LIST_WORKERS = 2
+ARGDEF_PIPELINE_MKDIR_WORKERS = 1
+ARGDEF_PIPELINE_VERIFY_WORKERS = 0
+ARGDEF_PIPELINE_QUEUE_SIZE = 1000
 
 ##############################
 
@@ -99,6 +123,10 @@ FIND_RETURN_CHOICES = [
     FIND_RETURN_MIX
 ]
 
+# Upper bounds of histogram bins, with a final catch-all bin
+WALK_STATS_HIST_SCANDIR_MS_BOUNDS = [0.1, 1, 10, 100, 1000, 10000]
+WALK_STATS_HIST_NENTRIES_BOUNDS = [10, 100, 1000, 10000, 100000]
+
 ##############################
 
 
@@ -248,6 +276,93 @@ def add_walk_arguments(parser,
         ])
     )
 
+    parser.add_argument(
+        ARGSTR_WALK_STATS,
+        type=psu_at.ARGTYPE_PATH(argstr=ARGSTR_WALK_STATS,
+            existcheck_fn=os.path.isdir,
+            existcheck_reqval=False,
+            accesscheck_reqtrue=os.W_OK,
+            accesscheck_parent_if_dne=True),
+        default=None,
+        help=' '.join([
+            "Record per-directory walk latency (listing time, entry count, filter CPU time,",
+            "and copy time) and write a JSON report of the slowest directories and latency",
+            "histograms to this file. A summary of the report is also logged.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_WALK_STATS_TOPN,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_WALK_STATS_TOPN,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_WALK_STATS_TOPN,
+        help=' '.join([
+            "Number of slowest directories to include in the {} report.".format(ARGSTR_WALK_STATS),
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_WALK_STATS_SAMPLE,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_WALK_STATS_SAMPLE,
+            numeric_type=float, allow_neg=False, allow_zero=False, allow_inf=False,
+            allowed_max=1),
+        default=ARGDEF_WALK_STATS_SAMPLE,
+        help=' '.join([
+            "Fraction of directories to sample for the {} report.".format(ARGSTR_WALK_STATS),
+            "Lower this to reduce instrumentation overhead on very large trees.",
+        ])
+    )
+
+    parser.add_argument(
+        ARGSTR_PIPELINE,
+        action='store_true',
+        help=' '.join([
+            "Run directory walks as a staged pipeline: directory listing, filtering, destination",
+            "directory creation, file copying, and (optionally) verification each run in their",
+            "own threads with bounded queues between them, so that slow metadata operations and",
+            "slow data transfers overlap. The copy stage uses {} threads, and copies".format(psu_cm.ARGSTR_COPY_WORKERS),
+            "files in the order they are walked, so {} does not apply.".format(psu_cm.ARGSTR_COPY_ORDER),
+            "Per-stage throughput and queue depth are logged at the end of the run.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_PIPELINE_LIST_WORKERS,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_PIPELINE_LIST_WORKERS,
+            numeric_type=int, allow_neg=False, allow_zero=True, allow_inf=False),
+        default=ARGDEF_PIPELINE_LIST_WORKERS,
+        help=' '.join([
+            "With {}, number of threads listing subdirectories ahead of the walk.".format(ARGSTR_PIPELINE),
+            "Set to 0 to list directories only in the walking thread.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_PIPELINE_MKDIR_WORKERS,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_PIPELINE_MKDIR_WORKERS,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_PIPELINE_MKDIR_WORKERS,
+        help=' '.join([
+            "With {}, number of threads creating destination directories.".format(ARGSTR_PIPELINE),
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_PIPELINE_VERIFY_WORKERS,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_PIPELINE_VERIFY_WORKERS,
+            numeric_type=int, allow_neg=False, allow_zero=True, allow_inf=False),
+        default=ARGDEF_PIPELINE_VERIFY_WORKERS,
+        help=' '.join([
+            "With {}, number of threads checking that each copied file exists with".format(ARGSTR_PIPELINE),
+            "the source file's size. Set to 0 to skip verification.",
+        ])
+    )
+    parser.add_argument(
+        ARGSTR_PIPELINE_QUEUE_SIZE,
+        type=psu_at.ARGTYPE_NUM(argstr=ARGSTR_PIPELINE_QUEUE_SIZE,
+            numeric_type=int, allow_neg=False, allow_zero=False, allow_inf=False),
+        default=ARGDEF_PIPELINE_QUEUE_SIZE,
+        help=' '.join([
+            "With {}, maximum number of items waiting between stages. A full queue".format(ARGSTR_PIPELINE),
+            "pauses the stages feeding it.",
+        ])
+    )
+
 
 def walk_simple(srcdir, mindepth=1, maxdepth=float('inf'),
                 track_item=None, track_initialize_total=(ARGDEF_COUNT_FIRST == ARGCHO_COUNT_FIRST_ON),
@@ -479,6 +594,452 @@ class TrackFileTreeCount(object):
             return None, None
 
 
+class WalkDirStat(object):
+    __slots__ = ('dirpath', 'depth', 'nentries', 'scandir_time', 'filter_cpu_time', 'copy_time', 'ncopied',
+                 'npending', 'walked')
+
+    def __init__(self, dirpath, depth):
+        self.dirpath = dirpath
+        self.depth = depth
+        self.nentries = 0
+        self.scandir_time = 0.0
+        self.filter_cpu_time = 0.0
+        # Summed time of this directory's file copies, as measured by the threads doing them
+        self.copy_time = 0.0
+        self.ncopied = 0
+        # The directory is recorded once it has been walked and none of its copies are pending
+        self.npending = 0
+        self.walked = False
+
+    def total_time(self):
+        return self.scandir_time + self.filter_cpu_time + self.copy_time
+
+    def as_dict(self):
+        return {
+            'dirpath': self.dirpath,
+            'depth': self.depth,
+            'nentries': self.nentries,
+            'scandir_time': self.scandir_time,
+            'filter_cpu_time': self.filter_cpu_time,
+            'copy_time': self.copy_time,
+            'ncopied': self.ncopied,
+            'total_time': self.total_time(),
+        }
+
+
+class WalkStats(object):
+
+    def __init__(self, topn=ARGDEF_WALK_STATS_TOPN, sample_rate=ARGDEF_WALK_STATS_SAMPLE):
+        if topn < 1:
+            raise cerr.InvalidArgumentError("`topn` must be >= 1")
+        if not 0 < sample_rate <= 1:
+            raise cerr.InvalidArgumentError("`sample_rate` valid range: 0 < `sample_rate` <= 1")
+        self.topn = topn
+        self.sample_rate = sample_rate
+
+        self.ndirs_seen = 0
+        self.ndirs_sampled = 0
+        self.total_nentries = 0
+        self.total_ncopied = 0
+        self.total_scandir_time = 0.0
+        self.total_filter_cpu_time = 0.0
+        self.total_copy_time = 0.0
+
+        # Min-heap of the `topn` slowest directories, as (total_time, seq, WalkDirStat)
+        self.slowest_heap = []
+        self.hist_scandir_ms = [0]*(len(WALK_STATS_HIST_SCANDIR_MS_BOUNDS)+1)
+        self.hist_nentries = [0]*(len(WALK_STATS_HIST_NENTRIES_BOUNDS)+1)
+        # Walks of concurrent tasks share one WalkStats
+        self.lock = threading.Lock()
+
+    def sample(self, dirpath, depth):
+        with self.lock:
+            self.ndirs_seen += 1
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return None
+        return WalkDirStat(dirpath, depth)
+
+    def start_copies(self, dstat, ncopies):
+        with self.lock:
+            dstat.npending += ncopies
+            dstat.ncopied += ncopies
+
+    def copy_done(self, dstat, copy_time):
+        with self.lock:
+            dstat.copy_time += copy_time
+            dstat.npending -= 1
+            if dstat.walked and dstat.npending == 0:
+                self._record(dstat)
+
+    def finish(self, dstat):
+        with self.lock:
+            dstat.walked = True
+            if dstat.npending == 0:
+                self._record(dstat)
+
+    def record(self, dstat):
+        with self.lock:
+            self._record(dstat)
+
+    def _record(self, dstat):
+        self.ndirs_sampled += 1
+        self.total_nentries += dstat.nentries
+        self.total_ncopied += dstat.ncopied
+        self.total_scandir_time += dstat.scandir_time
+        self.total_filter_cpu_time += dstat.filter_cpu_time
+        self.total_copy_time += dstat.copy_time
+
+        self.hist_scandir_ms[bisect.bisect_left(WALK_STATS_HIST_SCANDIR_MS_BOUNDS, dstat.scandir_time*1000)] += 1
+        self.hist_nentries[bisect.bisect_left(WALK_STATS_HIST_NENTRIES_BOUNDS, dstat.nentries)] += 1
+
+        heap_item = (dstat.total_time(), self.ndirs_sampled, dstat)
+        if len(self.slowest_heap) < self.topn:
+            heapq.heappush(self.slowest_heap, heap_item)
+        elif heap_item[0] > self.slowest_heap[0][0]:
+            heapq.heapreplace(self.slowest_heap, heap_item)
+
+    def get_slowest(self, topn=None):
+        slowest = [item[2] for item in sorted(self.slowest_heap, key=lambda item: item[0], reverse=True)]
+        return slowest if topn is None else slowest[:topn]
+
+    def _hist_report(self, bounds, counts):
+        labels = ["<={}".format(b) for b in bounds] + [">{}".format(bounds[-1])]
+        return [{'bin': label, 'count': count} for label, count in zip(labels, counts)]
+
+    def get_report(self, topn=None):
+        return {
+            'sample_rate': self.sample_rate,
+            'ndirs_seen': self.ndirs_seen,
+            'ndirs_sampled': self.ndirs_sampled,
+            'totals': {
+                'nentries': self.total_nentries,
+                'ncopied': self.total_ncopied,
+                'scandir_time': self.total_scandir_time,
+                'filter_cpu_time': self.total_filter_cpu_time,
+                'copy_time': self.total_copy_time,
+            },
+            'slowest_dirs': [dstat.as_dict() for dstat in self.get_slowest(topn)],
+            'hist_scandir_ms': self._hist_report(WALK_STATS_HIST_SCANDIR_MS_BOUNDS, self.hist_scandir_ms),
+            'hist_nentries': self._hist_report(WALK_STATS_HIST_NENTRIES_BOUNDS, self.hist_nentries),
+        }
+
+    def write_json(self, outfile, topn=None):
+        with open(outfile, 'w') as outfile_fp:
+            json.dump(self.get_report(topn), outfile_fp, indent=2)
+
+    def log_summary(self, topn=10, print_fn=None):
+        if print_fn is None:
+            print_fn = info
+        print_fn("Walk stats: sampled {} of {} directories ({} entries, {} files copied); "
+                 "scandir {:.3f}s, filter CPU {:.3f}s, copy {:.3f}s".format(
+            self.ndirs_sampled, self.ndirs_seen, self.total_nentries, self.total_ncopied,
+            self.total_scandir_time, self.total_filter_cpu_time, self.total_copy_time
+        ))
+        for i, dstat in enumerate(self.get_slowest(topn)):
+            print_fn("  #{} {:.3f}s (scandir {:.3f}s, filter CPU {:.3f}s, copy {:.3f}s, {} entries): {}".format(
+                i+1, dstat.total_time(), dstat.scandir_time, dstat.filter_cpu_time, dstat.copy_time,
+                dstat.nentries, dstat.dirpath
+            ))
+
+
+
+WALK_PIPELINE_STAGE_LIST = 'list'
+WALK_PIPELINE_STAGE_FILTER = 'filter'
+WALK_PIPELINE_STAGE_MKDIR = 'mkdir'
+WALK_PIPELINE_STAGE_COPY = 'copy'
+WALK_PIPELINE_STAGE_VERIFY = 'verify'
+WALK_PIPELINE_STAGES = [
+    WALK_PIPELINE_STAGE_LIST,
+    WALK_PIPELINE_STAGE_FILTER,
+    WALK_PIPELINE_STAGE_MKDIR,
+    WALK_PIPELINE_STAGE_COPY,
+    WALK_PIPELINE_STAGE_VERIFY,
+]
+
+
+class WalkPipelineStageStat(object):
+    __slots__ = ('nitems', 'busy_time', 'queue_depth_max', 'queue_depth_sum', 'nputs')
+
+    def __init__(self):
+        self.nitems = 0
+        self.busy_time = 0.0
+        self.queue_depth_max = 0
+        self.queue_depth_sum = 0
+        self.nputs = 0
+
+    def as_dict(self, elapsed):
+        return {
+            'nitems': self.nitems,
+            'busy_time': self.busy_time,
+            'items_per_sec': (self.nitems / elapsed) if elapsed > 0 else None,
+            'queue_depth_max': self.queue_depth_max,
+            'queue_depth_mean': (self.queue_depth_sum / self.nputs) if self.nputs > 0 else 0,
+        }
+
+
+class WalkPipeline(object):
+    # Stages, each fed by a bounded queue:
+    #   list:   worker threads prefetch directory listings ahead of the walk
+    #   filter: the walking thread filters and renames listed entries
+    #   mkdir:  worker threads create destination directories
+    #   copy:   worker threads copy files
+    #   verify: worker threads check copied file sizes and record completion
+
+    def __init__(self, list_workers=2, mkdir_workers=1, copy_workers=4, verify_workers=0,
+                 queue_size=1000):
+        if list_workers < 0 or verify_workers < 0:
+            raise cerr.InvalidArgumentError("`list_workers` and `verify_workers` must be >= 0")
+        if mkdir_workers < 1 or copy_workers < 1:
+            raise cerr.InvalidArgumentError("`mkdir_workers` and `copy_workers` must be >= 1")
+        if queue_size < 1:
+            raise cerr.InvalidArgumentError("`queue_size` must be >= 1")
+        self.list_workers = list_workers
+        self.mkdir_workers = mkdir_workers
+        self.copy_workers = copy_workers
+        self.verify_workers = verify_workers
+        self.queue_size = queue_size
+
+        self.stage_stats = collections.OrderedDict([(stage, WalkPipelineStageStat()) for stage in WALK_PIPELINE_STAGES])
+        self.stats_lock = threading.Lock()
+        self.elapsed = 0.0
+
+        self.copy_method = None
+        self.callback = None
+        self.walk_stats = None
+        self.list_function = None
+        self.list_pool = None
+        self.listings = dict()
+        self.queues = None
+        self.threads = None
+        self.error = None
+        self.cancelled = False
+        self.running = False
+        self.time_start = None
+
+    def start(self, copy_method, list_function, callback=None, walk_stats=None):
+        self.copy_method = copy_method
+        self.list_function = list_function
+        self.callback = callback
+        self.walk_stats = walk_stats
+        self.error = None
+        self.cancelled = False
+        self.listings = dict()
+        if self.list_workers > 0:
+            self.list_pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.list_workers)
+        stage_workers = [
+            (WALK_PIPELINE_STAGE_MKDIR, self._mkdir_worker, self.mkdir_workers),
+            (WALK_PIPELINE_STAGE_COPY, self._copy_worker, self.copy_workers),
+        ]
+        if self.verify_workers > 0:
+            stage_workers.append((WALK_PIPELINE_STAGE_VERIFY, self._verify_worker, self.verify_workers))
+        self.queues = collections.OrderedDict([
+            (stage, queue.Queue(self.queue_size)) for stage, target, nworkers in stage_workers
+        ])
+        self.threads = collections.OrderedDict([
+            (stage, self._start_workers(target, nworkers)) for stage, target, nworkers in stage_workers
+        ])
+        self.time_start = time.perf_counter()
+        self.running = True
+
+    def _start_workers(self, target, nworkers):
+        threads = []
+        for i in range(nworkers):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _record(self, stage, nitems, busy_time):
+        with self.stats_lock:
+            stage_stat = self.stage_stats[stage]
+            stage_stat.nitems += nitems
+            stage_stat.busy_time += busy_time
+
+    def _put(self, stage, item):
+        if self.error is not None:
+            raise self.error
+        stage_queue = self.queues[stage]
+        # Blocks while the stage is full, which holds back the stages feeding it
+        stage_queue.put(item)
+        depth = stage_queue.qsize()
+        with self.stats_lock:
+            stage_stat = self.stage_stats[stage]
+            stage_stat.nputs += 1
+            stage_stat.queue_depth_sum += depth
+            if depth > stage_stat.queue_depth_max:
+                stage_stat.queue_depth_max = depth
+
+    def _set_error(self, e):
+        with self.stats_lock:
+            if self.error is None:
+                self.error = e
+
+    def _list_dir(self, dirpath):
+        time_start = time.perf_counter()
+        dirent_list = list(self.list_function(dirpath))
+        self._record(WALK_PIPELINE_STAGE_LIST, 1, time.perf_counter() - time_start)
+        return dirent_list
+
+    def prefetch_listings(self, dirpath_list):
+        if self.list_pool is None:
+            return
+        for dirpath in dirpath_list:
+            if len(self.listings) >= self.queue_size:
+                break
+            if dirpath not in self.listings:
+                self.listings[dirpath] = self.list_pool.submit(self._list_dir, dirpath)
+        depth = len(self.listings)
+        with self.stats_lock:
+            stage_stat = self.stage_stats[WALK_PIPELINE_STAGE_LIST]
+            stage_stat.nputs += 1
+            stage_stat.queue_depth_sum += depth
+            if depth > stage_stat.queue_depth_max:
+                stage_stat.queue_depth_max = depth
+
+    def get_listing(self, dirpath):
+        future = self.listings.pop(dirpath, None)
+        if future is None:
+            return self._list_dir(dirpath)
+        return future.result()
+
+    def discard_listing(self, dirpath):
+        future = self.listings.pop(dirpath, None)
+        if future is not None:
+            future.cancel()
+
+    def record_filter(self, nitems, busy_time):
+        self._record(WALK_PIPELINE_STAGE_FILTER, nitems, busy_time)
+
+    def put_dir(self, dstdir, file_jobs=None):
+        # Files are passed along with their destination directory, so that
+        # they only reach the copy stage once the directory exists
+        self._put(WALK_PIPELINE_STAGE_MKDIR, (dstdir, file_jobs))
+
+    def _mkdir_worker(self):
+        mkdir_queue = self.queues[WALK_PIPELINE_STAGE_MKDIR]
+        while True:
+            item = mkdir_queue.get()
+            if item is None:
+                break
+            if self.error is not None or self.cancelled:
+                continue
+            dstdir, file_jobs = item
+            try:
+                time_start = time.perf_counter()
+                if not (self.copy_method.dryrun or self.copy_method.metadata_only):
+                    self.copy_method._makedirs(dstdir)
+                self.copy_method.record_plan_mkdir(dstdir)
+                self._record(WALK_PIPELINE_STAGE_MKDIR, 1, time.perf_counter() - time_start)
+                if file_jobs:
+                    for job in file_jobs:
+                        self._put(WALK_PIPELINE_STAGE_COPY, job)
+            except Exception as e:
+                self._set_error(e)
+
+    def _copy_worker(self):
+        copy_queue = self.queues[WALK_PIPELINE_STAGE_COPY]
+        verify_queue = self.queues.get(WALK_PIPELINE_STAGE_VERIFY)
+        while True:
+            item = copy_queue.get()
+            if item is None:
+                break
+            if self.error is not None or self.cancelled:
+                continue
+            srcfile, dstfile, fdirent, dstat = item
+            try:
+                time_start = time.perf_counter()
+                # Completion is recorded once the copy passes its durability barrier.
+                # With a verify stage, copies are only registered for the barrier
+                # once they have been verified.
+                copy_success = self.copy_method.copy(srcfile, dstfile, srcpath_is_file=True, srcpath_stat=fdirent,
+                                                     on_durable=self.callback, defer_durable=(verify_queue is not None))
+                copy_time = time.perf_counter() - time_start
+                self._record(WALK_PIPELINE_STAGE_COPY, 1, copy_time)
+                if dstat is not None:
+                    self.walk_stats.copy_done(dstat, copy_time)
+                    dstat = None
+                if verify_queue is not None:
+                    if copy_success and not self.copy_method.dryrun:
+                        self._put(WALK_PIPELINE_STAGE_VERIFY, (srcfile, dstfile, fdirent, copy_success))
+                    else:
+                        self.copy_method.add_durable(srcfile, dstfile, copy_success, self.callback)
+            except Exception as e:
+                if dstat is not None:
+                    self.walk_stats.copy_done(dstat, time.perf_counter() - time_start)
+                self._set_error(e)
+
+    def _verify_worker(self):
+        verify_queue = self.queues[WALK_PIPELINE_STAGE_VERIFY]
+        while True:
+            item = verify_queue.get()
+            if item is None:
+                break
+            if self.error is not None or self.cancelled:
+                continue
+            srcfile, dstfile, fdirent, copy_success = item
+            try:
+                time_start = time.perf_counter()
+                self.verify(srcfile, dstfile, fdirent)
+                self._record(WALK_PIPELINE_STAGE_VERIFY, 1, time.perf_counter() - time_start)
+                self.copy_method.add_durable(srcfile, dstfile, copy_success, self.callback)
+            except Exception as e:
+                self._set_error(e)
+
+    def verify(self, srcfile, dstfile, fdirent=None):
+        if self.copy_method.action_verb == 'MOVING':
+            src_stat = None
+        elif fdirent is not None and not isinstance(fdirent, str):
+            src_stat = fdirent.stat()
+        else:
+            src_stat = os.stat(srcfile)
+        try:
+            dst_stat = os.stat(dstfile)
+        except OSError:
+            raise IOError("Destination file is missing after copy: {} -> {}".format(srcfile, dstfile))
+        if (    src_stat is not None and stat.S_ISREG(src_stat.st_mode) and stat.S_ISREG(dst_stat.st_mode)
+            and src_stat.st_size != dst_stat.st_size):
+            raise IOError("Destination file size ({}) differs from source ({}): {} -> {}".format(
+                dst_stat.st_size, src_stat.st_size, srcfile, dstfile))
+
+    def close(self, cancel_pending=False):
+        if not self.running:
+            return
+        self.running = False
+        if cancel_pending:
+            self.cancelled = True
+        # Stop stages in order, so that each stage drains into the next before it stops
+        for stage, threads in self.threads.items():
+            for thread in threads:
+                self.queues[stage].put(None)
+            for thread in threads:
+                thread.join()
+        if self.list_pool is not None:
+            for future in self.listings.values():
+                future.cancel()
+            self.list_pool.shutdown(wait=True)
+            self.list_pool = None
+        self.listings = dict()
+        self.elapsed += time.perf_counter() - self.time_start
+        if self.error is not None and not cancel_pending:
+            raise self.error
+
+    def get_metrics(self):
+        with self.stats_lock:
+            return collections.OrderedDict([
+                (stage, stage_stat.as_dict(self.elapsed)) for stage, stage_stat in self.stage_stats.items()
+            ])
+
+    def log_metrics(self, print_fn=None):
+        if print_fn is None:
+            print_fn = info
+        print_fn("Walk pipeline: {:.3f}s elapsed".format(self.elapsed))
+        for stage, metrics in self.get_metrics().items():
+            print_fn("  {}: {} items ({:.1f}/s), busy {:.3f}s, queue depth max {} mean {:.1f}".format(
+                stage, metrics['nitems'], metrics['items_per_sec'] or 0, metrics['busy_time'],
+                metrics['queue_depth_max'], metrics['queue_depth_mean']
+            ))
+
+
 class WalkObject(object):
     def __init__(self,
         mindepth=None, maxdepth=float('inf'), outdepth=None, dmatch_maxdepth=None,
@@ -496,7 +1057,16 @@ class WalkObject(object):
         rematch_function=None,
         resub_function=None,
         rematch_partial=False,
-        track_initialize_total=False
+        track_initialize_total=False,
+        walk_stats=None,
+        copy_workers=None,
+        copy_batch_size=None,
+        copy_overwrite_policy=None,
+        copy_tree_workers=None,
+        walk_pipeline=None,
+        copy_durability=None,
+        copy_order=None,
+        copy_order_window=None
     ):
         if any([depth < 0 for depth in [mindepth, maxdepth, outdepth, dmatch_maxdepth] if depth is not None]):
             raise cerr.InvalidArgumentError("depth arguments must be >= 0")
@@ -521,6 +1091,12 @@ class WalkObject(object):
             allow_dir_op = False
         if list_function is not None and list_function not in WALK_LIST_FUNCTION_AVAIL:
             raise cerr.InvalidArgumentError("`list_function` must be either os.listdir or os.scandir")
+        if copy_workers is not None and copy_workers < 1:
+            raise cerr.InvalidArgumentError("`copy_workers` must be >= 1")
+        if walk_stats is True:
+            walk_stats = WalkStats()
+        elif walk_stats is False:
+            walk_stats = None
 
         if mindepth is None:
             if outdepth is not None:
@@ -640,7 +1216,7 @@ class WalkObject(object):
                 copy_method = copy.copy(copy_method)
             elif type(copy_method) is str:
                 if copy_method in psu_cm.COPY_METHOD_DICT:
-                    copy_method = psu_cm.COPY_METHOD_DICT[copy_method]
+                    copy_method = copy.copy(psu_cm.COPY_METHOD_DICT[copy_method])
                 else:
                     copy_method = psu_cm.CopyMethod(copy_method, copy_shcmd_is_fmtstr=copy_method_is_fmtstr)
                     if copy_method.copy_shprog not in psu_cm.COPY_METHOD_SHPROGS and not allow_nonstd_shprogs:
@@ -654,7 +1230,11 @@ class WalkObject(object):
                 copy_overwrite_dirs=copy_overwrite_dirs,
                 copy_dryrun=copy_dryrun,
                 copy_verbose=(None if copy_quiet is None else (not copy_quiet)),
-                copy_debug=copy_debug
+                copy_debug=copy_debug,
+                copy_batch_size=copy_batch_size,
+                copy_overwrite_policy=copy_overwrite_policy,
+                copy_tree_workers=copy_tree_workers,
+                copy_durability=copy_durability
             )
 
         if allow_dir_op is None and (   copy_method.action_verb.upper() in ('SYMLINKING', 'MOVING')
@@ -693,6 +1273,14 @@ class WalkObject(object):
         self.track_initialize_total = track_initialize_total
         self.track_count_only = False
         self.track_update_total = True
+        self.walk_stats = walk_stats
+        self.copy_workers = 1 if copy_workers is None else copy_workers
+        self.copy_executor = None
+        self.walk_pipeline = walk_pipeline
+        self.walk_pipeline_active = False
+        self.metadata_dirs = None
+        self.copy_order = psu_cm.COPY_ORDER_FIFO if copy_order is None else copy_order
+        self.copy_order_window = psu_cm.COPY_ORDER_WINDOW if copy_order_window is None else copy_order_window
 
     def walk(self,
              srcdir, dstdir=None,
@@ -763,13 +1351,15 @@ class WalkObject(object):
                 dmatch_depth = 1
 
         if self.allow_dir_op and dmatch_depth != 0 and (self.mindepth <= depth <= self.maxdepth) and self.outdepth_inst in (-1, 0):
-            if not self.copy_method_inst.dryrun:
+            if not (self.copy_method_inst.dryrun or self.copy_method_inst.metadata_only):
                 os.makedirs(os.path.dirname(os.path.normpath(self.dstdir)), exist_ok=True)
             copy_success = self.copy_method_inst.copy(
                 self.srcdir, self.dstdir,
                 srcpath_is_file=False,
                 overwrite_dir=(self.copy_method_inst.copy_overwrite_dirs or (self.copy_overwrite_dmatch and dmatch_depth == 1)),
             )
+            # Finish deferred work of the copy method, like deleting moved sources
+            self.copy_method_inst.flush_batch()
             return
 
         if track_progress and imported_tqdm:
@@ -782,9 +1372,18 @@ class WalkObject(object):
             self.tftc = None
             self.tqdm = None
 
-        if self.copy_method_inst is not None and self.dstdir is not None and not os.path.isdir(self.dstdir):
+        if (    self.copy_method_inst is not None and self.dstdir is not None
+            and not self.copy_method_inst.metadata_only and not os.path.isdir(self.dstdir)):
             if not self.copy_method_inst.dryrun:
                 os.makedirs(self.dstdir)
+            self.copy_method_inst.record_plan_mkdir(self.dstdir)
+
+        # Directory metadata is synced once the whole walk is done, deepest first,
+        # so that changes to files within a directory come before its own
+        if self.copy_method_inst is not None and self.copy_method_inst.metadata_only:
+            self.metadata_dirs = []
+        else:
+            self.metadata_dirs = None
 
         depth = 1
 
@@ -820,8 +1419,36 @@ class WalkObject(object):
 
             self.tqdm.update(0)
 
-        for x in self._walk(self.srcdir, self.dstdir, depth, dmatch_depth):
-            yield x
+        if self.copy_method_inst is not None:
+            if self.walk_pipeline is not None:
+                self.walk_pipeline.start(self.copy_method_inst, self.list_function, callback=self._file_copy_done,
+                                         walk_stats=self.walk_stats)
+                self.walk_pipeline_active = True
+            else:
+                self.copy_executor = psu_cm.CopyExecutor(self.copy_workers,
+                                                         order=self.copy_order,
+                                                         order_window=self.copy_order_window)
+        try:
+            for x in self._walk(self.srcdir, self.dstdir, depth, dmatch_depth):
+                yield x
+            if self.copy_executor is not None:
+                self.copy_executor.wait()
+            if self.walk_pipeline_active:
+                self.walk_pipeline.close()
+                self.walk_pipeline_active = False
+            if self.metadata_dirs:
+                for srcdir_meta, dstdir_meta in self.metadata_dirs:
+                    self.copy_method_inst.copy(srcdir_meta, dstdir_meta, srcpath_is_file=False)
+                self.metadata_dirs = None
+            if self.copy_method_inst is not None:
+                self.copy_method_inst.flush_batch()
+        finally:
+            if self.copy_executor is not None:
+                self.copy_executor.shutdown(cancel_pending=True)
+                self.copy_executor = None
+            if self.walk_pipeline_active:
+                self.walk_pipeline.close(cancel_pending=True)
+                self.walk_pipeline_active = False
 
         self.track_count_only = False
         self.track_update_total = True
@@ -831,9 +1458,27 @@ class WalkObject(object):
             self.tqdm.close()
             self.tqdm = None
 
+    def _copy_file_timed(self, dstat, srcfile, dstfile, **kwargs):
+        time_start = time.perf_counter()
+        try:
+            return self.copy_method_inst.copy(srcfile, dstfile, **kwargs)
+        finally:
+            self.walk_stats.copy_done(dstat, time.perf_counter() - time_start)
+
+    def _file_copy_done(self, copy_success):
+        if self.tqdm is not None:
+            self.tqdm.update(1)
+
+    def _list_dir(self, srcdir):
+        if self.walk_pipeline_active:
+            return self.walk_pipeline.get_listing(srcdir)
+        return self.list_function(srcdir)
+
     def _walk(self, srcdir, dstdir, depth, dmatch_depth=-1):
         if depth > self.maxdepth and not (    self.dmatch_maxdepth_specified
                                           and 1 <= dmatch_depth <= self.dmatch_maxdepth):
+            if self.walk_pipeline_active:
+                self.walk_pipeline.discard_listing(srcdir)
             return
 
         # if depth == 1 and dmatch_depth == 0:
@@ -861,22 +1506,43 @@ class WalkObject(object):
             dstdir_exists = False
         elif os.path.isdir(dstdir):
             dstdir_exists = True
-        elif self.mkdir_upon_file_copy:
+        elif self.mkdir_upon_file_copy or self.copy_method_inst.metadata_only:
             dstdir_exists = False
         elif srcdir_passes:
-            if not self.copy_method_inst.dryrun:
-                os.makedirs(dstdir)
+            if self.walk_pipeline_active:
+                self.walk_pipeline.put_dir(dstdir)
+            else:
+                if not self.copy_method_inst.dryrun:
+                    os.makedirs(dstdir)
+                self.copy_method_inst.record_plan_mkdir(dstdir)
             dstdir_exists = True
         else:
             dstdir_exists = False
 
         dnames_filtered, fnames_filtered = [], []
+        fdirents_filtered = []
         dnames_filtered_pass = [] if self.dname_rematch else None
 
-        for dirent in self.list_function(srcdir):
+        if self.walk_stats is not None and not self.track_count_only:
+            dstat = self.walk_stats.sample(srcdir, depth)
+        else:
+            dstat = None
+        if dstat is not None:
+            time_start = time.perf_counter()
+            dirent_list = list(self._list_dir(srcdir))
+            dstat.scandir_time = time.perf_counter() - time_start
+            dstat.nentries = len(dirent_list)
+            cpu_time_start = time.thread_time()
+        else:
+            dirent_list = self._list_dir(srcdir)
+        if self.walk_pipeline_active:
+            filter_time_start = time.perf_counter()
+
+        for dirent in dirent_list:
             if self.list_function is os.listdir:
                 pname = dirent
                 dirent_is_dir = os.path.isdir(os.path.join(srcdir, pname))
+                dirent = None
             else:
                 pname = dirent.name
                 dirent_is_dir = dirent.is_dir()
@@ -918,6 +1584,12 @@ class WalkObject(object):
                             break
                 if fname_match:
                     fnames_filtered.append(pname)
+                    fdirents_filtered.append(dirent)
+
+        if dstat is not None:
+            dstat.filter_cpu_time = time.thread_time() - cpu_time_start
+        if self.walk_pipeline_active:
+            self.walk_pipeline.record_filter(len(dnames_filtered) + len(fnames_filtered), time.perf_counter() - filter_time_start)
 
         if self.tftc is not None:
             added_count = self.tftc.add(
@@ -938,26 +1610,62 @@ class WalkObject(object):
 
         if depth >= self.mindepth and srcdir_passes and not self.track_count_only:
 
-            if self.copy_method_inst is not None and dstdir is not None:
-                if not dstdir_exists and (not self.mkdir_upon_file_copy or fnames_filtered):
+            if self.copy_method_inst is not None and dstdir is not None and self.walk_pipeline_active:
+                file_jobs = []
+                for fname, fdirent in zip(fnames_filtered, fdirents_filtered):
+                    srcfile = os.path.join(srcdir, fname)
+                    if self.fname_resub:
+                        for re_pattern, repl_str in self.fname_resub:
+                            fname = self.resub_function(re_pattern, repl_str, fname)
+                    file_jobs.append((srcfile, os.path.join(dstdir, fname), fdirent, dstat))
+                if dstat is not None and file_jobs:
+                    self.walk_stats.start_copies(dstat, len(file_jobs))
+                if file_jobs or (not dstdir_exists and not self.mkdir_upon_file_copy):
+                    self.walk_pipeline.put_dir(dstdir, file_jobs)
+                    dstdir_exists = True
+
+            elif self.copy_method_inst is not None and dstdir is not None:
+                if (    not dstdir_exists and not self.copy_method_inst.metadata_only
+                    and (not self.mkdir_upon_file_copy or fnames_filtered)):
                     if not self.copy_method_inst.dryrun:
                         os.makedirs(dstdir)
+                    self.copy_method_inst.record_plan_mkdir(dstdir)
                     dstdir_exists = True
-                for fname in fnames_filtered:
+                if dstat is not None and fnames_filtered:
+                    self.walk_stats.start_copies(dstat, len(fnames_filtered))
+                    copy_fn = functools.partial(self._copy_file_timed, dstat)
+                else:
+                    copy_fn = self.copy_method_inst.copy
+                for fname, fdirent in zip(fnames_filtered, fdirents_filtered):
                     srcfile = os.path.join(srcdir, fname)
                     if self.fname_resub:
                         for re_pattern, repl_str in self.fname_resub:
                             fname = self.resub_function(re_pattern, repl_str, fname)
                     dstfile = os.path.join(dstdir, fname)
-                    copy_success = self.copy_method_inst.copy(srcfile, dstfile, srcpath_is_file=True)
-                    if self.tqdm is not None:
-                        self.tqdm.update(1)
+                    order_key = psu_cm.get_copy_order_key(self.copy_order, srcfile, fdirent)
+                    if self.copy_method_inst.durability_tracker is None:
+                        self.copy_executor.submit(
+                            copy_fn, srcfile, dstfile, srcpath_is_file=True,
+                            srcpath_stat=fdirent, callback=self._file_copy_done, order_key=order_key
+                        )
+                    else:
+                        self.copy_executor.submit(
+                            copy_fn, srcfile, dstfile, srcpath_is_file=True,
+                            srcpath_stat=fdirent, on_durable=self._file_copy_done, order_key=order_key
+                        )
+
+            if dstat is not None:
+                self.walk_stats.finish(dstat)
+                dstat = None
 
             dnames_yield = (      dnames_filtered if (dnames_filtered_pass is None or srcdir_passes)
                             else [dn for i, dn in enumerate(dnames_filtered) if dnames_filtered_pass[i]])
 
             yield srcdir, dnames_yield, fnames_filtered
 
+        if dstat is not None:
+            self.walk_stats.finish(dstat)
+
         if dnames_filtered and (   (depth < self.maxdepth or self.allow_dir_op)
                                 or (self.dmatch_maxdepth_specified and dmatch_depth != -1)):
             depth_next = depth + 1
@@ -971,10 +1679,15 @@ class WalkObject(object):
                 dmatch_depth_next_pass = dmatch_depth + 1
                 dmatch_depth_next_fail = dmatch_depth_next_pass
 
+            if self.walk_pipeline_active and not self.allow_dir_op:
+                self.walk_pipeline.prefetch_listings([os.path.join(srcdir, dn) for dn in dnames_filtered])
+
             for i, dn in enumerate(dnames_filtered):
                 srcdir_next_passes = (dnames_filtered_pass is None or dnames_filtered_pass[i])
 
                 if depth == self.maxdepth and not (dmatch_depth > 0 or srcdir_next_passes):
+                    if self.walk_pipeline_active:
+                        self.walk_pipeline.discard_listing(os.path.join(srcdir, dn))
                     continue
 
                 srcdir_next = os.path.join(srcdir, dn)
@@ -1000,7 +1713,7 @@ class WalkObject(object):
                 if (      self.allow_dir_op and depth >= self.mindepth
                     and ((not self.copy_overwrite_dmatch) or srcdir_next_passes)
                     and not self.track_count_only):
-                    if not dstdir_exists and not self.copy_method_inst.dryrun:
+                    if not (dstdir_exists or self.copy_method_inst.dryrun or self.copy_method_inst.metadata_only):
                         os.makedirs(dstdir)
                         dstdir_exists = True
                     copy_success = self.copy_method_inst.copy(
@@ -1013,6 +1726,13 @@ class WalkObject(object):
                     for x in self._walk(srcdir_next, dstdir_next, depth_next, dmatch_depth_next):
                         yield x
 
+        # Only directories that map to a destination directory of their own
+        if (    self.metadata_dirs is not None and dstdir is not None
+            and depth >= self.mindepth and srcdir_passes and not self.track_count_only
+            and not self.collapse_tree_inst
+            and (depth > self.outdepth_inst or depth == self.outdepth_inst == 1)):
+            self.metadata_dirs.append((srcdir, dstdir))
+
 
 def _walk(
     srcdir, dstdir=None,
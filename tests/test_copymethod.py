@@ -0,0 +1,784 @@
+import copy
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import pytest
+
+import psutils.copymethod as psu_cm
+import psutils.custom_errors as cerr
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as fp:
+        fp.write(data)
+
+
+def read_file(path):
+    with open(path, 'rb') as fp:
+        return fp.read()
+
+
+def get_copy_method(copy_method, **options):
+    copy_method = copy.copy(copy_method)
+    options.setdefault('copy_verbose', False)
+    copy_method.set_options(**options)
+    return copy_method
+
+
+## Metadata operation budget
+
+def test_metadata_op_budget(tmp_path):
+    # A new file costs one lstat of the source (through its cached DirEntry)
+    # and one of the destination, and each destination directory is created once
+    srcdir = tmp_path / 'src'
+    dstdir = tmp_path / 'dst'
+    nfiles = 10
+    for i in range(nfiles):
+        write_file(str(srcdir / 'f{}'.format(i)), b'x')
+    copy_method = get_copy_method(psu_cm.COPY_METHOD_COPY_FAST)
+
+    for dirent in os.scandir(str(srcdir)):
+        copy_method.copy(dirent.path, str(dstdir / dirent.name), srcpath_is_file=True, srcpath_stat=dirent)
+    assert copy_method.get_metadata_op_counts() == {'lstat': 2 * nfiles, 'makedirs': 1}
+
+    # Skipping existing files costs no more than copying them
+    copy_method.reset_metadata_op_counts()
+    for dirent in os.scandir(str(srcdir)):
+        copy_method.copy(dirent.path, str(dstdir / dirent.name), srcpath_is_file=True, srcpath_stat=dirent)
+    assert copy_method.get_metadata_op_counts() == {'lstat': 2 * nfiles}
+
+
+## FastCopy fallback chain
+
+def test_fast_copy_fallback_chain(tmp_path, monkeypatch):
+    # Each unsupported kernel path falls through to the next, ending with the
+    # buffered copy, and paths that fail as unsupported are not retried
+    calls = []
+
+    def fake_ficlone(src_fd, dst_fd, size):
+        calls.append(psu_cm.COPY_FAST_PATH_FICLONE)
+        raise OSError(errno.EOPNOTSUPP, 'not supported')
+
+    def fake_copy_file_range(src_fd, dst_fd, size):
+        calls.append(psu_cm.COPY_FAST_PATH_COPY_FILE_RANGE)
+        os.write(dst_fd, b'partial')
+        raise OSError(errno.EXDEV, 'cross-device')
+
+    def fake_sendfile(src_fd, dst_fd, size):
+        calls.append(psu_cm.COPY_FAST_PATH_SENDFILE)
+        os.write(dst_fd, b'garbage')
+        return False
+
+    monkeypatch.setattr(psu_cm, 'COPY_FAST_PATH_FN_LIST', [
+        (psu_cm.COPY_FAST_PATH_FICLONE, fake_ficlone),
+        (psu_cm.COPY_FAST_PATH_COPY_FILE_RANGE, fake_copy_file_range),
+        (psu_cm.COPY_FAST_PATH_SENDFILE, fake_sendfile),
+        (psu_cm.COPY_FAST_PATH_BUFFERED, psu_cm._copy_fd_buffered),
+    ])
+    recorded = []
+    monkeypatch.setattr(psu_cm, 'debug', recorded.append)
+
+    data = os.urandom(3 * 1024)
+    srcfile = str(tmp_path / 'src')
+    write_file(srcfile, data)
+    engine = psu_cm.FastCopy(record_files=True)
+
+    engine(srcfile, str(tmp_path / 'dst1'))
+    assert read_file(str(tmp_path / 'dst1')) == data
+    assert calls == [
+        psu_cm.COPY_FAST_PATH_FICLONE,
+        psu_cm.COPY_FAST_PATH_COPY_FILE_RANGE,
+        psu_cm.COPY_FAST_PATH_SENDFILE,
+    ]
+    assert engine.get_path_counts() == {psu_cm.COPY_FAST_PATH_BUFFERED: 1}
+    assert len(recorded) == 1 and recorded[0].endswith('({})'.format(psu_cm.COPY_FAST_PATH_BUFFERED))
+
+    # Only the path that declined without an error is tried again
+    del calls[:]
+    engine(srcfile, str(tmp_path / 'dst2'))
+    assert read_file(str(tmp_path / 'dst2')) == data
+    assert calls == [psu_cm.COPY_FAST_PATH_SENDFILE]
+    assert engine.get_path_counts() == {psu_cm.COPY_FAST_PATH_BUFFERED: 2}
+
+    engine.reset()
+    assert engine.get_path_counts() == {}
+    assert engine.unsupported == set()
+
+
+def test_fast_copy_raises_other_errors(tmp_path, monkeypatch):
+    def fake_ficlone(src_fd, dst_fd, size):
+        raise OSError(errno.EIO, 'input/output error')
+
+    monkeypatch.setattr(psu_cm, 'COPY_FAST_PATH_FN_LIST', [
+        (psu_cm.COPY_FAST_PATH_FICLONE, fake_ficlone),
+        (psu_cm.COPY_FAST_PATH_BUFFERED, psu_cm._copy_fd_buffered),
+    ])
+    srcfile = str(tmp_path / 'src')
+    write_file(srcfile, b'x')
+    engine = psu_cm.FastCopy()
+    with pytest.raises(OSError) as excinfo:
+        engine(srcfile, str(tmp_path / 'dst'))
+    assert excinfo.value.errno == errno.EIO
+    assert engine.unsupported == set()
+
+
+## Batched shell copies
+
+def test_batch_failure_reports_every_file(tmp_path):
+    # When a batch fails, every file is retried, each file's outcome is logged,
+    # and all failing files are reported together
+    srcdir = tmp_path / 'src'
+    dstdir = tmp_path / 'dst'
+    names = ['f0', 'f1', 'f2', 'f3']
+    for name in names:
+        write_file(str(srcdir / name), name.encode())
+    lines = []
+    event_log = psu_cm.CopyEventLog(mode=psu_cm.COPY_EVENT_LOG_MODE_BUFFERED, print_fn=lines.append)
+    copy_method = get_copy_method(psu_cm.COPY_METHOD_COPY_SYSTEM,
+                                  copy_batch_size=10, copy_verbose=True, copy_event_log=event_log)
+
+    for name in names:
+        copy_method.copy(str(srcdir / name), str(dstdir / name), srcpath_is_file=True)
+    # Nothing is logged until the batch has run
+    assert event_log.get_summary() == []
+
+    # Sources that vanish before the batch runs make it fail
+    os.remove(str(srcdir / 'f1'))
+    os.remove(str(srcdir / 'f2'))
+    with pytest.raises(cerr.ExternalError) as excinfo:
+        copy_method.flush_batch()
+    assert str(srcdir / 'f1') in str(excinfo.value)
+    assert str(srcdir / 'f2') in str(excinfo.value)
+    assert sorted(os.listdir(str(dstdir))) == ['f0', 'f3']
+    assert read_file(str(dstdir / 'f3')) == b'f3'
+
+    event_log.flush()
+    logged = '\n'.join(lines).splitlines()
+    assert len(logged) == len(names)
+    assert logged[0] == 'COPYING: {} -> {}'.format(srcdir / 'f0', dstdir / 'f0')
+    assert logged[1].startswith('COPYING: {} -> {} (FAILED; '.format(srcdir / 'f1', dstdir / 'f1'))
+    assert logged[2].startswith('COPYING: {} -> {} (FAILED; '.format(srcdir / 'f2', dstdir / 'f2'))
+    assert logged[3] == 'COPYING: {} -> {}'.format(srcdir / 'f3', dstdir / 'f3')
+
+
+## Overwrite policy
+
+def make_existing_pair(tmp_path, src_data, dst_data, src_mtime, dst_mtime):
+    srcfile = str(tmp_path / 'src')
+    dstfile = str(tmp_path / 'dst')
+    write_file(srcfile, src_data)
+    write_file(dstfile, dst_data)
+    os.utime(srcfile, (src_mtime, src_mtime))
+    os.utime(dstfile, (dst_mtime, dst_mtime))
+    return srcfile, dstfile
+
+
+@pytest.mark.parametrize('policy, src_data, dst_data, src_mtime, dst_mtime, overwrite', [
+    (psu_cm.COPY_OVERWRITE_POLICY_NEVER, b'new', b'old!', 2000, 1000, False),
+    (psu_cm.COPY_OVERWRITE_POLICY_ALWAYS, b'same', b'same', 1000, 1000, True),
+    (psu_cm.COPY_OVERWRITE_POLICY_IF_NEWER, b'same', b'same', 2000, 1000, True),
+    (psu_cm.COPY_OVERWRITE_POLICY_IF_NEWER, b'same', b'same', 1000, 2000, False),
+    (psu_cm.COPY_OVERWRITE_POLICY_IF_DIFFERENT_SIZE_MTIME, b'same', b'same', 1000, 1000, False),
+    (psu_cm.COPY_OVERWRITE_POLICY_IF_DIFFERENT_SIZE_MTIME, b'same', b'same', 1000, 2000, True),
+    (psu_cm.COPY_OVERWRITE_POLICY_IF_DIFFERENT_SIZE_MTIME, b'longer', b'same', 1000, 1000, True),
+    (psu_cm.COPY_OVERWRITE_POLICY_IF_DIFFERENT_CHECKSUM, b'same', b'same', 1000, 2000, False),
+    (psu_cm.COPY_OVERWRITE_POLICY_IF_DIFFERENT_CHECKSUM, b'abcd', b'abce', 1000, 1000, True),
+])
+def test_overwrite_policy(tmp_path, policy, src_data, dst_data, src_mtime, dst_mtime, overwrite):
+    srcfile, dstfile = make_existing_pair(tmp_path, src_data, dst_data, src_mtime, dst_mtime)
+    copy_method = get_copy_method(psu_cm.COPY_METHOD_COPY_META, copy_overwrite_policy=policy)
+
+    assert copy_method.copy(srcfile, dstfile, srcpath_is_file=True) == overwrite
+    assert read_file(dstfile) == (src_data if overwrite else dst_data)
+
+
+def test_overwrite_policy_rejects_unknown():
+    with pytest.raises(cerr.InvalidArgumentError):
+        get_copy_method(psu_cm.COPY_METHOD_COPY_META, copy_overwrite_policy='sometimes')
+
+
+
+
+## ResumableCopy
+
+RESUMABLE_CHUNK_SIZE = 1024
+# Not a multiple of the chunk size, so the last chunk is short
+RESUMABLE_SRC_SIZE = 10 * RESUMABLE_CHUNK_SIZE + 100
+
+
+def make_interrupted_copy(engine, srcfile, dstfile, nchunks_done):
+    # Leave the partial and progress files as a copy interrupted after `nchunks_done` chunks would
+    src_data = read_file(srcfile)
+    src_stat = os.stat(srcfile)
+    src_ident = {
+        'srcfile': os.path.abspath(srcfile),
+        'size': src_stat.st_size,
+        'mtime_ns': src_stat.st_mtime_ns,
+        'chunk_size': engine.chunk_size,
+    }
+    chunks = [src_data[i:i+engine.chunk_size] for i in range(0, len(src_data), engine.chunk_size)]
+    write_file(dstfile + psu_cm.COPY_RESUMABLE_PARTIAL_SUFFIX, b''.join(chunks[:nchunks_done]))
+    chunk_hashes = [hashlib.sha256(chunk).hexdigest() for chunk in chunks[:nchunks_done]]
+    engine._start_progress(dstfile + psu_cm.COPY_RESUMABLE_PROGRESS_SUFFIX,
+                           src_ident, nchunks_done, chunk_hashes).close()
+
+
+@pytest.mark.parametrize('verify_chunk_hash', [False, True])
+@pytest.mark.parametrize('nchunks_done', [0, 4, 10, 11])
+def test_resumable_resume(tmp_path, verify_chunk_hash, nchunks_done):
+    srcfile = str(tmp_path / 'src' / 'file')
+    dstfile = str(tmp_path / 'dst' / 'file')
+    src_data = os.urandom(RESUMABLE_SRC_SIZE)
+    write_file(srcfile, src_data)
+    engine = psu_cm.ResumableCopy(chunk_size=RESUMABLE_CHUNK_SIZE, size_threshold=0,
+                                  verify_chunk_hash=verify_chunk_hash)
+    make_interrupted_copy(engine, srcfile, dstfile, nchunks_done)
+
+    engine(srcfile, dstfile)
+
+    assert read_file(dstfile) == src_data
+    assert not os.path.exists(dstfile + psu_cm.COPY_RESUMABLE_PARTIAL_SUFFIX)
+    assert not os.path.exists(dstfile + psu_cm.COPY_RESUMABLE_PROGRESS_SUFFIX)
+
+
+def test_resumable_restarts_when_source_changed(tmp_path):
+    srcfile = str(tmp_path / 'src' / 'file')
+    dstfile = str(tmp_path / 'dst' / 'file')
+    write_file(srcfile, os.urandom(RESUMABLE_SRC_SIZE))
+    engine = psu_cm.ResumableCopy(chunk_size=RESUMABLE_CHUNK_SIZE, size_threshold=0)
+    make_interrupted_copy(engine, srcfile, dstfile, 4)
+
+    src_data = os.urandom(RESUMABLE_SRC_SIZE - 10)
+    write_file(srcfile, src_data)
+    engine(srcfile, dstfile)
+
+    assert read_file(dstfile) == src_data
+
+
+## StripedCopy
+
+@pytest.mark.parametrize('size', [0, 1000, 4096, 10 * 1024 + 7])
+def test_striped_copy(tmp_path, size):
+    srcfile = str(tmp_path / 'src')
+    dstfile = str(tmp_path / 'dst')
+    src_data = os.urandom(size)
+    write_file(srcfile, src_data)
+    os.utime(srcfile, (1000, 1000))
+    engine = psu_cm.StripedCopy(stripe_size=1024, workers=3, size_threshold=0)
+
+    engine(srcfile, dstfile)
+
+    assert read_file(dstfile) == src_data
+    assert os.stat(dstfile).st_mtime == 1000
+
+
+def test_striped_copy_rejects_bad_options():
+    with pytest.raises(cerr.InvalidArgumentError):
+        psu_cm.StripedCopy(stripe_size=0)
+    with pytest.raises(cerr.InvalidArgumentError):
+        psu_cm.StripedCopy(workers=0)
+
+
+## copytree_parallel
+
+def make_tree(rootdir, ndirs=3, nfiles=4):
+    tree = {}
+    for i in range(ndirs):
+        for j in range(nfiles):
+            relpath = os.path.join('d{}'.format(i), 'sub', 'f{}'.format(j))
+            data = os.urandom(100 * j)
+            write_file(os.path.join(rootdir, relpath), data)
+            tree[relpath] = data
+    return tree
+
+
+def test_copytree_parallel(tmp_path):
+    srcdir = str(tmp_path / 'src')
+    dstdir = str(tmp_path / 'dst')
+    tree = make_tree(srcdir)
+    os.utime(os.path.join(srcdir, 'd0', 'sub'), (1000, 1000))
+
+    psu_cm.copytree_parallel(srcdir, dstdir, workers=4)
+
+    for relpath, data in tree.items():
+        assert read_file(os.path.join(dstdir, relpath)) == data
+    # Directory times are set after their files are copied
+    assert os.stat(os.path.join(dstdir, 'd0', 'sub')).st_mtime == 1000
+
+
+def test_copytree_parallel_collects_errors(tmp_path):
+    # Failing files don't stop the others from being copied, and are all reported together
+    srcdir = str(tmp_path / 'src')
+    dstdir = str(tmp_path / 'dst')
+    tree = make_tree(srcdir)
+    os.symlink(str(tmp_path / 'missing'), os.path.join(srcdir, 'd1', 'dangling'))
+    fail_name = 'f2'
+
+    def copy_function(srcpath, dstpath):
+        if os.path.basename(srcpath) == fail_name:
+            raise OSError(errno.EIO, 'input/output error')
+        return shutil.copy2(srcpath, dstpath)
+
+    with pytest.raises(shutil.Error) as excinfo:
+        psu_cm.copytree_parallel(srcdir, dstdir, copy_function=copy_function, workers=4)
+    failed_srcpaths = sorted(error[0] for error in excinfo.value.args[0])
+    assert failed_srcpaths == sorted(
+        [os.path.join(srcdir, relpath) for relpath in tree if os.path.basename(relpath) == fail_name]
+        + [os.path.join(srcdir, 'd1', 'dangling')]
+    )
+    for relpath, data in tree.items():
+        if os.path.basename(relpath) != fail_name:
+            assert read_file(os.path.join(dstdir, relpath)) == data
+
+
+## BackgroundDeleter
+
+def test_background_delete(tmp_path, monkeypatch):
+    # The path is gone from its parent at once, and its contents once flushed
+    monkeypatch.setattr(psu_cm, 'COPY_TRASH_UNLINK_CHUNK_SIZE', 3)
+    rootdir = tmp_path / 'root'
+    deldir = str(rootdir / 'del')
+    make_tree(deldir)
+    for i in range(10):
+        write_file(os.path.join(deldir, 'top{}'.format(i)), b'x')
+    write_file(str(rootdir / 'keep'), b'keep')
+    deleter = psu_cm.BackgroundDeleter(workers=2)
+
+    deleter.delete(deldir)
+    assert not os.path.exists(deldir)
+
+    assert deleter.shutdown() == []
+    assert os.listdir(str(rootdir)) == ['keep']
+    assert deleter.pool is None
+
+
+def test_background_delete_reports_errors(tmp_path, monkeypatch):
+    deldir = str(tmp_path / 'del')
+    for i in range(5):
+        write_file(os.path.join(deldir, 'top{}'.format(i)), b'x')
+    unlink = os.unlink
+
+    def failing_unlink(path, *args, **kwargs):
+        if os.path.basename(path) == 'top3':
+            raise OSError(errno.EACCES, 'permission denied')
+        return unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, 'unlink', failing_unlink)
+    deleter = psu_cm.BackgroundDeleter(workers=2)
+    deleter.delete(deldir)
+    errors = deleter.shutdown()
+
+    assert any(os.path.basename(errpath) == 'top3' for errpath, _ in errors)
+    # Only the file that couldn't be unlinked is left behind
+    trash_dirs = os.listdir(str(tmp_path))
+    assert len(trash_dirs) == 1 and trash_dirs[0].startswith('.del.')
+    assert os.listdir(str(tmp_path / trash_dirs[0])) == ['top3']
+
+
+## DedupeCopy
+
+def test_dedupe_links_identical_files(tmp_path):
+    srcdir = tmp_path / 'src'
+    dstdir = tmp_path / 'dst'
+    os.makedirs(str(dstdir))
+    contents = [b'same', b'diff', b'same', b'longer', b'same']
+    for i, data in enumerate(contents):
+        write_file(str(srcdir / 'f{}'.format(i)), data)
+    engine = psu_cm.DedupeCopy()
+
+    for i in range(len(contents)):
+        engine(str(srcdir / 'f{}'.format(i)), str(dstdir / 'f{}'.format(i)))
+
+    for i, data in enumerate(contents):
+        assert read_file(str(dstdir / 'f{}'.format(i))) == data
+    assert os.stat(str(dstdir / 'f2')).st_ino == os.stat(str(dstdir / 'f0')).st_ino
+    assert os.stat(str(dstdir / 'f4')).st_ino == os.stat(str(dstdir / 'f0')).st_ino
+    assert os.stat(str(dstdir / 'f1')).st_ino != os.stat(str(dstdir / 'f0')).st_ino
+    assert engine.get_counts() == {'copied': 3, 'linked': 2, 'bytes_saved': 8}
+
+
+def test_dedupe_skips_changed_index_entries(tmp_path):
+    # An indexed file changed since it was recorded is not linked to
+    srcdir = tmp_path / 'src'
+    dstdir = tmp_path / 'dst'
+    os.makedirs(str(dstdir))
+    write_file(str(srcdir / 'f0'), b'same')
+    write_file(str(srcdir / 'f1'), b'same')
+    engine = psu_cm.DedupeCopy()
+
+    engine(str(srcdir / 'f0'), str(dstdir / 'f0'))
+    write_file(str(dstdir / 'f0'), b'edit')
+    os.utime(str(dstdir / 'f0'), ns=(0, 0))
+    engine(str(srcdir / 'f1'), str(dstdir / 'f1'))
+
+    assert read_file(str(dstdir / 'f1')) == b'same'
+    assert engine.get_counts().get('linked', 0) == 0
+
+
+def test_dedupe_stats_grow_linearly(tmp_path, monkeypatch):
+    # Files sharing a size but not content cost a fixed number of stats each,
+    # however many files of that size are already indexed
+    srcdir = tmp_path / 'src'
+    dstdir = tmp_path / 'dst'
+    os.makedirs(str(dstdir))
+    nfiles = 50
+    for i in range(nfiles):
+        write_file(str(srcdir / 'f{}'.format(i)), '{:04d}'.format(i).encode())
+    nstats = [0]
+    os_stat = os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        nstats[0] += 1
+        return os_stat(path, *args, **kwargs)
+
+    def copy_data(srcfile, dstfile):
+        with open(srcfile, 'rb') as fsrc, open(dstfile, 'wb') as fdst:
+            fdst.write(fsrc.read())
+
+    monkeypatch.setattr(os, 'stat', counting_stat)
+    engine = psu_cm.DedupeCopy(copy_fn=copy_data)
+    for i in range(nfiles):
+        engine(str(srcdir / 'f{}'.format(i)), str(dstdir / 'f{}'.format(i)))
+
+    assert engine.get_counts()['copied'] == nfiles
+    # One stat of each source, one of each copy, and one of the first file when it is hashed
+    assert nstats[0] == 2 * nfiles + 1
+
+
+def test_dedupe_concurrent_saves(tmp_path):
+    index_file = str(tmp_path / 'dedupe_index.json')
+    srcdir = tmp_path / 'src'
+    dstdir = tmp_path / 'dst'
+    engine = psu_cm.DedupeCopy(index_file=index_file, save_on_flush=False)
+    os.makedirs(str(dstdir))
+    for i in range(20):
+        write_file(str(srcdir / 'f{}'.format(i)), b'x' * (i % 5 + 1))
+        engine(str(srcdir / 'f{}'.format(i)), str(dstdir / 'f{}'.format(i)))
+
+    errors = []
+
+    def save():
+        try:
+            for i in range(10):
+                engine.save()
+        except Exception as e:
+            errors.append(e)
+
+    save_threads = [threading.Thread(target=save) for i in range(8)]
+    for thread in save_threads:
+        thread.start()
+    for thread in save_threads:
+        thread.join()
+
+    assert errors == []
+    # No temporary index files are left behind
+    assert sorted(os.listdir(str(tmp_path))) == ['dedupe_index.json', 'dst', 'src']
+    with open(index_file, 'r') as index_fp:
+        index_json = json.load(index_fp)
+    assert len(index_json['entries']) > 0
+    assert psu_cm.DedupeCopy(index_file=index_file).index == engine.index
+
+
+## TunedCopy
+
+@pytest.mark.parametrize('buffer_size', [None, 1000])
+@pytest.mark.parametrize('size', [0, 999, 1000, 5 * 1000 + 1])
+def test_tuned_copy(tmp_path, buffer_size, size):
+    srcfile = str(tmp_path / 'src')
+    dstfile = str(tmp_path / 'dst')
+    src_data = os.urandom(size)
+    write_file(srcfile, src_data)
+    # Data left in an existing destination file is replaced
+    write_file(dstfile, b'y' * (2 * size + 10))
+    engine = psu_cm.TunedCopy(buffer_size=buffer_size)
+
+    engine(srcfile, dstfile)
+    assert read_file(dstfile) == src_data
+
+
+def test_tuned_copy_buffer_size():
+    engine = psu_cm.TunedCopy()
+    assert engine.get_buffer_size(0) == psu_cm.COPY_TUNED_BUFSIZE_MIN
+    assert engine.get_buffer_size(64 * psu_cm.COPY_TUNED_BUFSIZE_MIN) == 8 * psu_cm.COPY_TUNED_BUFSIZE_MIN
+    assert engine.get_buffer_size(1024 * psu_cm.COPY_TUNED_BUFSIZE_MAX) == psu_cm.COPY_TUNED_BUFSIZE_MAX
+    assert psu_cm.TunedCopy(buffer_size=4096).get_buffer_size(1024 ** 3) == 4096
+    with pytest.raises(cerr.InvalidArgumentError):
+        psu_cm.TunedCopy(buffer_size=0)
+
+
+## MmapCopy
+
+@pytest.mark.parametrize('size', [0, 7, 1000, 4 * 1000 + 3])
+def test_mmap_copy(tmp_path, size):
+    srcfile = str(tmp_path / 'src')
+    dstfile = str(tmp_path / 'dst')
+    src_data = os.urandom(size)
+    write_file(srcfile, src_data)
+    engine = psu_cm.MmapCopy(size_threshold=0, chunk_size=1000, verify=True)
+
+    engine(srcfile, dstfile)
+    assert read_file(dstfile) == src_data
+
+
+@pytest.mark.parametrize('size, diff_offset', [(8 * 100, 0), (8 * 100, 8 * 50 + 3), (8 * 100 + 5, 8 * 100 + 4)])
+def test_files_equal_mmap(tmp_path, size, diff_offset):
+    # Differences are found in whole 8-byte items and in the unaligned tail
+    file1 = str(tmp_path / 'file1')
+    file2 = str(tmp_path / 'file2')
+    data = bytearray(os.urandom(size))
+    write_file(file1, bytes(data))
+    write_file(file2, bytes(data))
+    assert psu_cm.files_equal_mmap(file1, file2, chunk_size=64)
+
+    data[diff_offset] ^= 0xff
+    write_file(file2, bytes(data))
+    assert not psu_cm.files_equal_mmap(file1, file2, chunk_size=64)
+    write_file(file2, bytes(data[:-1]))
+    assert not psu_cm.files_equal_mmap(file1, file2, chunk_size=64)
+
+
+## SparseCopy
+
+def test_sparse_copy(tmp_path):
+    srcfile = str(tmp_path / 'src')
+    dstfile = str(tmp_path / 'dst')
+    size = 4 * 1024 * 1024
+    data_offset = 1024 * 1024
+    data = os.urandom(64 * 1024)
+    with open(srcfile, 'wb') as fp:
+        # Holes before the data and at the end of the file
+        fp.seek(data_offset)
+        fp.write(data)
+        fp.truncate(size)
+    if os.stat(srcfile).st_blocks * 512 >= size:
+        pytest.skip("filesystem does not support sparse files")
+    engine = psu_cm.SparseCopy()
+
+    engine(srcfile, dstfile)
+
+    dst_data = read_file(dstfile)
+    assert len(dst_data) == size
+    assert dst_data[data_offset:data_offset+len(data)] == data
+    assert dst_data.count(b'\0') >= size - len(data)
+    assert os.stat(dstfile).st_blocks * 512 < size
+    assert engine.nbytes_skipped >= size - 2 * len(data)
+
+
+def test_sparse_copy_dense_file(tmp_path):
+    srcfile = str(tmp_path / 'src')
+    dstfile = str(tmp_path / 'dst')
+    src_data = os.urandom(10 * 1024)
+    write_file(srcfile, src_data)
+    engine = psu_cm.SparseCopy()
+
+    engine(srcfile, dstfile)
+    assert read_file(dstfile) == src_data
+    assert engine.nbytes_skipped == 0
+
+
+## Metadata sync
+
+def test_metadata_sync_updates_existing_destination(tmp_path):
+    srcfile = str(tmp_path / 'src' / 'file')
+    dstfile = str(tmp_path / 'dst' / 'file')
+    write_file(srcfile, b'source')
+    write_file(dstfile, b'destination')
+    os.chmod(srcfile, 0o640)
+    os.utime(srcfile, (1000, 1000))
+    copy_method = get_copy_method(psu_cm.COPY_METHOD_SYNC_METADATA)
+
+    assert copy_method.copy(srcfile, dstfile)
+    # Only metadata is changed
+    assert read_file(dstfile) == b'destination'
+    assert os.stat(dstfile).st_mtime == 1000
+    assert os.stat(dstfile).st_mode & 0o777 == 0o640
+
+
+def test_metadata_sync_skips_missing_destination(tmp_path):
+    srcfile = str(tmp_path / 'src' / 'file')
+    dstfile = str(tmp_path / 'dst' / 'file')
+    write_file(srcfile, b'x')
+    copy_method = get_copy_method(psu_cm.COPY_METHOD_SYNC_METADATA)
+
+    assert copy_method.copy(srcfile, dstfile) is False
+    assert not os.path.exists(os.path.dirname(dstfile))
+
+
+## Durability barriers
+
+def test_durable_move_deletes_source_after_barrier(tmp_path, monkeypatch):
+    # A moved source is only deleted once its copy has been synced
+    events = []
+    fsync_path = psu_cm.fsync_path
+    fast_move_delete = psu_cm.FastMove._delete
+
+    def recording_fsync_path(path):
+        events.append(('fsync', path))
+        return fsync_path(path)
+
+    def recording_delete(self, delete_list):
+        if delete_list:
+            events.append(('delete', list(delete_list)))
+        return fast_move_delete(self, delete_list)
+
+    def fail_rename_exdev(srcpath, dstpath):
+        raise OSError(errno.EXDEV, 'cross-device link')
+
+    monkeypatch.setattr(psu_cm, 'fsync_path', recording_fsync_path)
+    monkeypatch.setattr(psu_cm.FastMove, '_delete', recording_delete)
+    monkeypatch.setattr(os, 'rename', fail_rename_exdev)
+    srcfile = str(tmp_path / 'src' / 'file')
+    dstdir = str(tmp_path / 'dst')
+    dstfile = os.path.join(dstdir, 'file')
+    write_file(srcfile, b'data')
+    copy_method = get_copy_method(psu_cm.COPY_METHOD_MOVE_FAST,
+                                  copy_durability=psu_cm.COPY_DURABILITY_PER_DIRECTORY)
+
+    copy_method.copy(srcfile, dstfile, srcpath_is_file=True,
+                     on_durable=lambda copy_success: events.append(('durable', copy_success)))
+    assert os.path.isfile(srcfile)
+    assert events == []
+
+    copy_method.flush_batch()
+    assert not os.path.exists(srcfile)
+    assert read_file(dstfile) == b'data'
+    assert events == [
+        ('fsync', dstfile),
+        ('fsync', dstdir),
+        ('delete', [srcfile]),
+        ('durable', True),
+    ]
+
+
+@pytest.mark.parametrize('copy_method', [psu_cm.COPY_METHOD_MOVE, psu_cm.COPY_METHOD_MOVE_SYSTEM])
+def test_durability_rejects_moves_without_held_deletes(copy_method):
+    with pytest.raises(cerr.InvalidArgumentError):
+        get_copy_method(copy_method, copy_durability=psu_cm.COPY_DURABILITY_PER_FILE)
+    # Without durability, these moves are fine
+    get_copy_method(copy_method, copy_durability=psu_cm.COPY_DURABILITY_NONE)
+
+
+## Copy ordering
+
+def test_copy_order_key(tmp_path):
+    srcdir = tmp_path / 'src'
+    for name, size in [('a', 30), ('b', 10), ('c', 20)]:
+        write_file(str(srcdir / name), b'x' * size)
+    dirents = sorted(os.scandir(str(srcdir)), key=lambda dirent: dirent.name)
+
+    def ordered_names(order):
+        return [dirent.name for dirent in sorted(
+            dirents, key=lambda dirent: psu_cm.get_copy_order_key(order, dirent.path, dirent))]
+
+    assert psu_cm.get_copy_order_key(psu_cm.COPY_ORDER_FIFO, dirents[0].path, dirents[0]) is None
+    assert ordered_names(psu_cm.COPY_ORDER_LARGEST_FIRST) == ['a', 'c', 'b']
+    assert ordered_names(psu_cm.COPY_ORDER_SMALLEST_FIRST) == ['b', 'c', 'a']
+    # Without a DirEntry, the size comes from the path
+    assert psu_cm.get_copy_order_key(psu_cm.COPY_ORDER_LARGEST_FIRST, dirents[0].path) == -30
+
+
+@pytest.mark.parametrize('order_window, expected_order', [
+    (10, [50, 40, 30, 20, 10, 5]),
+    # Only tasks within the window are reordered
+    (2, [30, 40, 50, 20, 10, 5]),
+])
+def test_copy_executor_largest_first(order_window, expected_order):
+    done = []
+    copy_executor = psu_cm.CopyExecutor(workers=1, order=psu_cm.COPY_ORDER_LARGEST_FIRST,
+                                        order_window=order_window)
+    for size in [10, 30, 20, 40, 50, 5]:
+        copy_executor.submit(done.append, size, order_key=-size)
+    copy_executor.wait()
+    assert done == expected_order
+
+
+## Copy plans
+
+def test_copy_plan_replay_is_idempotent(tmp_path):
+    srcdir = tmp_path / 'src'
+    dstdir = tmp_path / 'dst'
+    plan_file = str(tmp_path / 'plan.jsonl')
+    for i in range(5):
+        write_file(str(srcdir / 'f{}'.format(i)), b'data' * i)
+    write_file(str(dstdir / 'f1'), b'stale')
+
+    # Plan a forced overwrite of every file
+    copy_plan = psu_cm.CopyPlanWriter(plan_file, copy_method=psu_cm.ARGCHO_COPY_METHOD_COPY,
+                                      overwrite_policy=psu_cm.COPY_OVERWRITE_POLICY_ALWAYS)
+    plan_method = get_copy_method(psu_cm.COPY_METHOD_COPY_META, copy_overwrite_files=True,
+                                  copy_dryrun=True, copy_plan=copy_plan)
+    for i in range(5):
+        plan_method.copy(str(srcdir / 'f{}'.format(i)), str(dstdir / 'f{}'.format(i)), srcpath_is_file=True)
+    copy_plan.close()
+
+    plan_header = psu_cm.read_copy_plan_header(plan_file)
+    assert plan_header['method'] == psu_cm.ARGCHO_COPY_METHOD_COPY
+    replay_policy = psu_cm.get_copy_plan_replay_policy(plan_header['overwrite_policy'])
+
+    entries = list(psu_cm.read_copy_plan(plan_file))
+    replay_method = get_copy_method(psu_cm.ARGMAP_COPY_METHOD_FUNC[plan_header['method']],
+                                    copy_overwrite_policy=replay_policy)
+    counts = psu_cm.replay_copy_plan(replay_method, entries)
+    assert counts['done'] == 5
+    for i in range(5):
+        assert read_file(str(dstdir / 'f{}'.format(i))) == b'data' * i
+
+    counts = psu_cm.replay_copy_plan(replay_method, entries)
+    assert counts['done'] == 0
+    assert counts['skipped'] == 5
+
+
+def test_split_copy_plan_keeps_header(tmp_path):
+    plan_file = str(tmp_path / 'plan.jsonl')
+    copy_plan = psu_cm.CopyPlanWriter(plan_file, copy_method=psu_cm.ARGCHO_COPY_METHOD_COPY_FAST,
+                                      overwrite_policy=psu_cm.COPY_OVERWRITE_POLICY_IF_NEWER)
+    for i in range(6):
+        copy_plan.write(psu_cm.COPY_METHOD_COPY_FAST.action_verb, '/src/f{}'.format(i), '/dst/f{}'.format(i),
+                        size=i * 1000, path_type=psu_cm.COPY_PLAN_TYPE_FILE)
+    copy_plan.close()
+
+    shard_files = psu_cm.split_copy_plan(plan_file, 3, str(tmp_path / 'shard'))
+
+    assert len(shard_files) == 3
+    assert sum([len(list(psu_cm.read_copy_plan(shard_file))) for shard_file in shard_files]) == 6
+    for shard_file in shard_files:
+        assert psu_cm.read_copy_plan_header(shard_file) == psu_cm.read_copy_plan_header(plan_file)
+
+
+
+
+def test_copy_plan_weights_directories_by_contents(tmp_path):
+    # A directory planned as a single operation records the size of its files,
+    # so that sharding doesn't pile large directories into one shard
+    srcdir = tmp_path / 'src'
+    dstdir = tmp_path / 'dst'
+    plan_file = str(tmp_path / 'plan.jsonl')
+    write_file(str(srcdir / 'big' / 'sub' / 'f0'), b'x' * 30000)
+    write_file(str(srcdir / 'big' / 'f1'), b'x' * 20000)
+    write_file(str(srcdir / 'small' / 'f0'), b'x' * 10)
+    os.makedirs(str(dstdir))
+
+    copy_plan = psu_cm.CopyPlanWriter(plan_file, copy_method=psu_cm.ARGCHO_COPY_METHOD_COPY)
+    plan_method = get_copy_method(psu_cm.COPY_METHOD_COPY_META, copy_dryrun=True, copy_plan=copy_plan)
+    for name in ['big', 'small']:
+        plan_method.copy(str(srcdir / name), str(dstdir / name), srcpath_is_file=False)
+    copy_plan.close()
+
+    entries = dict((os.path.basename(entry['dst']), entry) for entry in psu_cm.read_copy_plan(plan_file))
+    assert entries['big']['type'] == psu_cm.COPY_PLAN_TYPE_DIR
+    assert entries['big']['size'] == 50000
+    assert entries['small']['size'] == 10
+
+    file_entries = [
+        {'action': 'COPYING', 'src': '/src/f{}'.format(i), 'dst': '/dst/f{}'.format(i),
+         'size': 20000, 'type': psu_cm.COPY_PLAN_TYPE_FILE}
+        for i in range(2)
+    ]
+    shards = psu_cm.get_copy_plan_shards(list(entries.values()) + file_entries, 2)
+    shard_dsts = sorted(sorted(os.path.basename(entry['dst']) for entry in shard) for shard in shards)
+    assert shard_dsts == [['big'], ['f0', 'f1', 'small']]
@@ -0,0 +1,92 @@
+import concurrent.futures
+import os
+
+import pytest
+
+import file_xfer
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as fp:
+        fp.write(data)
+
+
+## Hardlink records
+
+def test_hardlink_records_replace_stale_symlinks(tmp_path):
+    record_dir = str(tmp_path / 'records')
+    srcfile = str(tmp_path / 'src' / 'file')
+    dstfile = str(tmp_path / 'dst' / 'file')
+    write_file(srcfile, b'x')
+    write_file(dstfile, b'x')
+    record_writer = file_xfer.HardlinkRecordWriter(record_dir)
+    record_path_for_src, record_path_for_dst = record_writer.get_record_paths(os.path.realpath(dstfile))
+
+    # A record left by an earlier transfer from another source is replaced
+    write_file(str(tmp_path / 'old' / 'file'), b'x')
+    os.makedirs(os.path.dirname(record_path_for_src))
+    os.symlink(str(tmp_path / 'old' / 'file'), record_path_for_src)
+    record_writer.add(srcfile, dstfile)
+    record_writer.flush()
+    assert os.readlink(record_path_for_src) == srcfile
+    assert os.readlink(record_path_for_dst) == dstfile
+    assert record_writer.nwritten == 2
+
+    # Records that already point to their targets are left as they are
+    record_writer.add(srcfile, dstfile)
+    record_writer.flush()
+    assert record_writer.nwritten == 2
+
+
+def test_hardlink_records_replace_other_paths(tmp_path):
+    record_dir = str(tmp_path / 'records')
+    srcfile = str(tmp_path / 'src' / 'file')
+    dstfile = str(tmp_path / 'dst' / 'file')
+    write_file(srcfile, b'x')
+    write_file(dstfile, b'x')
+    record_writer = file_xfer.HardlinkRecordWriter(record_dir)
+    record_path_for_src, record_path_for_dst = record_writer.get_record_paths(os.path.realpath(dstfile))
+    # Regular files and directories in the way of records are replaced too
+    write_file(record_path_for_src, b'not a record')
+    write_file(os.path.join(record_path_for_dst, 'file'), b'not a record')
+
+    record_writer.add(srcfile, dstfile)
+    record_writer.flush()
+    assert os.readlink(record_path_for_src) == srcfile
+    assert os.readlink(record_path_for_dst) == dstfile
+
+
+def test_hardlink_records_dryrun_writes_nothing(tmp_path):
+    record_dir = str(tmp_path / 'records')
+    record_writer = file_xfer.HardlinkRecordWriter(record_dir, dryrun=True)
+    record_writer.add(str(tmp_path / 'src' / 'file'), str(tmp_path / 'dst' / 'file'))
+    record_writer.flush()
+    assert not os.path.exists(record_dir)
+    assert record_writer.nwritten == 0
+
+
+## Task results
+
+def test_wait_for_tasks_collects_failures():
+    # Every task is waited on, and failed tasks are reported together
+    done = []
+
+    def run_task(fail):
+        if fail:
+            raise IOError("task failed")
+
+    task_list = [('/src/{}'.format(i), '/dst/{}'.format(i)) for i in range(6)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as pool:
+        future_task_dict = dict(
+            (pool.submit(run_task, i % 3 == 1), task) for i, task in enumerate(task_list)
+        )
+        failed_tasks = file_xfer.wait_for_tasks(future_task_dict,
+                                                on_task_done=lambda srcpath, dstpath: done.append(srcpath))
+
+    assert sorted(done) == ['/src/0', '/src/2', '/src/3', '/src/5']
+    assert sorted(srcpath for srcpath, dstpath, task_error in failed_tasks) == ['/src/1', '/src/4']
+    with pytest.raises(file_xfer.TaskFailureError) as excinfo:
+        file_xfer.check_failed_tasks(failed_tasks, len(task_list))
+    assert str(excinfo.value).startswith("2 of 6 tasks failed")
+    file_xfer.check_failed_tasks([], len(task_list))
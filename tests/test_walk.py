@@ -0,0 +1,164 @@
+import copy
+import errno
+import os
+import shutil
+
+import pytest
+
+import psutils.copymethod as psu_cm
+import psutils.walk as psu_walk
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as fp:
+        fp.write(data)
+
+
+def read_file(path):
+    with open(path, 'rb') as fp:
+        return fp.read()
+
+
+def make_tree(rootdir):
+    tree = {
+        os.path.join('a', 'f1'): b'f1',
+        os.path.join('a', 'b', 'f2'): b'f2',
+        'f3': b'f3',
+    }
+    for relpath, data in tree.items():
+        write_file(os.path.join(rootdir, relpath), data)
+    return tree
+
+
+def fail_rename_exdev(srcpath, dstpath):
+    raise OSError(errno.EXDEV, 'cross-device link')
+
+
+## Moves across filesystems
+
+def test_move_fast_cross_device_defers_deletes(tmp_path, monkeypatch):
+    # Sources copied across filesystems are deleted in batches, or when flushed
+    monkeypatch.setattr(os, 'rename', fail_rename_exdev)
+    srcdir = str(tmp_path / 'src')
+    dstdir = str(tmp_path / 'dst')
+    tree = make_tree(srcdir)
+    os.makedirs(dstdir)
+    engine = psu_cm.FastMove(workers=2, delete_batch_size=10)
+
+    engine(os.path.join(srcdir, 'a'), os.path.join(dstdir, 'a'))
+    engine(os.path.join(srcdir, 'f3'), os.path.join(dstdir, 'f3'))
+    assert engine.get_path_counts() == {psu_cm.COPY_MOVE_PATH_COPY: 2}
+    assert sorted(os.listdir(srcdir)) == ['a', 'f3']
+
+    engine.flush()
+    assert os.listdir(srcdir) == []
+    for relpath, data in tree.items():
+        assert read_file(os.path.join(dstdir, relpath)) == data
+
+
+def test_walk_dir_op_flushes_deferred_deletes(tmp_path, monkeypatch):
+    # A source directory moved as a single operation is gone once the walk is done
+    monkeypatch.setattr(os, 'rename', fail_rename_exdev)
+    srcdir = str(tmp_path / 'src')
+    dstdir = str(tmp_path / 'dst')
+    tree = make_tree(srcdir)
+    copy_method = psu_cm.CopyMethod(psu_cm.FastMove(workers=2, delete_batch_size=10), 'move_fast', 'moving')
+    walk_object = psu_walk.WalkObject(copy_method=copy_method, mindepth=0, outdepth=0, copy_quiet=True)
+
+    for _ in walk_object.walk(srcdir, dstdir):
+        pass
+
+    assert not os.path.exists(srcdir)
+    for relpath, data in tree.items():
+        assert read_file(os.path.join(dstdir, 'src', relpath)) == data
+
+
+## Metadata sync
+
+def test_walk_metadata_sync_sets_directory_times(tmp_path):
+    # Directory times are synced after the files within them
+    srcdir = str(tmp_path / 'src')
+    dstdir = str(tmp_path / 'dst')
+    tree = make_tree(srcdir)
+    for relpath in tree:
+        write_file(os.path.join(dstdir, relpath), b'old')
+    for dirpath, _, fnames in os.walk(srcdir, topdown=False):
+        for name in fnames:
+            os.utime(os.path.join(dirpath, name), (1000, 1000))
+        os.utime(dirpath, (2000, 2000))
+    copy_method = copy.copy(psu_cm.COPY_METHOD_SYNC_METADATA)
+    walk_object = psu_walk.WalkObject(copy_method=copy_method, sync_tree=True, copy_quiet=True)
+
+    for _ in walk_object.walk(srcdir, dstdir):
+        pass
+
+    for relpath in tree:
+        assert read_file(os.path.join(dstdir, relpath)) == b'old'
+        assert os.stat(os.path.join(dstdir, relpath)).st_mtime == 1000
+    for reldir in ['a', os.path.join('a', 'b')]:
+        assert os.stat(os.path.join(dstdir, reldir)).st_mtime == 2000
+
+
+## Walk pipeline
+
+def walk_with_pipeline(srcdir, dstdir, copy_method, **pipeline_options):
+    walk_pipeline = psu_walk.WalkPipeline(**pipeline_options)
+    walk_object = psu_walk.WalkObject(copy_method=copy_method, sync_tree=True, copy_quiet=True,
+                                      walk_pipeline=walk_pipeline)
+    return walk_pipeline, walk_object.walk(srcdir, dstdir)
+
+
+def assert_pipeline_stopped(walk_pipeline):
+    assert not walk_pipeline.running
+    assert walk_pipeline.list_pool is None
+    for threads in walk_pipeline.threads.values():
+        assert not any(thread.is_alive() for thread in threads)
+
+
+def test_pipeline_copies_tree(tmp_path):
+    srcdir = str(tmp_path / 'src')
+    dstdir = str(tmp_path / 'dst')
+    tree = make_tree(srcdir)
+    walk_pipeline, walk_gen = walk_with_pipeline(srcdir, dstdir, copy.copy(psu_cm.COPY_METHOD_COPY_META),
+                                                 copy_workers=2, verify_workers=1)
+
+    for _ in walk_gen:
+        pass
+
+    for relpath, data in tree.items():
+        assert read_file(os.path.join(dstdir, relpath)) == data
+    assert walk_pipeline.get_metrics()[psu_walk.WALK_PIPELINE_STAGE_VERIFY]['nitems'] == len(tree)
+    assert_pipeline_stopped(walk_pipeline)
+
+
+def test_pipeline_raises_copy_errors(tmp_path):
+    # A failing copy stops the pipeline and is raised from the walk
+    srcdir = str(tmp_path / 'src')
+    dstdir = str(tmp_path / 'dst')
+    make_tree(srcdir)
+
+    def copy_fail(srcpath, dstpath):
+        if os.path.basename(srcpath) == 'f2':
+            raise OSError(errno.EIO, 'input/output error')
+        return shutil.copy2(srcpath, dstpath)
+
+    copy_method = psu_cm.CopyMethod(copy_fail, 'copy_fail', 'copying')
+    walk_pipeline, walk_gen = walk_with_pipeline(srcdir, dstdir, copy_method, copy_workers=2)
+
+    with pytest.raises(OSError) as excinfo:
+        for _ in walk_gen:
+            pass
+    assert excinfo.value.errno == errno.EIO
+    assert_pipeline_stopped(walk_pipeline)
+
+
+def test_pipeline_stops_when_walk_is_abandoned(tmp_path):
+    srcdir = str(tmp_path / 'src')
+    dstdir = str(tmp_path / 'dst')
+    make_tree(srcdir)
+    walk_pipeline, walk_gen = walk_with_pipeline(srcdir, dstdir, copy.copy(psu_cm.COPY_METHOD_COPY_META))
+
+    next(walk_gen)
+    walk_gen.close()
+    assert_pipeline_stopped(walk_pipeline)